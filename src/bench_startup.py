@@ -0,0 +1,119 @@
+"""
+Cold-start import benchmark for the agent packages.
+
+Each module is imported in a fresh interpreter under `python -X importtime`,
+so the numbers are what a short-lived worker pays before it can serve a
+request. The import time excludes the interpreter's own startup imports.
+
+    python bench_startup.py --runs 5 --output startup.json
+    python bench_startup.py --budget think_tank.agent=4000 --budget content_publisher.tools=800
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Milliseconds of import time each module may take; ADK alone is most of think_tank.agent.
+DEFAULT_BUDGETS_MS = {
+    "think_tank": 150,
+    "think_tank.selection": 150,
+    "think_tank.agent": 5000,
+    "content_publisher.tools": 300,
+}
+
+
+def parse_importtime(stderr: str) -> list:
+    """Returns (module, self_us, cumulative_us, depth) for each `-X importtime` line."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def run_import(statement: str, env: dict) -> tuple:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=SRC_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"`{statement}` failed:\n{result.stderr[-2000:]}")
+    return wall_ms, parse_importtime(result.stderr)
+
+
+def measure(module: str, runs: int, env: dict, top: int) -> dict:
+    _, startup = run_import("pass", env)
+    startup_modules = {name for name, _, _, _ in startup}
+    wall, imports, entries = [], [], []
+    for _ in range(runs):
+        wall_ms, entries = run_import(f"import {module}", env)
+        wall.append(wall_ms)
+        imports.append(sum(
+            cumulative for name, _, cumulative, depth in entries
+            if depth == 0 and name not in startup_modules
+        ) / 1000)
+    slowest = sorted(
+        (entry for entry in entries if entry[0] not in startup_modules), key=lambda entry: entry[1], reverse=True
+    )[:top]
+    return {
+        "wall_ms": round(statistics.median(wall), 1),
+        "import_ms": round(statistics.median(imports), 1),
+        "modules_imported": sum(1 for name, _, _, _ in entries if name not in startup_modules),
+        "slowest_self_ms": {name: round(self_us / 1000, 1) for name, self_us, _, _ in slowest},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", action="append", help="module to import; repeatable, defaults to all budgeted ones")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per module; the median is reported")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports listed per module")
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=MS", help="override a budget")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    budgets = dict(DEFAULT_BUDGETS_MS)
+    for item in args.budget:
+        module, _, ms = item.partition("=")
+        budgets[module] = float(ms)
+
+    env = dict(os.environ)
+    env.setdefault("VERTEX_AI_MODEL", "fake-model")
+    env["PYTHONPATH"] = os.pathsep.join(
+        [SRC_DIR, os.path.join(SRC_DIR, "util_agents")] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+    )
+
+    result = {}
+    for module in args.module or list(budgets):
+        result[module] = measure(module, args.runs, env, args.top)
+        result[module]["budget_ms"] = budgets.get(module)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+
+    over = [
+        f"{module}: {values['import_ms']} ms > {values['budget_ms']} ms"
+        for module, values in result.items()
+        if values["budget_ms"] is not None and values["import_ms"] > values["budget_ms"]
+    ]
+    for line in over:
+        print(f"OVER BUDGET {line}", file=sys.stderr)
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
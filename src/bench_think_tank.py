@@ -0,0 +1,217 @@
+"""
+Offline benchmark of the problem_solver_agent orchestration.
+
+Every agent runs on the local fake model (think_tank.fake_llm), so the numbers
+measure ADK/orchestration overhead and fan-out behaviour, not Vertex.
+
+    python bench_think_tank.py --runs 20 --output bench.json
+    python bench_think_tank.py --runs 20 --baseline bench.json --tolerance 0.15
+    python bench_think_tank.py --runs 20 --tier-latency fast=0.3 --tier-latency strong=1.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+QUESTION = """
+I want to make a workshop to facilitate the use of AI agents in our company. And help
+people understand how to transition from microservices to AI agents.
+
+What are the key topics I should cover? How should I structure the workshop?
+"""
+
+APP_NAME = "think_tank_bench"
+USER_ID = "bench"
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = (len(ordered) - 1) * pct / 100
+    lower = int(index)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (index - lower)
+
+
+def summarize(values: list) -> dict:
+    return {
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "mean": round(statistics.fmean(values), 2) if values else 0.0,
+    }
+
+
+def busy_time(intervals: list) -> float:
+    """Length of the union of (start, end) intervals."""
+    total, current_start, current_end = 0.0, None, None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+async def run_once(runner, session_service, fake_llm, question: str) -> dict:
+    session = session_service.create_session(app_name=APP_NAME, user_id=USER_ID)
+    new_message = types.Content(role="user", parts=[types.Part(text=question)])
+
+    fake_llm.FAKE_LLM_CALLS.clear()
+    events = Counter()
+    finished_at = {}
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    async for event in runner.run_async(user_id=USER_ID, session_id=session.id, new_message=new_message):
+        events[event.author] += 1
+        finished_at[event.author] = (time.perf_counter() - start) * 1000
+    end = time.perf_counter()
+    _, peak = tracemalloc.get_traced_memory()
+
+    calls = [(s, e) for _, s, e in fake_llm.FAKE_LLM_CALLS]
+    model_latency = defaultdict(float)
+    for name, s, e in fake_llm.FAKE_LLM_CALLS:
+        model_latency[name] += (e - s) * 1000
+    return {
+        "e2e_ms": (end - start) * 1000,
+        "overhead_ms": ((end - start) - busy_time(calls)) * 1000,
+        "model_calls": len(calls),
+        "events": dict(events),
+        "finished_at_ms": finished_at,
+        "model_latency_ms": dict(model_latency),
+        "peak_traced_bytes": peak,
+    }
+
+
+async def run_benchmark(args) -> dict:
+    # Imported here because the agent modules read VERTEX_AI_MODEL at import time.
+    from think_tank import fake_llm
+    from think_tank.agent import problem_solver_agent
+
+    fake_llm.configure(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        tokens_mean=args.tokens_mean,
+        tokens_std=args.tokens_std,
+        seed=args.seed,
+        model_latency_scale={f"fake-{tier}": scale for tier, scale in args.tier_latency.items()},
+    )
+    session_service = InMemorySessionService()
+    runner = Runner(agent=problem_solver_agent, app_name=APP_NAME, session_service=session_service)
+
+    tracemalloc.start()
+    for _ in range(args.warmup):
+        await run_once(runner, session_service, fake_llm, QUESTION)
+    runs = []
+    for i in range(args.runs):
+        fake_llm.configure(seed=args.seed + i)
+        runs.append(await run_once(runner, session_service, fake_llm, QUESTION))
+    tracemalloc.stop()
+
+    per_agent = defaultdict(lambda: {"finished_at_ms": [], "model_latency_ms": [], "events": []})
+    for run in runs:
+        for name in set(run["finished_at_ms"]) | set(run["model_latency_ms"]):
+            per_agent[name]["finished_at_ms"].append(run["finished_at_ms"].get(name, 0.0))
+            per_agent[name]["model_latency_ms"].append(run["model_latency_ms"].get(name, 0.0))
+            per_agent[name]["events"].append(run["events"].get(name, 0))
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "label": args.label,
+            "config": {
+                key: getattr(args, key)
+                for key in ("runs", "warmup", "latency_ms", "latency_sigma", "tokens_mean", "tokens_std", "seed", "tier_latency")
+            },
+        },
+        "e2e_ms": summarize([run["e2e_ms"] for run in runs]),
+        "overhead_ms": summarize([run["overhead_ms"] for run in runs]),
+        "model_calls": summarize([run["model_calls"] for run in runs]),
+        "events": summarize([sum(run["events"].values()) for run in runs]),
+        "peak_traced_mb": round(max(run["peak_traced_bytes"] for run in runs) / 2**20, 2) if runs else 0.0,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+        "agents": {
+            name: {
+                "finished_at_ms": summarize(values["finished_at_ms"]),
+                "model_latency_ms": summarize(values["model_latency_ms"]),
+                "events": summarize(values["events"]),
+            }
+            for name, values in sorted(per_agent.items())
+        },
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """Returns a line per metric that regressed by more than tolerance against baseline."""
+    regressions = []
+    for metric in ("e2e_ms", "overhead_ms"):
+        for pct in ("p50", "p95", "p99"):
+            old, new = baseline[metric][pct], result[metric][pct]
+            if old > 0 and new > old * (1 + tolerance):
+                regressions.append(f"{metric}.{pct}: {old} -> {new} (+{(new / old - 1) * 100:.1f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="median fake model latency per call")
+    parser.add_argument("--latency-sigma", type=float, default=0.35, help="log-normal sigma of the latency")
+    parser.add_argument("--tokens-mean", type=int, default=250)
+    parser.add_argument("--tokens-std", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--tier-latency", action="append", default=[], metavar="TIER=SCALE",
+        help="run a models.yaml tier on its own fake model with latency scaled by SCALE; repeatable"
+    )
+    parser.add_argument("--label", default="", help="free-form label stored with the results, e.g. a git sha")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression vs baseline")
+    args = parser.parse_args()
+    tier_latency = {}
+    for item in args.tier_latency:
+        tier, _, scale = item.partition("=")
+        tier_latency[tier] = float(scale)
+    args.tier_latency = tier_latency
+
+    os.environ["VERTEX_AI_MODEL"] = "fake-model"
+    for tier in tier_latency:
+        os.environ[f"THINK_TANK_MODEL_{tier.upper()}"] = f"fake-{tier}"
+    # Keep the persona cache out of the measurement.
+    os.environ["THINK_TANK_CACHE_DIR"] = ""
+
+    result = asyncio.run(run_benchmark(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
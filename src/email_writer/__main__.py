@@ -0,0 +1,44 @@
+import argparse
+import asyncio
+import json
+import sys
+
+from email_writer.merge import DEFAULT_CHECKPOINT_EVERY, DEFAULT_CONCURRENCY, read_recipients, run_merge
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m email_writer")
+    subparsers = parser.add_subparsers(dest="command")
+    merge = subparsers.add_parser("merge", help="write one personalised email per CSV row")
+    merge.add_argument("recipients", help="CSV file with one recipient per row; the header names the fields")
+    merge.add_argument("-t", "--template", required=True, help="text file with the brief shared by every email")
+    merge.add_argument("-o", "--output", default="emails.jsonl", help="JSONL file the emails are appended to; rerun to resume")
+    merge.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="emails generated at the same time")
+    merge.add_argument("--state", help="JSON file with the session state shared by all emails (user_email, todays_date, ...)")
+    merge.add_argument("--checkpoint-every", type=int, default=DEFAULT_CHECKPOINT_EVERY, help="emails between fsyncs of the output")
+    args = parser.parse_args()
+
+    if args.command != "merge":
+        print("Run `python -m email_writer merge recipients.csv -t brief.txt` to write a batch of emails.")
+        return
+
+    with open(args.template, encoding="utf-8") as f:
+        template = f.read()
+    state = {}
+    if args.state:
+        with open(args.state, encoding="utf-8") as f:
+            state = json.load(f)
+    summary = asyncio.run(run_merge(
+        read_recipients(args.recipients),
+        template,
+        args.output,
+        state=state,
+        concurrency=args.concurrency,
+        checkpoint_every=args.checkpoint_every,
+    ))
+    print(json.dumps(summary, indent=2, ensure_ascii=False), file=sys.stderr)
+    sys.exit(1 if summary["error"] else 0)
+
+
+if __name__ == "__main__":
+    main()
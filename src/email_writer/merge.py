@@ -0,0 +1,182 @@
+import asyncio
+import csv
+import json
+import os
+import time
+import uuid
+from typing import Optional
+
+APP_NAME = "email_writer"
+USER_ID = "mail_merge"
+DEFAULT_CONCURRENCY = 8
+DEFAULT_CHECKPOINT_EVERY = 50
+
+
+def read_recipients(path: str) -> list:
+    """
+    Reads one recipient per CSV row; the header names the personalisation fields.
+
+    A row's `id` column identifies it in the output and on resume, defaulting
+    to the row number.
+    """
+    recipients = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row_number, row in enumerate(csv.DictReader(f), 1):
+            fields = {key.strip(): (value or "").strip() for key, value in row.items() if key}
+            if not any(fields.values()):
+                continue
+            recipients.append({"id": fields.pop("id", "") or str(row_number), "fields": fields})
+    return recipients
+
+
+def completed_ids(path: str, corrupt: Optional[list] = None) -> set:
+    """
+    Returns the recipient ids already written to an output file.
+
+    A final line torn by a crash mid-write is cut off, so the file can be
+    appended to and the recipient is generated again. Any other line that
+    can't be read is left in place and skipped; its recipient is generated
+    again unless another line holds it.
+
+    Args:
+        path: The JSONL output file.
+        corrupt: When given, the numbers of the skipped lines are appended to it.
+    """
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path, "rb+") as f:
+        valid_until = 0
+        for line_number, line in enumerate(f, 1):
+            if not line.endswith(b"\n"):
+                # Only the last line can lack its newline.
+                f.truncate(valid_until)
+                break
+            valid_until += len(line)
+            try:
+                done.add(json.loads(line)["id"])
+            except (ValueError, KeyError, TypeError):
+                if corrupt is not None:
+                    corrupt.append(line_number)
+    return done
+
+
+def build_message(template: str, fields: dict) -> str:
+    """
+    The request for one recipient: the shared brief first, the recipient's fields last.
+
+    Every request then starts with the same instruction and brief, which the
+    model provider can serve from its prefix cache.
+    """
+    recipient = "\n".join(f"- {key}: {value}" for key, value in fields.items() if value)
+    return f"{template.strip()}\n\n**Recipient:**\n{recipient}"
+
+
+def validate_email(output, fields: dict):
+    """Validates the agent's output as an EmailContent addressed to the recipient."""
+    from email_writer.agent import EmailContent
+
+    if isinstance(output, str):
+        email = EmailContent.model_validate_json(output)
+    else:
+        email = EmailContent.model_validate(output)
+    address = fields.get("email") or fields.get("to_address")
+    if address and address.lower() not in email.to_address.lower():
+        raise ValueError(f"to_address '{email.to_address}' does not match the recipient '{address}'")
+    return email
+
+
+async def run_merge(
+    recipients: list,
+    template: str,
+    output_path: str,
+    state: Optional[dict] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+) -> dict:
+    """
+    Generates one EmailContent per recipient and appends them to output_path as they complete.
+
+    One session service and runner serve every recipient; each generation runs
+    in a session of its own that is deleted afterwards, so memory stays flat
+    over thousands of rows. Recipients already in output_path are skipped, and
+    the file is fsynced every checkpoint_every records, so an interrupted merge
+    resumes where it stopped. Generations run at the "batch" priority of the
+    process-wide QuotaScheduler (when THINK_TANK_RATE_LIMITS or
+    THINK_TANK_RATE_LIMIT_RPM sets one), behind interactive sessions sharing
+    its quota. Failed recipients are reported, not written, and
+    are retried by the next run, as are the recipients of unreadable lines
+    (reported by line number in corrupt_lines).
+
+    Args:
+        recipients: Records from read_recipients().
+        template: The brief shared by every email.
+        output_path: JSONL file of {"id", "email"} records.
+        state: Session state shared by every recipient (user_email, todays_date, ...).
+        concurrency: Generations in flight at the same time.
+        checkpoint_every: Records between fsyncs of the output file.
+    """
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+    from google.genai import types
+    from email_writer.agent import email_writer_agent
+    from think_tank.scheduler import PRIORITY_STATE_KEY, default_scheduler
+
+    scheduler = default_scheduler()
+    if scheduler:
+        scheduler.instrument(email_writer_agent)
+    corrupt = []
+    done = completed_ids(output_path, corrupt)
+    pending = [recipient for recipient in recipients if recipient["id"] not in done]
+    session_service = InMemorySessionService()
+    runner = Runner(agent=email_writer_agent, app_name=APP_NAME, session_service=session_service)
+    queue = asyncio.Queue()
+    for recipient in pending:
+        queue.put_nowait(recipient)
+    stats = {"ok": 0, "error": 0, "errors": {}}
+
+    async def generate(recipient: dict, out) -> None:
+        session = session_service.create_session(
+            app_name=APP_NAME,
+            user_id=USER_ID,
+            session_id=str(uuid.uuid4()),
+            state={PRIORITY_STATE_KEY: "batch", **(state or {})},
+        )
+        new_message = types.Content(role="user", parts=[types.Part(text=build_message(template, recipient["fields"]))])
+        try:
+            async for _ in runner.run_async(user_id=USER_ID, session_id=session.id, new_message=new_message):
+                pass
+            session = session_service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session.id)
+            email = validate_email(session.state.get(email_writer_agent.output_key), recipient["fields"])
+        except Exception as e:
+            stats["error"] += 1
+            stats["errors"][recipient["id"]] = str(e)
+            return
+        finally:
+            session_service.delete_session(app_name=APP_NAME, user_id=USER_ID, session_id=session.id)
+        out.write(json.dumps({"id": recipient["id"], "email": email.model_dump()}, ensure_ascii=False) + "\n")
+        out.flush()
+        stats["ok"] += 1
+        if stats["ok"] % checkpoint_every == 0:
+            os.fsync(out.fileno())
+
+    async def worker(out) -> None:
+        while not queue.empty():
+            await generate(queue.get_nowait(), out)
+
+    start = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out:
+        await asyncio.gather(*(worker(out) for _ in range(max(1, concurrency))))
+        out.flush()
+        os.fsync(out.fileno())
+    elapsed = time.perf_counter() - start
+    return {
+        "recipients": len(recipients),
+        "skipped": len(recipients) - len(pending),
+        "ok": stats["ok"],
+        "error": stats["error"],
+        "elapsed_s": round(elapsed, 2),
+        "throughput_per_min": round(stats["ok"] / elapsed * 60, 2) if elapsed else 0.0,
+        "errors": stats["errors"],
+        "corrupt_lines": corrupt,
+    }
@@ -1,7 +1,8 @@
-from google.adk.sessions import InMemorySessionService, Session, DatabaseSessionService
+from google.adk.sessions import InMemorySessionService, Session
 from google.adk.runners import Runner
 from google.genai import types
 from think_tank.agent import problem_solver_agent
+from think_tank.sessions import SqliteSessionService
 import uuid
 from pprint import pprint
 
@@ -18,7 +19,7 @@ USER_ID = "matsoldin"
 SESSION_ID = str(uuid.uuid4())
 db_url = "sqlite:///./agent_data.db"
 #session_service_stateful = InMemorySessionService()
-session_service_stateful = DatabaseSessionService(db_url=db_url)
+session_service_stateful = SqliteSessionService(db_url=db_url)
 stateful_session: Session = session_service_stateful.create_session(
     app_name=APP_NAME,
     user_id=USER_ID,
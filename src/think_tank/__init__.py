@@ -1 +1,14 @@
-from . import agent
\ No newline at end of file
+import importlib
+
+from dotenv import load_dotenv
+
+# The one place the package reads .env; every submodule imports the package first.
+load_dotenv()
+
+
+def __getattr__(name):
+    # ADK loads `think_tank.agent.root_agent`; importing it on first access keeps
+    # `import think_tank.<module>` from building the whole agent tree.
+    if name == "agent":
+        return importlib.import_module(f"{__name__}.agent")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,12 +1,170 @@
-import os
-from dotenv import load_dotenv
-from think_tank.agent import think_tank_agent
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+
+APP_NAME = "think_tank"
+USER_ID = "batch"
+# Sent when the clarification agent asks questions a record has no prepared answers to.
+NO_ANSWERS = "I have no further details to add. Please answer the question as it stands."
+
+
+def read_questions(path: str) -> list:
+    """Reads {"id": ..., "question": ..., "answers"?: ..., "state": {...}} records, one per line."""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "question" not in record:
+                raise ValueError(f"{path}:{line_number}: missing 'question'")
+            record.setdefault("id", str(line_number))
+            questions.append(record)
+    return questions
+
+
+async def run_batch(args) -> dict:
+    from google.adk.runners import Runner
+    from google.adk.sessions import DatabaseSessionService, InMemorySessionService
+    from google.genai import types
+    from think_tank.agent import clarification_agent, problem_solver_agent
+    from think_tank.scheduler import PRIORITY_STATE_KEY
+    from think_tank.sessions import SqliteSessionService
+
+    questions = read_questions(args.input)
+    initial_state = {}
+    if args.state:
+        with open(args.state, encoding="utf-8") as f:
+            initial_state = json.load(f)
+
+    if not args.db_url:
+        session_service = InMemorySessionService()
+    elif args.db_url.startswith("sqlite"):
+        session_service = SqliteSessionService(db_url=args.db_url)
+    else:
+        session_service = DatabaseSessionService(db_url=args.db_url)
+    # Every question goes through the full orchestration. Nobody is there to answer the
+    # clarification questions, so they get the record's prepared answers, or NO_ANSWERS.
+    runner = Runner(agent=problem_solver_agent, app_name=APP_NAME, session_service=session_service)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    stats = {"ok": 0, "error": 0, "latencies": []}
+
+    async def answer(record: dict, out) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            session = session_service.create_session(
+                app_name=APP_NAME,
+                user_id=USER_ID,
+                session_id=str(uuid.uuid4()),
+                # Queued behind interactive sessions sharing the process's quota, unless the state says otherwise.
+                state={PRIORITY_STATE_KEY: "batch", **initial_state, **record.get("state", {})},
+            )
+            responses = []
+            result = {"id": record["id"], "session_id": session.id}
+            try:
+                turn = record["question"]
+                answered = False
+                while turn:
+                    new_message = types.Content(role="user", parts=[types.Part(text=turn)])
+                    async for event in runner.run_async(user_id=USER_ID, session_id=session.id, new_message=new_message):
+                        if event.is_final_response() and event.content and event.content.parts:
+                            text = "".join(part.text for part in event.content.parts if part.text)
+                            if text:
+                                responses.append({"author": event.author, "text": text})
+                    # A turn that ends on the clarification questions is answered once; the panel runs after that.
+                    asked = bool(responses) and responses[-1]["author"] == clarification_agent.name
+                    turn = (record.get("answers") or NO_ANSWERS) if asked and not answered else None
+                    answered = answered or asked
+                result.update(status="ok", answer=responses[-1]["text"] if responses else None, responses=responses)
+                stats["ok"] += 1
+            except Exception as e:
+                result.update(status="error", error=str(e), responses=responses)
+                stats["error"] += 1
+            if isinstance(session_service, SqliteSessionService):
+                session_service.flush_session(session)
+            result["latency_s"] = round(time.perf_counter() - start, 3)
+            stats["latencies"].append(result["latency_s"])
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+
+    start = time.perf_counter()
+    with open(args.output, "a", encoding="utf-8") as out:
+        await asyncio.gather(*(answer(record, out) for record in questions))
+    if isinstance(session_service, SqliteSessionService):
+        session_service.close()
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(stats["latencies"])
+    return {
+        "questions": len(questions),
+        "ok": stats["ok"],
+        "error": stats["error"],
+        "elapsed_s": round(elapsed, 2),
+        "throughput_per_min": round(len(questions) / elapsed * 60, 2) if elapsed else 0.0,
+        "p50_latency_s": latencies[len(latencies) // 2] if latencies else None,
+        "max_latency_s": latencies[-1] if latencies else None,
+    }
+
+
+def serve(args) -> None:
+    import uvicorn
+    from google.adk.sessions import DatabaseSessionService, InMemorySessionService
+    from think_tank.agent import problem_solver_agent
+    from think_tank.server import AgentService
+    from think_tank.sessions import SqliteSessionService
+
+    if not args.db_url:
+        session_service = InMemorySessionService()
+    elif args.db_url.startswith("sqlite"):
+        session_service = SqliteSessionService(db_url=args.db_url)
+    else:
+        session_service = DatabaseSessionService(db_url=args.db_url)
+    service = AgentService(
+        problem_solver_agent,
+        session_service,
+        client_buffer=args.client_buffer,
+        streaming=not args.no_streaming,
+    )
+    try:
+        uvicorn.run(service.app(), host=args.host, port=args.port)
+    finally:
+        if isinstance(session_service, SqliteSessionService):
+            session_service.close()
+
 
 def main():
-    load_dotenv()
-    # Example: run the agent in CLI mode (customize as needed)
-    print("Think Tank agent loaded. Ready for orchestration.")
-    # You can add code here to interact with the agent, e.g., via CLI or web
+    parser = argparse.ArgumentParser(prog="python -m think_tank")
+    subparsers = parser.add_subparsers(dest="command")
+    batch = subparsers.add_parser("batch", help="answer every question in a JSONL file")
+    batch.add_argument("input", help="JSONL file with one {'id', 'question', 'answers', 'state'} record per line; "
+                       "'answers' is sent if the clarification questions are asked, otherwise the question is answered as it stands")
+    batch.add_argument("-o", "--output", default="answers.jsonl", help="JSONL file the answers are appended to")
+    batch.add_argument("-c", "--concurrency", type=int, default=4, help="questions processed at the same time")
+    batch.add_argument("--state", help="JSON file with the initial session state shared by all questions")
+    batch.add_argument("--db-url", help="persist sessions in a database, e.g. sqlite:///./agent_data.db (WAL, batched writes)")
+    server = subparsers.add_parser("serve", help="serve the agent over HTTP with Server-Sent Events")
+    server.add_argument("--host", default="127.0.0.1")
+    server.add_argument("--port", type=int, default=8080)
+    server.add_argument("--db-url", help="persist sessions in a database, e.g. sqlite:///./agent_data.db (WAL, batched writes)")
+    server.add_argument("--client-buffer", type=int, default=256, help="messages buffered per client before streamed text is dropped")
+    server.add_argument("--no-streaming", action="store_true", help="send complete model turns only, no partial text")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args)
+        return
+    if args.command != "batch":
+        print("Think Tank agent loaded. Ready for orchestration.")
+        print("Run `python -m think_tank batch questions.jsonl` to answer a batch of questions,")
+        print("or `python -m think_tank serve` to stream answers over HTTP.")
+        return
+
+    summary = asyncio.run(run_batch(args))
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,41 +1,96 @@
 import os
 
 from google.adk.agents import LlmAgent, SequentialAgent
-from think_tank.sub_agents.think_tank.agent import think_tank_agent
-from think_tank.sub_agents.synthesizer.agent import synthesizer_agent
+from think_tank.sub_agents.think_tank.agent import think_tank_agent, persona_registry, persona_library
+from think_tank.sub_agents.synthesizer.agent import synthesizer_agent, draft_synthesizer_agent, reconciler_agent
+from think_tank.sub_agents.synthesizer.agent import cluster_synthesizer_agents
+from think_tank.sub_agents.critic.agent import critic_agent
+from think_tank.workflows import CriticLoopAgent, IncrementalSynthesisAgent, SpeculativeFanout, TieredSynthesisAgent
+from think_tank.telemetry import AgentTelemetry
+from think_tank.cassette import Cassette
+from think_tank.models import default_policy
+from think_tank.scheduler import default_scheduler
+from think_tank.hedging import HedgingPolicy
+from think_tank.history import HistoryWindow
 from think_tank.prompt import ROOT_AGENT_PROMPT, CLARIFICATION_PROMPT
-from dotenv import load_dotenv
-load_dotenv()
 
-MODEL = os.getenv("VERTEX_AI_MODEL")
+SYNTHESIS_MODE = os.getenv("THINK_TANK_SYNTHESIS_MODE", "batch")
+# Critic revision rounds after the first synthesis; 0 disables the generator–critic loop.
+CRITIC_REVISIONS = int(os.getenv("THINK_TANK_CRITIC_REVISIONS", 0))
+CRITIC_THRESHOLD = float(os.getenv("THINK_TANK_CRITIC_THRESHOLD", 8))
+CRITIC_MIN_IMPROVEMENT = float(os.getenv("THINK_TANK_CRITIC_MIN_IMPROVEMENT", 0.5))
+# Start the persona fan-out on the raw prompt while the user answers the clarification questions.
+SPECULATIVE_FANOUT = os.getenv("THINK_TANK_SPECULATIVE_FANOUT", "").lower() in ("1", "true", "yes")
+# Which model each agent runs on; see models.yaml.
+model_policy = default_policy()
+# With the critic loop, the loop is the facilitator the orchestrator transfers to.
+FACILITATOR_NAME = "panel" if CRITIC_REVISIONS else "facilitator"
 
 
 
 
 
-facilitator_agent = SequentialAgent(
-    name="facilitator",
-    description="Facilitator agent that coordinates the parallel agents.",
-    sub_agents=[
-        think_tank_agent,
-        synthesizer_agent
-    ]
-)
+if SYNTHESIS_MODE == "incremental":
+    facilitator_agent = IncrementalSynthesisAgent(
+        name=FACILITATOR_NAME,
+        description="Facilitator agent that coordinates the parallel agents.",
+        sub_agents=[
+            think_tank_agent,
+            draft_synthesizer_agent,
+            reconciler_agent
+        ]
+    )
+elif SYNTHESIS_MODE == "tiered":
+    facilitator_agent = TieredSynthesisAgent(
+        name=FACILITATOR_NAME,
+        description="Facilitator agent that coordinates the parallel agents.",
+        sub_agents=[
+            think_tank_agent,
+            *cluster_synthesizer_agents,
+            synthesizer_agent
+        ]
+    )
+else:
+    facilitator_agent = SequentialAgent(
+        name=FACILITATOR_NAME,
+        description="Facilitator agent that coordinates the parallel agents.",
+        sub_agents=[
+            think_tank_agent,
+            synthesizer_agent
+        ]
+    )
+
+if CRITIC_REVISIONS:
+    facilitator_agent = CriticLoopAgent(
+        name="facilitator",
+        description="Facilitator agent that coordinates the parallel agents and revises the synthesis until the critic accepts it.",
+        sub_agents=[
+            facilitator_agent,
+            critic_agent
+        ],
+        max_revisions=CRITIC_REVISIONS,
+        score_threshold=CRITIC_THRESHOLD,
+        min_improvement=CRITIC_MIN_IMPROVEMENT
+    )
 
 clarification_agent = LlmAgent(
     name="clarification",
-    model=MODEL,
+    model=model_policy.model("clarification"),
     description="Pre‑processing agent launched before giving the 'facilitator_agent' the user's prompt. It reviews the user’s initial prompt and the list of available personas to detect information gaps, then asks the user 4‑5 focused questions that will supply the data each persona needs to provide high‑quality answers.",
     instruction=CLARIFICATION_PROMPT,
     output_key="clarification_questions"
 )
 
+if SPECULATIVE_FANOUT:
+    think_tank_agent.speculation = SpeculativeFanout(think_tank_agent)
+    clarification_agent.after_agent_callback = think_tank_agent.speculation.after_agent_callback
+
 description = """
 Central control agent that analyses the user problem, selects the most appropriate workflow, manages specialist personas, enforces global constraints, and returns a reader‑friendly executive plan.
 """
 problem_solver_agent = LlmAgent(
     name="problem_solver",
-    model=MODEL,
+    model=model_policy.model("problem_solver"),
     description=description,
     instruction=ROOT_AGENT_PROMPT,
     sub_agents=[
@@ -43,4 +98,45 @@ problem_solver_agent = LlmAgent(
         facilitator_agent,
     ]
 ) 
-root_agent = problem_solver_agent
\ No newline at end of file
+root_agent = problem_solver_agent
+
+history_window = HistoryWindow.from_env(
+    summary_model=model_policy.model("history_summarizer"),
+    stale_keys=lambda: [f"{name}_output" for name in persona_library.names()],
+)
+if history_window:
+    history_window.instrument(problem_solver_agent)
+    persona_registry.on_build(history_window.instrument)
+
+# The history summarizer runs outside the agent tree, so the model layers below are installed on it too.
+model_roots = [problem_solver_agent]
+if history_window and history_window.summarizer:
+    model_roots.append(history_window.summarizer)
+
+# Installed before the scheduler and hedging, so each retry and hedge they send is recorded as its own request.
+telemetry = AgentTelemetry.from_env()
+if telemetry:
+    for root in model_roots:
+        telemetry.instrument(root)
+    persona_registry.on_build(telemetry.instrument)
+
+# Shared by every session in the process, so concurrent runs queue for the same per-model quota.
+scheduler = default_scheduler()
+if scheduler:
+    for root in model_roots:
+        scheduler.instrument(root)
+    persona_registry.on_build(scheduler.instrument)
+
+# Persona calls only: the fan-out waits for its slowest persona. Installed after the scheduler so hedges count against the quota.
+hedging = HedgingPolicy.from_env()
+if hedging:
+    persona_registry.on_build(hedging.instrument)
+    if telemetry:
+        telemetry.add_collector(hedging.prometheus_text)
+
+# Installed last so its callbacks see the final requests and responses, and replays wrap every other model layer.
+cassette = Cassette.from_env()
+if cassette:
+    for root in model_roots:
+        cassette.instrument(root)
+    persona_registry.on_build(cassette.instrument)
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 2000
+
+
+def _normalize(text: str) -> str:
+    """Collapses whitespace so cosmetic differences don't defeat the cache."""
+    return " ".join(text.split())
+
+
+def _contents_text(contents: list) -> str:
+    lines = []
+    for content in contents or []:
+        for part in content.parts or []:
+            if part.text:
+                lines.append(f"{content.role}: {_normalize(part.text)}")
+    return "\n".join(lines)
+
+
+class PersonaResponseCache:
+    """
+    On-disk, size-bounded LRU cache of persona model responses.
+
+    Entries are keyed on the hash of the persona instruction, the model name and
+    the normalized input context. The cache is wired into an LlmAgent through
+    its model callbacks: on a hit the cached text is returned as the model
+    response, so ADK fills the agent's output_key without calling Vertex.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            path: The SQLite file holding the cache entries.
+            ttl_seconds: Entries older than this are treated as misses and purged.
+            max_entries: Least recently used entries are evicted above this size.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pending = {}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " agent TEXT,"
+                " model TEXT,"
+                " response TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    @classmethod
+    def from_env(cls) -> Optional["PersonaResponseCache"]:
+        """
+        Builds the cache from THINK_TANK_CACHE_DIR, THINK_TANK_CACHE_TTL and
+        THINK_TANK_CACHE_MAX_ENTRIES. Returns None when caching is not enabled.
+        """
+        cache_dir = os.getenv("THINK_TANK_CACHE_DIR")
+        if not cache_dir:
+            return None
+        return cls(
+            os.path.join(cache_dir, "persona_responses.sqlite"),
+            ttl_seconds=float(os.getenv("THINK_TANK_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+            max_entries=int(os.getenv("THINK_TANK_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+        )
+
+    @staticmethod
+    def make_key(instruction: str, model: str, context: str) -> str:
+        """Returns the cache key for an instruction, model and input context."""
+        instruction_hash = hashlib.sha256(_normalize(instruction).encode("utf-8")).hexdigest()
+        payload = json.dumps([instruction_hash, model or "", _normalize(context)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response for key, or None on a miss or expiry."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            return response
+
+    def put(self, key: str, response: str, agent: str = None, model: str = None) -> None:
+        """Stores a response and evicts expired and least recently used entries."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, agent, model, response, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, agent, model, response, now, now),
+            )
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+    def before_model_callback(self, callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+        """Serves the persona response from the cache when possible."""
+        instruction = llm_request.config.system_instruction if llm_request.config else ""
+        key = self.make_key(str(instruction or ""), llm_request.model, _contents_text(llm_request.contents))
+        cached = self.get(key)
+        if cached is not None:
+            return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=cached)]))
+        with self._lock:
+            self._pending[(callback_context.invocation_id, callback_context.agent_name)] = (key, llm_request.model)
+        return None
+
+    def after_model_callback(self, callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+        """Stores the final text response of a cache miss."""
+        if llm_response.partial or llm_response.error_code or not llm_response.content:
+            return None
+        parts = llm_response.content.parts or []
+        if any(part.function_call for part in parts):
+            return None
+        text = "".join(part.text for part in parts if part.text)
+        with self._lock:
+            pending = self._pending.pop((callback_context.invocation_id, callback_context.agent_name), None)
+        if pending and text:
+            key, model = pending
+            self.put(key, text, agent=callback_context.agent_name, model=model)
+        return None
@@ -0,0 +1,33 @@
+from google.adk.agents import BaseAgent, LlmAgent
+
+
+def _as_list(callback) -> list:
+    if not callback:
+        return []
+    return list(callback) if isinstance(callback, list) else [callback]
+
+
+def llm_agents(root: BaseAgent) -> list:
+    """Returns every LlmAgent in the tree under root, root included."""
+    found = []
+    stack = [root]
+    while stack:
+        agent = stack.pop()
+        if isinstance(agent, LlmAgent) and agent not in found:
+            found.append(agent)
+        stack.extend(reversed(agent.sub_agents))
+    return found
+
+
+def add_model_callbacks(agent: LlmAgent, before=None, after=None, first: bool = False) -> None:
+    """
+    Installs model callbacks on an agent without dropping the ones already there.
+
+    ADK runs the callbacks in order and stops at the first one returning a
+    response, so `first=True` puts the new callbacks ahead of existing ones.
+    """
+    for field, callback in (("before_model_callback", before), ("after_model_callback", after)):
+        if callback is None:
+            continue
+        existing = _as_list(getattr(agent, field))
+        setattr(agent, field, [callback] + existing if first else existing + [callback])
@@ -0,0 +1,233 @@
+import asyncio
+import atexit
+import contextvars
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, AsyncGenerator, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+
+from think_tank.callbacks import add_model_callbacks, llm_agents
+
+
+CASSETTE_VERSION = 1
+
+_call = contextvars.ContextVar("think_tank_cassette_call", default=None)
+
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class Cassette:
+    """
+    Records every model call of an agent tree to disk and replays it without a network.
+
+    The cassette wraps every LlmAgent's model in a CassetteLlm, outside every
+    other model layer, and puts its before-model callback last, so it sees
+    the request as the model receives it. In record mode each call's final
+    response (text, function calls such as agent transfers, usage), as the
+    model returned it, and its timing are appended to a gzipped JSONL file as
+    soon as it completes. Request texts are stored once per distinct blob and
+    referenced by hash, so the history that every persona shares costs its
+    size only once.
+
+    In replay mode the CassetteLlm answers every call itself, and the
+    after-model callbacks (telemetry, caches, a speculative `KEEP` restored
+    to the full output) run on the replayed response just as they did on the
+    recorded one: the k-th call of an agent in the n-th session gets that
+    agent's k-th recorded response in the n-th recorded session (cycling
+    through the recorded sessions), after its recorded latency divided by
+    speed. Calls are matched by position, not content, so orchestration
+    changes still replay; requests that differ from the recording are counted
+    in stats["drift"]. A call with nothing recorded gets an error response
+    instead of reaching the model. Streamed responses are replayed as one
+    final response.
+
+    Record with the persona response cache off: calls it answers never reach
+    the model, so they are not recorded.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", speed: float = 1.0):
+        """
+        Args:
+            path: The cassette file (`.jsonl.gz`).
+            mode: "record" or "replay".
+            speed: Replay speed-up; 1 keeps the recorded latencies, 0 answers at once.
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Cassette mode must be 'record' or 'replay', got '{mode}'.")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.stats = defaultdict(int)
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._sessions = {}
+        self._file = None
+        self._blobs = set()
+        self._started = None
+        self._calls = {}
+        if mode == "record":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = gzip.open(path, "wt", encoding="utf-8")
+            self._write({"cassette": CASSETTE_VERSION, "recorded_at": time.time()})
+            atexit.register(self.close)
+        else:
+            self._calls = self.load(path)
+
+    @classmethod
+    def from_env(cls) -> Optional["Cassette"]:
+        """
+        Builds the cassette from THINK_TANK_CASSETTE (the file), THINK_TANK_CASSETTE_MODE
+        ("record" or "replay") and THINK_TANK_CASSETTE_SPEED. Returns None when no cassette is set.
+        """
+        path = os.getenv("THINK_TANK_CASSETTE")
+        if not path:
+            return None
+        return cls(
+            path,
+            mode=os.getenv("THINK_TANK_CASSETTE_MODE", "replay"),
+            speed=float(os.getenv("THINK_TANK_CASSETTE_SPEED", 1.0)),
+        )
+
+    @staticmethod
+    def load(path: str) -> dict:
+        """Returns (session ordinal, agent name) to the recorded calls, in call order."""
+        calls = defaultdict(list)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    record = json.loads(line)
+                    if "agent" in record:
+                        calls[(record["session"], record["agent"])].append(record)
+            except (EOFError, ValueError):
+                # A recording cut short by a crash keeps every call written before it.
+                pass
+        for records in calls.values():
+            records.sort(key=lambda record: record["seq"])
+        return dict(calls)
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def _request(self, llm_request: LlmRequest) -> dict:
+        """The request as blob references, writing blobs not seen before when recording."""
+        texts = [str(llm_request.config.system_instruction or "") if llm_request.config else ""]
+        contents = []
+        for content in llm_request.contents:
+            parts = [part.text for part in content.parts or [] if part.text]
+            texts.extend(parts)
+            contents.append([content.role, [_sha(text) for text in parts]])
+        if self._file is not None:
+            for text in texts:
+                sha = _sha(text)
+                if sha not in self._blobs:
+                    self._blobs.add(sha)
+                    self._write({"blob": sha, "text": text})
+        return {"model": llm_request.model, "system": _sha(texts[0]), "contents": contents}
+
+    def instrument(self, root: BaseAgent) -> None:
+        """Puts the cassette around the model, and its callback after the existing ones, of every LlmAgent under root."""
+        for agent in llm_agents(root):
+            if isinstance(agent.model, CassetteLlm):
+                continue
+            add_model_callbacks(agent, before=self.before_model_callback)
+            inner = agent.canonical_model
+            agent.model = CassetteLlm(model=inner.model, inner=inner, cassette=self)
+
+    def _session(self, callback_context: CallbackContext) -> int:
+        """The ordinal of the call's session: recorded sessions are numbered 0, 1, ... as they appear."""
+        session_id = callback_context._invocation_context.session.id
+        if session_id not in self._sessions:
+            self._sessions[session_id] = len(self._sessions)
+        return self._sessions[session_id]
+
+    def before_model_callback(self, callback_context: CallbackContext, llm_request: LlmRequest) -> None:
+        with self._lock:
+            session = self._session(callback_context)
+            key = (session, callback_context.agent_name)
+            seq = self._counters[key]
+            self._counters[key] += 1
+            request = self._request(llm_request)
+            if self._started is None:
+                self._started = time.perf_counter()
+        # Read by CassetteLlm, which runs in the same task right after the callbacks.
+        _call.set((session, callback_context.agent_name, seq, request))
+        return None
+
+    async def replay(self, call: tuple) -> LlmResponse:
+        """The recorded response of a call identified by the before-model callback."""
+        session, agent_name, seq, request = call
+        recorded_sessions = len({recorded_session for recorded_session, _ in self._calls}) or 1
+        recorded = self._calls.get((session % recorded_sessions, agent_name), [])
+        if seq >= len(recorded):
+            self.stats["misses"] += 1
+            return LlmResponse(
+                error_code="CASSETTE_MISS",
+                error_message=f"No call {seq} of '{agent_name}' in cassette {self.path}.",
+            )
+        recorded_call = recorded[seq]
+        if recorded_call["request"] != request:
+            self.stats["drift"] += 1
+        self.stats["replayed"] += 1
+        if self.speed > 0:
+            await asyncio.sleep(recorded_call["latency_ms"] / 1000 / self.speed)
+        return LlmResponse.model_validate(recorded_call["response"])
+
+    def record(self, call: tuple, start: float, llm_response: LlmResponse) -> None:
+        """Appends a call's final response, timed from start, to the recording."""
+        session, agent_name, seq, request = call
+        end = time.perf_counter()
+        with self._lock:
+            if self._file is None:
+                return
+            self._write({
+                "session": session,
+                "agent": agent_name,
+                "seq": seq,
+                "start_ms": round((start - self._started) * 1000, 1),
+                "latency_ms": round((end - start) * 1000, 1),
+                "request": request,
+                "response": llm_response.model_dump(mode="json", exclude_none=True),
+            })
+            self._file.flush()
+            self.stats["recorded"] += 1
+
+    def close(self) -> None:
+        """Finishes the recording; the file is only a complete gzip stream after this."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        atexit.unregister(self.close)
+
+
+class CassetteLlm(BaseLlm):
+    """A model that records the wrapped model's responses to a Cassette, or answers from it instead."""
+
+    inner: BaseLlm
+    cassette: Any
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        call = _call.get()
+        _call.set(None)
+        if call is None:
+            raise RuntimeError("CassetteLlm called without the cassette's before-model callback.")
+        if self.cassette.mode == "replay":
+            yield await self.cassette.replay(call)
+            return
+        start = time.perf_counter()
+        async for llm_response in self.inner.generate_content_async(llm_request, stream):
+            if not llm_response.partial:
+                self.cassette.record(call, start, llm_response)
+            yield llm_response
@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+
+DEFAULT_TTL_SECONDS = 600
+DEFAULT_MIN_TOKENS = 4096
+
+# Contents held by every LocalContextCacheBackend of the process, for the fake model to resolve.
+_LOCAL_CACHES = {}
+
+
+def _estimate_tokens(contents: list) -> int:
+    """Rough token count (~4 characters per token) of a list of contents."""
+    return sum(len(part.text or "") for content in contents for part in content.parts or []) // 4
+
+
+def _is_context_note(content: types.Content) -> bool:
+    # ADK hands other agents' messages to the model as user turns starting with "For context:".
+    return content.role == "user" and bool(content.parts) and content.parts[0].text == "For context:"
+
+
+def shared_prefix(contents: list, user_content: Optional[types.Content]) -> int:
+    """
+    Returns how many leading contents every persona of the run is sent alike.
+
+    That is the history up to the user message that started the run, plus the
+    notes of the agents that ran before the fan-out. What follows (a persona's
+    own turns, a revision request) differs per persona. Returns 0 when the
+    user message isn't in contents, e.g. when a callback replaced them.
+    """
+    if user_content is None:
+        return 0
+    end = next((index + 1 for index in reversed(range(len(contents))) if contents[index] == user_content), 0)
+    while end and end < len(contents) and _is_context_note(contents[end]):
+        end += 1
+    return end
+
+
+def _purge_local_caches(now: float) -> None:
+    for name in [name for name, cache in _LOCAL_CACHES.items() if cache["expires_at"] < now]:
+        del _LOCAL_CACHES[name]
+
+
+def resolve_local_cache(name: str) -> Optional[list]:
+    """Returns the contents a LocalContextCacheBackend holds under name, or None if it is unknown or expired."""
+    _purge_local_caches(time.time())
+    cache = _LOCAL_CACHES.get(name)
+    return cache["contents"] if cache else None
+
+
+class ContextCacheBackend:
+    """
+    Where shared prompt prefixes are stored.
+
+    A backend uploads a list of contents once and hands back a name that model
+    requests reference through `GenerateContentConfig.cached_content`.
+    """
+
+    async def create(self, model: str, contents: list, ttl_seconds: float) -> str:
+        """Stores contents for model and returns the cache name to reference."""
+        raise NotImplementedError
+
+
+class VertexContextCacheBackend(ContextCacheBackend):
+    """Vertex AI / Gemini API context caching through the google-genai client."""
+
+    def __init__(self, client=None):
+        """
+        Args:
+            client: A google.genai Client; by default one is built from the same
+                GOOGLE_* environment variables ADK uses.
+        """
+        if client is None:
+            from google.genai import Client
+            client = Client()
+        self.client = client
+
+    async def create(self, model: str, contents: list, ttl_seconds: float) -> str:
+        cache = await self.client.aio.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                contents=contents,
+                ttl=f"{int(ttl_seconds)}s",
+                display_name="think_tank_shared_context",
+            ),
+        )
+        return cache.name
+
+
+class LocalContextCacheBackend(ContextCacheBackend):
+    """
+    In-process stand-in for VertexContextCacheBackend.
+
+    Keeps the cached contents in memory, where the fake model resolves
+    `cached_content` names the way Vertex does, and counts uploads to check the
+    prefix is shared.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.creates = 0
+
+    async def create(self, model: str, contents: list, ttl_seconds: float) -> str:
+        now = time.time()
+        # Expired prefixes are dropped here, as the provider would, so a long-lived process doesn't keep them all.
+        _purge_local_caches(now)
+        self.names = [name for name in self.names if name in _LOCAL_CACHES]
+        name = f"local/cachedContents/{uuid.uuid4().hex}"
+        _LOCAL_CACHES[name] = {"model": model, "contents": list(contents), "expires_at": now + ttl_seconds}
+        self.names.append(name)
+        self.creates += 1
+        return name
+
+    def resolve(self, name: str) -> Optional[list]:
+        """Returns the contents cached under name, or None if it is unknown or expired."""
+        return resolve_local_cache(name) if name in self.names else None
+
+
+class SharedContextCache:
+    """
+    Uploads the context the personas share once per run and points every persona at it.
+
+    The personas of one fan-out are sent the same history (problem,
+    clarification answers, earlier turns, see shared_prefix) and differ in
+    their instruction and whatever their own callbacks append. Installed as a
+    before-model callback, this uploads that shared prefix to a backend cache
+    the first time a run sends it, keyed on the run, the model and the prefix
+    alone, and rewrites each request to reference the cache and send only the
+    rest. Context caches can't be combined with a request-level system
+    instruction, so the persona instruction is sent as the last user turn.
+    Prefixes below min_tokens are left alone, since providers only cache
+    prompts above a minimum size.
+    """
+
+    def __init__(
+        self,
+        backend: ContextCacheBackend,
+        min_tokens: int = DEFAULT_MIN_TOKENS,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    ):
+        """
+        Args:
+            backend: Where the shared prefixes are stored.
+            min_tokens: Estimated prefix size below which requests go out unchanged.
+            ttl_seconds: Lifetime of each uploaded prefix.
+        """
+        self.backend = backend
+        self.min_tokens = min_tokens
+        self.ttl_seconds = ttl_seconds
+        self._caches = {}
+
+    @classmethod
+    def from_env(cls) -> Optional["SharedContextCache"]:
+        """
+        Builds the cache from THINK_TANK_CONTEXT_CACHE ("vertex" or "local"),
+        THINK_TANK_CONTEXT_CACHE_MIN_TOKENS and THINK_TANK_CONTEXT_CACHE_TTL.
+        Returns None when context caching is not enabled.
+        """
+        kind = os.getenv("THINK_TANK_CONTEXT_CACHE")
+        if not kind:
+            return None
+        if kind not in ("vertex", "local"):
+            raise ValueError(f"THINK_TANK_CONTEXT_CACHE must be 'vertex' or 'local', got '{kind}'.")
+        backend = VertexContextCacheBackend() if kind == "vertex" else LocalContextCacheBackend()
+        return cls(
+            backend,
+            min_tokens=int(os.getenv("THINK_TANK_CONTEXT_CACHE_MIN_TOKENS", DEFAULT_MIN_TOKENS)),
+            ttl_seconds=float(os.getenv("THINK_TANK_CONTEXT_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+        )
+
+    @staticmethod
+    def make_key(invocation_id: str, model: str, contents: list) -> str:
+        """Returns the key of a shared prefix: the same prefix in the same run shares a cache."""
+        dumped = [content.model_dump(mode="json", exclude_none=True) for content in contents]
+        payload = json.dumps([invocation_id, model or "", dumped])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expire(self, now: float) -> None:
+        for key in [key for key, (_, expires_at) in self._caches.items() if expires_at <= now]:
+            del self._caches[key]
+
+    async def cache_name(self, invocation_id: str, model: str, contents: list) -> str:
+        """Returns the cache holding contents, uploading it if this run hasn't yet."""
+        now = time.time()
+        self._expire(now)
+        key = self.make_key(invocation_id, model, contents)
+        if key not in self._caches:
+            # Concurrent personas await the same upload instead of starting their own.
+            upload = asyncio.ensure_future(self.backend.create(model, contents, self.ttl_seconds))
+            # Stop referencing the cache a little before the backend expires it.
+            self._caches[key] = (upload, now + self.ttl_seconds * 0.9)
+        upload, _ = self._caches[key]
+        try:
+            return await asyncio.shield(upload)
+        except Exception:
+            self._caches.pop(key, None)
+            raise
+
+    async def before_model_callback(self, callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+        """Rewrites the request to reference the shared prefix cache."""
+        if not llm_request.contents or llm_request.tools_dict:
+            return None
+        end = shared_prefix(llm_request.contents, callback_context.user_content)
+        prefix = llm_request.contents[:end]
+        if not prefix or _estimate_tokens(prefix) < self.min_tokens:
+            return None
+        try:
+            name = await self.cache_name(callback_context.invocation_id, llm_request.model, prefix)
+        except Exception:
+            # A failed upload (quota, prefix under the provider minimum) only costs the saving.
+            return None
+        instruction = str(llm_request.config.system_instruction or "")
+        llm_request.contents = llm_request.contents[end:]
+        if instruction:
+            llm_request.contents.append(types.Content(role="user", parts=[types.Part(text=instruction)]))
+        llm_request.config.system_instruction = None
+        llm_request.config.cached_content = name
+        return None
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import random
+import re
+from typing import Optional
+
+
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 32
+DEFAULT_SHINGLE_SIZE = 2
+
+_PRIME = (1 << 61) - 1
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+_HEADING = re.compile(r"^\s*(?:#+\s+.*|\*\*[^*]+\*\*:?)\s*$")
+_CITATION = re.compile(r"\[[^\]]*\]|\([A-ZÅÄÖ][^)]*\)")
+_TRAILING_CITATIONS = re.compile(r"(?:\s*\[[^\]]*\])+\s*$")
+_WORD = re.compile(r"\w+")
+
+
+def split_units(text: str) -> list:
+    """
+    Splits a persona output into ("heading" | "unit", text) items.
+
+    Bullets and paragraph lines are units; indented continuation lines are
+    joined to the bullet above them. Markdown and bold-line headings are kept
+    so the output's structure can be rebuilt around the surviving units.
+    """
+    items = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if _HEADING.match(line):
+            items.append(["heading", line.strip()])
+        elif items and items[-1][0] == "unit" and line[:1].isspace() and not _BULLET.match(line):
+            items[-1][1] += " " + line.strip()
+        else:
+            items.append(["unit", _BULLET.sub("", line).strip()])
+    return [tuple(item) for item in items]
+
+
+def shingles(text: str, size: int = DEFAULT_SHINGLE_SIZE) -> set:
+    """Word n-grams of text with persona citations, case and punctuation removed."""
+    words = _WORD.findall(_CITATION.sub(" ", text).lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+class MinHasher:
+    """MinHash signatures over string shingles, with LSH banding to find candidate pairs."""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, bands: int = DEFAULT_BANDS, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands}).")
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.bands = bands
+        self._permutations = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, shingle_set: set) -> tuple:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+            for shingle in shingle_set
+        ]
+        if not hashes:
+            return (_PRIME,) * self.num_perm
+        return tuple(min((a * value + b) % _PRIME for value in hashes) for a, b in self._permutations)
+
+    def candidate_pairs(self, signatures: list) -> set:
+        """Index pairs whose signatures agree on at least one whole band."""
+        rows = self.num_perm // self.bands
+        pairs = set()
+        for band in range(self.bands):
+            buckets = {}
+            for index, signature in enumerate(signatures):
+                buckets.setdefault(signature[band * rows:(band + 1) * rows], []).append(index)
+            for members in buckets.values():
+                pairs.update((members[i], members[j]) for i in range(len(members)) for j in range(i + 1, len(members)))
+        return pairs
+
+
+class NearDuplicateCollapser:
+    """
+    Collapses near-duplicate bullets across persona outputs before synthesis.
+
+    Every output is split into bullets, each bullet is shingled into word
+    n-grams and MinHashed, and LSH banding proposes the pairs worth comparing.
+    Pairs from different personas whose shingle sets have a Jaccard similarity
+    of at least threshold are merged (transitively) into one bullet: the most
+    detailed wording, cited with every contributing persona. Everything else
+    stays in its persona's section, so attribution is never lost.
+    """
+
+    def __init__(self, threshold: float = 0.5, hasher: Optional[MinHasher] = None):
+        """
+        Args:
+            threshold: Jaccard similarity of two bullets' shingles at which they are merged.
+            hasher: MinHash parameters; the defaults find pairs above ~0.5 reliably.
+        """
+        self.threshold = threshold
+        self.hasher = hasher or MinHasher()
+
+    @classmethod
+    def from_env(cls) -> Optional["NearDuplicateCollapser"]:
+        """
+        Builds the collapser from THINK_TANK_DEDUP_THRESHOLD (0–1).
+        Returns None when near-duplicate collapsing is not enabled.
+        """
+        threshold = os.getenv("THINK_TANK_DEDUP_THRESHOLD")
+        if not threshold:
+            return None
+        return cls(threshold=float(threshold))
+
+    def clusters(self, units: list) -> list:
+        """
+        Groups (persona, text) units into near-duplicate clusters.
+
+        Returns:
+            Lists of unit indexes, one per cluster with more than one persona.
+        """
+        shingle_sets = [shingles(text) for _, text in units]
+        signatures = [self.hasher.signature(shingle_set) for shingle_set in shingle_sets]
+        parent = list(range(len(units)))
+
+        def root(index: int) -> int:
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            return index
+
+        for i, j in self.hasher.candidate_pairs(signatures):
+            if units[i][0] != units[j][0] and jaccard(shingle_sets[i], shingle_sets[j]) >= self.threshold:
+                parent[root(j)] = root(i)
+
+        groups = {}
+        for index in range(len(units)):
+            groups.setdefault(root(index), []).append(index)
+        return [
+            sorted(members) for members in groups.values()
+            if len({units[index][0] for index in members}) > 1
+        ]
+
+    def collapse(self, outputs: dict) -> tuple:
+        """
+        Collapses near-duplicates across the outputs of several personas.
+
+        Args:
+            outputs: Persona name to output text, in the order to render them.
+
+        Returns:
+            (text, stats): the merged bullets with all their citations followed
+            by each persona's remaining output, and unit/character counts.
+        """
+        items = {name: split_units(text or "") for name, text in outputs.items()}
+        units = [(name, text) for name, persona_items in items.items() for kind, text in persona_items if kind == "unit"]
+        clusters = self.clusters(units)
+        merged = {index for members in clusters for index in members}
+
+        shared = []
+        for members in sorted(clusters):
+            personas = list(dict.fromkeys(units[index][0] for index in members))
+            text = _TRAILING_CITATIONS.sub("", max((units[index][1] for index in members), key=len))
+            shared.append(f"- {text} [{', '.join(personas)}]")
+
+        sections = []
+        if shared:
+            sections.append("**Gemensamma punkter (flera personas):**\n" + "\n".join(shared))
+        index = 0
+        for name, persona_items in items.items():
+            lines, heading = [], None
+            for kind, text in persona_items:
+                if kind == "heading":
+                    heading = text
+                    continue
+                if index not in merged:
+                    if heading:
+                        lines.append(heading)
+                        heading = None
+                    lines.append(f"- {text}")
+                index += 1
+            if lines:
+                sections.append(f"**{name}:**\n" + "\n".join(lines))
+
+        text = "\n\n".join(sections)
+        stats = {
+            "units": len(units),
+            "merged_units": len(merged),
+            "clusters": len(clusters),
+            "chars_before": len("\n\n".join(f"**{name}:**\n{output or ''}" for name, output in outputs.items())),
+            "chars_after": len(text),
+        }
+        return text, stats
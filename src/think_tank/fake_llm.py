@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import random
+import re
+import time
+from typing import AsyncGenerator, Optional
+
+from google.adk.models import BaseLlm, LLMRegistry, LlmRequest, LlmResponse
+from google.genai import errors, types
+from pydantic import BaseModel, Field
+
+from think_tank.context_cache import resolve_local_cache
+
+
+WORDS = (
+    "workshop agent strategy team risk pilot data value change culture roadmap metric customer "
+    "process platform stakeholder governance adoption insight scenario option"
+).split()
+
+
+class FakeLlmConfig(BaseModel):
+    """Latency and output-size distributions of the local stand-in model."""
+
+    latency_ms: float = 800.0
+    """Median latency of one model call."""
+
+    latency_sigma: float = 0.35
+    """Sigma of the log-normal latency distribution; 0 makes every call take latency_ms."""
+
+    repeat_latency: bool = True
+    """Identical requests take identical time; False draws each call's latency afresh, as a duplicate request to a real endpoint would."""
+
+    ttft_fraction: float = 0.3
+    """Share of the call latency spent before the first streamed chunk."""
+
+    tokens_mean: int = 250
+    tokens_std: int = 60
+
+    seed: int = 0
+
+    agent_latency_ms: dict[str, float] = Field(default_factory=dict)
+    """Per-agent overrides of latency_ms, keyed by agent name."""
+
+    model_latency_scale: dict[str, float] = Field(default_factory=dict)
+    """Latency multipliers keyed by model name, e.g. to make `fake-fast` quicker than `fake-strong`."""
+
+    transfers: dict[str, str] = Field(default_factory=lambda: {"problem_solver": "facilitator"})
+    """Agents that answer their first turn by transferring to another agent."""
+
+    quota_rpm: float = 0.0
+    """Requests per minute accepted per model before calls fail with a 429 error; 0 disables the quota."""
+
+    quota_burst: float = 1.0
+    """Calls the quota accepts at once after a quiet period."""
+
+
+FAKE_LLM_CONFIG = FakeLlmConfig()
+
+FAKE_LLM_CALLS = []
+"""One (agent name, start, end) tuple per call, in perf_counter seconds."""
+
+FAKE_LLM_REJECTED = []
+"""One (agent name, time) tuple per call rejected by the quota, in perf_counter seconds."""
+
+_quota_buckets = {}
+
+
+def configure(**kwargs) -> FakeLlmConfig:
+    """Updates the process-wide stand-in model configuration."""
+    global FAKE_LLM_CONFIG
+    FAKE_LLM_CONFIG = FAKE_LLM_CONFIG.model_copy(update=kwargs)
+    return FAKE_LLM_CONFIG
+
+
+def _check_quota(model: str, name: str) -> None:
+    """Raises a 429 ClientError, like Vertex does, when model is over FAKE_LLM_CONFIG.quota_rpm."""
+    config = FAKE_LLM_CONFIG
+    if not config.quota_rpm:
+        return
+    now = time.perf_counter()
+    tokens, updated = _quota_buckets.get(model, (config.quota_burst, now))
+    tokens = min(config.quota_burst, tokens + (now - updated) * config.quota_rpm / 60)
+    if tokens < 1:
+        _quota_buckets[model] = (tokens, now)
+        FAKE_LLM_REJECTED.append((name, now))
+        raise errors.ClientError(429, {"error": {
+            "code": 429, "status": "RESOURCE_EXHAUSTED", "message": f"Quota exceeded for {model}.",
+        }})
+    _quota_buckets[model] = (tokens - 1, now)
+
+
+def _resolve_cached_content(llm_request: LlmRequest) -> LlmRequest:
+    """Prepends the contents a request references through `cached_content`, raising the 404 Vertex does for an unknown one."""
+    name = llm_request.config.cached_content if llm_request.config else None
+    if not name:
+        return llm_request
+    cached = resolve_local_cache(name)
+    if cached is None:
+        raise errors.ClientError(404, {"error": {
+            "code": 404, "status": "NOT_FOUND", "message": f"Cached content {name} not found.",
+        }})
+    return llm_request.model_copy(update={"contents": cached + llm_request.contents})
+
+
+def agent_name(llm_request: LlmRequest) -> str:
+    """Recovers the calling agent's name from ADK's identity instruction."""
+    instruction = str(llm_request.config.system_instruction or "") if llm_request.config else ""
+    if not instruction and llm_request.contents:
+        # SharedContextCache moves the instruction into the last user turn.
+        instruction = "".join(part.text or "" for part in llm_request.contents[-1].parts or [])
+    match = re.search(r'internal name is "(\w+)"', instruction)
+    return match.group(1) if match else "unknown"
+
+
+class FakeLlm(BaseLlm):
+    """
+    Deterministic, offline stand-in for Vertex models.
+
+    Any model name starting with `fake-` resolves to this class once the module
+    is imported. Latency and output length are drawn from FAKE_LLM_CONFIG with a
+    random generator seeded on the request, so identical runs behave identically.
+    With a quota_rpm set, calls over the quota fail with the 429 error Vertex raises.
+    Requests referencing a LocalContextCacheBackend prefix are answered as if
+    the prefix had been sent with them.
+    """
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [r"fake-.*"]
+
+    def _rng(self, name: str, llm_request: LlmRequest) -> random.Random:
+        contents = "".join(
+            part.text or "" for content in llm_request.contents for part in content.parts or []
+        )
+        digest = hashlib.sha256(f"{FAKE_LLM_CONFIG.seed}:{name}:{contents}".encode("utf-8")).hexdigest()
+        return random.Random(int(digest[:16], 16))
+
+    def _transfer_target(self, name: str, llm_request: LlmRequest) -> Optional[str]:
+        target = FAKE_LLM_CONFIG.transfers.get(name)
+        if not target or "transfer_to_agent" not in llm_request.tools_dict:
+            return None
+        last = llm_request.contents[-1] if llm_request.contents else None
+        if last and any(part.function_response for part in last.parts or []):
+            return None
+        return target
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        name = agent_name(llm_request)
+        _check_quota(self.model, name)
+        llm_request = _resolve_cached_content(llm_request)
+        rng = self._rng(name, llm_request)
+        config = FAKE_LLM_CONFIG
+        median = config.agent_latency_ms.get(name, config.latency_ms) * config.model_latency_scale.get(self.model, 1.0)
+        latency_rng = rng if config.repeat_latency else random.Random()
+        latency = median * latency_rng.lognormvariate(0, config.latency_sigma) / 1000 if config.latency_sigma else median / 1000
+        start = time.perf_counter()
+
+        target = self._transfer_target(name, llm_request)
+        if target:
+            await asyncio.sleep(latency)
+            FAKE_LLM_CALLS.append((name, start, time.perf_counter()))
+            function_call = types.FunctionCall(name="transfer_to_agent", args={"agent_name": target})
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(function_call=function_call)]))
+            return
+
+        tokens = max(1, int(rng.gauss(config.tokens_mean, config.tokens_std)))
+        words = [rng.choice(WORDS) for _ in range(tokens)]
+        lines = [f"- [{name}] " + " ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        text = "\n".join(lines)
+
+        if stream:
+            await asyncio.sleep(latency * config.ttft_fraction)
+            step = latency * (1 - config.ttft_fraction) / len(lines)
+            for line in lines:
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=line + "\n")]), partial=True)
+                await asyncio.sleep(step)
+        else:
+            await asyncio.sleep(latency)
+        FAKE_LLM_CALLS.append((name, start, time.perf_counter()))
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+
+LLMRegistry.register(FakeLlm)
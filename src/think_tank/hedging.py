@@ -0,0 +1,223 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, AsyncGenerator, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+
+from think_tank.callbacks import add_model_callbacks, llm_agents
+
+
+DEFAULT_WINDOW = 200
+DEFAULT_MIN_SAMPLES = 20
+
+_agent = contextvars.ContextVar("think_tank_hedged_agent", default=None)
+_DONE = object()
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = (len(ordered) - 1) * pct / 100
+    lower = int(index)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (index - lower)
+
+
+class HedgingPolicy:
+    """
+    Hedged model calls for the persona fan-out, whose latency is set by its slowest call.
+
+    Every call's time to first token is kept per agent over the last window
+    calls. Once an agent has min_samples of them, a call that has produced
+    nothing after the percentile of that window gets a duplicate request. The
+    first of the two to produce a response wins and is streamed; the other is
+    cancelled. A call that fails before responding leaves the field to the
+    other one.
+
+    Hedges are capped at max_extra (a fraction) of the calls made, so extra
+    spend is bounded whatever the latency distribution. The latency recorded
+    for a hedged call is the primary's, cut off when the hedge won, so
+    winning hedges don't drag the trigger down.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        max_extra: float = 0.1,
+        window: int = DEFAULT_WINDOW,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+    ):
+        """
+        Args:
+            percentile: Percentile of recent first-token latencies after which a call is hedged.
+            max_extra: Hedges allowed per call made, e.g. 0.1 for at most 10% extra requests.
+            window: Recent calls per agent the percentile is taken over.
+            min_samples: Calls an agent must have made before its calls are hedged.
+        """
+        self.percentile = percentile
+        self.max_extra = max_extra
+        self.min_samples = min_samples
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._counts = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["HedgingPolicy"]:
+        """
+        Builds the policy from THINK_TANK_HEDGE_PERCENTILE, THINK_TANK_HEDGE_MAX_EXTRA and
+        THINK_TANK_HEDGE_MIN_SAMPLES. Returns None when hedging is not enabled.
+        """
+        pct = os.getenv("THINK_TANK_HEDGE_PERCENTILE")
+        if not pct:
+            return None
+        return cls(
+            percentile=float(pct),
+            max_extra=float(os.getenv("THINK_TANK_HEDGE_MAX_EXTRA", 0.1)),
+            min_samples=int(os.getenv("THINK_TANK_HEDGE_MIN_SAMPLES", DEFAULT_MIN_SAMPLES)),
+        )
+
+    def hedge_delay(self, key: str) -> Optional[float]:
+        """Seconds after which a call of key is hedged, or None while there are too few samples."""
+        with self._lock:
+            latencies = list(self._latencies[key])
+        if len(latencies) < self.min_samples:
+            return None
+        return percentile(latencies, self.percentile)
+
+    def allow_hedge(self, key: str) -> bool:
+        """Takes a hedge from the spend cap, or returns False when it is used up."""
+        with self._lock:
+            total_calls = sum(counts["calls"] for counts in self._counts.values())
+            total_hedges = sum(counts["hedges"] for counts in self._counts.values())
+            if total_hedges + 1 > self.max_extra * total_calls:
+                self._counts[key]["denied"] += 1
+                return False
+            self._counts[key]["hedges"] += 1
+            return True
+
+    def record(self, key: str, latency: float, hedge_won: bool) -> None:
+        with self._lock:
+            self._latencies[key].append(latency)
+            self._counts[key]["calls"] += 1
+            self._counts[key]["hedge_wins"] += 1 if hedge_won else 0
+
+    def stats(self) -> dict:
+        """Per-agent calls, hedges, hedge wins and denied hedges, with the hedge and win rates."""
+        with self._lock:
+            counts = {key: dict(values) for key, values in self._counts.items()}
+        for values in counts.values():
+            calls, hedges = values.get("calls", 0), values.get("hedges", 0)
+            values["hedge_rate"] = round(hedges / calls, 4) if calls else 0.0
+            values["win_rate"] = round(values.get("hedge_wins", 0) / hedges, 4) if hedges else 0.0
+        return counts
+
+    def prometheus_text(self) -> str:
+        """Renders the hedging counters in the Prometheus text exposition format."""
+        lines = []
+        counters = [
+            ("think_tank_hedge_calls_total", "calls", "Model calls under the hedging policy."),
+            ("think_tank_hedges_total", "hedges", "Duplicate requests issued for slow calls."),
+            ("think_tank_hedge_wins_total", "hedge_wins", "Hedged calls answered by the duplicate request."),
+            ("think_tank_hedges_denied_total", "denied", "Hedges skipped because the spend cap was used up."),
+        ]
+        stats = sorted(self.stats().items())
+        for name, key, help_text in counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for agent, values in stats:
+                lines.append(f'{name}{{agent="{agent}"}} {values.get(key, 0):g}')
+        return "\n".join(lines) + "\n"
+
+    def before_model_callback(self, callback_context: CallbackContext, llm_request: LlmRequest) -> None:
+        _agent.set(callback_context.agent_name)
+        return None
+
+    def instrument(self, root: BaseAgent) -> None:
+        """Hedges the model calls of every LlmAgent under root."""
+        for agent in llm_agents(root):
+            if isinstance(agent.model, HedgedLlm):
+                continue
+            add_model_callbacks(agent, before=self.before_model_callback, first=True)
+            inner = agent.canonical_model
+            agent.model = HedgedLlm(model=inner.model, inner=inner, policy=self)
+
+
+class _Attempt:
+    """One request to the inner model, pumped into a queue by its own task."""
+
+    def __init__(self, llm: BaseLlm, llm_request: LlmRequest, stream: bool):
+        self.started = time.perf_counter()
+        self.queue = asyncio.Queue()
+        self.task = asyncio.ensure_future(self._pump(llm, llm_request, stream))
+
+    async def _pump(self, llm: BaseLlm, llm_request: LlmRequest, stream: bool) -> None:
+        try:
+            async for llm_response in llm.generate_content_async(llm_request, stream):
+                self.queue.put_nowait(llm_response)
+        except Exception as e:
+            self.queue.put_nowait(e)
+            return
+        self.queue.put_nowait(_DONE)
+
+    def cancel(self) -> None:
+        self.task.cancel()
+
+
+class HedgedLlm(BaseLlm):
+    """A model whose slow calls are raced against a duplicate request, per its HedgingPolicy."""
+
+    inner: BaseLlm
+    policy: Any
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        key = _agent.get() or self.model
+        delay = self.policy.hedge_delay(key)
+        primary = _Attempt(self.inner, llm_request, stream)
+        attempts = {asyncio.ensure_future(primary.queue.get()): primary}
+        winner, first = None, None
+        try:
+            while winner is None:
+                done, _ = await asyncio.wait(attempts, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    delay = None
+                    if self.policy.allow_hedge(key):
+                        # The primary is still using (and may edit) the request, so the hedge gets a copy.
+                        hedge = _Attempt(self.inner, llm_request.model_copy(deep=True), stream)
+                        attempts[asyncio.ensure_future(hedge.queue.get())] = hedge
+                    continue
+                # Prefer an attempt that responded over one that failed at the same moment.
+                getter = min(done, key=lambda future: isinstance(future.result(), BaseException) or future.result() is _DONE)
+                attempt = attempts.pop(getter)
+                item = getter.result()
+                if isinstance(item, BaseException) or item is _DONE:
+                    if attempts:
+                        continue
+                    if item is _DONE:
+                        return
+                    raise item
+                winner, first = attempt, item
+        finally:
+            for getter, attempt in attempts.items():
+                getter.cancel()
+                attempt.cancel()
+            if winner is None:
+                primary.cancel()
+
+        now = time.perf_counter()
+        self.policy.record(key, now - primary.started, hedge_won=winner is not primary)
+        try:
+            item = first
+            while item is not _DONE:
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+                item = await winner.queue.get()
+        finally:
+            winner.cancel()
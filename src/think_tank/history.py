@@ -0,0 +1,263 @@
+import asyncio
+import contextvars
+import logging
+import os
+from typing import Callable, Optional
+
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+from think_tank.callbacks import add_model_callbacks, llm_agents
+from think_tank.prompt import HISTORY_SUMMARY_PROMPT
+
+
+DEFAULT_KEEP_TURNS = 2
+DEFAULT_MAX_TOKENS = 32000
+SUMMARY_STATE_KEY = "history_summary"
+FALLBACK_CHARS = 400
+TRUNCATION_MARK = " […]"
+# Tokens of the instruction ADK gives the summarizer agent around the summary prompt.
+SUMMARY_OVERHEAD = 64
+
+logger = logging.getLogger(__name__)
+
+_summary_prompt = contextvars.ContextVar("think_tank_summary_prompt", default=None)
+
+
+def _tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def _content_tokens(content: types.Content) -> int:
+    return sum(_tokens(part.text or "") for part in content.parts or [])
+
+
+def _content_text(content: types.Content) -> str:
+    return "\n".join(part.text for part in content.parts or [] if part.text)
+
+
+def _cut_longest(contents: list, budget: int, floor: int) -> int:
+    """
+    Cuts the longest texts in contents, none below floor characters, until they fit in budget tokens.
+
+    Returns:
+        The estimated tokens still over budget (0 or less once they fit).
+    """
+    while True:
+        over = sum(_content_tokens(content) for content in contents) - budget
+        texts = [part for content in contents for part in content.parts or [] if part.text]
+        part = max(texts, key=lambda part: len(part.text), default=None)
+        if over <= 0 or part is None or len(part.text) <= floor + len(TRUNCATION_MARK):
+            return over
+        text = part.text[:-len(TRUNCATION_MARK)] if part.text.endswith(TRUNCATION_MARK) else part.text
+        keep = max(floor, len(part.text) - over * 4 - len(TRUNCATION_MARK))
+        part.text = text[:keep] + TRUNCATION_MARK
+
+
+def is_user_turn(content: types.Content) -> bool:
+    """Whether content is a message the user typed, as opposed to another agent's or a tool's output."""
+    if content.role != "user" or not content.parts:
+        return False
+    if any(part.function_response for part in content.parts):
+        return False
+    # ADK hands other agents' messages to the model as user turns starting with "For context:".
+    return content.parts[0].text != "For context:"
+
+
+def split_turns(contents: list) -> list:
+    """Groups contents into turns, each starting at a user message; anything before the first one is its own group."""
+    turns = []
+    for content in contents:
+        if is_user_turn(content) or not turns:
+            turns.append([])
+        turns[-1].append(content)
+    return turns
+
+
+class HistoryWindow:
+    """
+    Keeps the history an agent is sent to a fixed window, however long the session gets.
+
+    Installed as a before-model callback, it sends the last keep_turns user
+    turns (with every agent message and tool call that followed them)
+    verbatim and replaces everything older with a rolling summary kept in
+    `state["history_summary"]`. The summary is extended by one call of the
+    `history_summarizer` agent per turn leaving the window, on the turn that
+    evicts it, so its cost does not grow with the session either. That agent
+    runs inside the invocation like any other, so instrument it alongside the
+    root (scheduler, telemetry, cassette). If the summary call fails, the turn
+    is folded in as truncated excerpts instead.
+
+    Every request is then held under max_tokens: older kept turns are
+    dropped, then the longest texts are cut to excerpts, then whole messages
+    are dropped oldest first, and last the latest user message itself is
+    cut. Only an instruction longer than max_tokens on its own goes over.
+    At the first call of each new run, persona outputs left in state by
+    earlier runs are cleared, since their content now lives in the history
+    and its summary.
+    """
+
+    def __init__(
+        self,
+        keep_turns: int = DEFAULT_KEEP_TURNS,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        summary_model: Optional[str] = None,
+        stale_keys: Optional[Callable[[], list]] = None,
+    ):
+        """
+        Args:
+            keep_turns: User turns sent verbatim, the current one included.
+            max_tokens: Estimated tokens per request (instruction included) never exceeded.
+            summary_model: The model that writes the rolling summary; None keeps excerpts instead.
+            stale_keys: Returns the state keys (e.g. persona outputs) to clear at the start of each run.
+        """
+        self.keep_turns = max(1, keep_turns)
+        self.max_tokens = max_tokens
+        self.summary_model = summary_model
+        self.stale_keys = stale_keys
+        self.summarizer = LlmAgent(
+            name="history_summarizer",
+            model=summary_model,
+            description="Folds the turns leaving the history window into the rolling conversation summary.",
+            include_contents="none",
+            before_model_callback=self._summary_request,
+        ) if summary_model else None
+        self._folding = {}
+
+    @classmethod
+    def from_env(cls, summary_model: Optional[str] = None, stale_keys: Optional[Callable[[], list]] = None) -> Optional["HistoryWindow"]:
+        """
+        Builds the window from THINK_TANK_HISTORY_TURNS and THINK_TANK_HISTORY_MAX_TOKENS.
+        Returns None when history windowing is not enabled.
+        """
+        keep_turns = os.getenv("THINK_TANK_HISTORY_TURNS")
+        if not keep_turns:
+            return None
+        return cls(
+            keep_turns=int(keep_turns),
+            max_tokens=int(os.getenv("THINK_TANK_HISTORY_MAX_TOKENS", DEFAULT_MAX_TOKENS)),
+            summary_model=summary_model,
+            stale_keys=stale_keys,
+        )
+
+    def instrument(self, root: BaseAgent) -> None:
+        """Windows the history of every LlmAgent under root that is sent the conversation."""
+        for agent in llm_agents(root):
+            if agent.include_contents != "none":
+                # Windowing goes first, so notes other callbacks append aren't taken for user turns and
+                # caches key on the windowed request; the ceiling goes last, to count what they add.
+                add_model_callbacks(agent, before=self.before_model_callback, first=True)
+                add_model_callbacks(agent, before=self.enforce_ceiling)
+
+    def _clear_stale(self, callback_context: CallbackContext) -> None:
+        ctx = callback_context._invocation_context
+        state = callback_context.state
+        if state.get("history_window_run") == ctx.invocation_id:
+            return
+        state["history_window_run"] = ctx.invocation_id
+        written = set()
+        for event in ctx.session.events:
+            if event.invocation_id == ctx.invocation_id and event.actions and event.actions.state_delta:
+                written.update(event.actions.state_delta)
+        for key in self.stale_keys() if self.stale_keys else []:
+            if state.get(key) and key not in written:
+                state[key] = ""
+
+    @staticmethod
+    def _summary_request(callback_context: CallbackContext, llm_request: LlmRequest) -> None:
+        llm_request.contents = [types.Content(role="user", parts=[types.Part(text=_summary_prompt.get())])]
+        return None
+
+    async def _summarize(self, ctx: InvocationContext, summary: str, turns: list) -> str:
+        transcript = "\n\n".join(_content_text(content) for turn in turns for content in turn)
+        # The summary call is held to the ceiling too; what doesn't fit is cut from the middle of the transcript.
+        room = max(FALLBACK_CHARS, (self.max_tokens - SUMMARY_OVERHEAD - _tokens(HISTORY_SUMMARY_PROMPT + summary)) * 4)
+        if len(transcript) > room:
+            transcript = transcript[:room // 2] + "\n[…]\n" + transcript[-(room // 2):]
+        if self.summarizer:
+            try:
+                # Read by _summary_request, which the summarizer runs in this task.
+                _summary_prompt.set(HISTORY_SUMMARY_PROMPT.format(summary=summary or "-", transcript=transcript))
+                text = ""
+                async for event in self.summarizer.run_async(ctx):
+                    if event.content and not event.partial:
+                        text += "".join(part.text or "" for part in event.content.parts or [])
+                if text.strip():
+                    return text.strip()
+                logger.warning("History summary came back empty; folding the turns in as excerpts.")
+            except Exception:
+                logger.warning("History summary failed; folding the turns in as excerpts.", exc_info=True)
+        excerpts = [
+            _content_text(content)[:FALLBACK_CHARS] for turn in turns for content in turn if _content_text(content)
+        ]
+        return "\n".join(filter(None, [summary] + [f"- {excerpt}" for excerpt in excerpts]))
+
+    async def summary(self, callback_context: CallbackContext, turns: list, folded: int) -> str:
+        """The summary of the first folded turns, extending the stored one (concurrent callers share one call)."""
+        stored = callback_context.state.get(SUMMARY_STATE_KEY) or {"turns": 0, "text": ""}
+        if stored["turns"] >= folded:
+            return stored["text"]
+        key = (callback_context._invocation_context.session.id, folded)
+        if key not in self._folding:
+            self._folding[key] = asyncio.ensure_future(self._summarize(
+                callback_context._invocation_context, stored["text"], turns[stored["turns"]:folded]
+            ))
+        folding = self._folding[key]
+        try:
+            text = await asyncio.shield(folding)
+        except BaseException:
+            # A call that failed is not handed to later callers; one only this caller stopped waiting for is.
+            if folding.done() and self._folding.get(key) is folding:
+                del self._folding[key]
+            raise
+        callback_context.state[SUMMARY_STATE_KEY] = {"turns": folded, "text": text}
+        # Dropped only once the summary is stored, so a later caller either joins the call or finds its result.
+        if self._folding.get(key) is folding:
+            del self._folding[key]
+        return text
+
+    def enforce_ceiling(self, callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+        """Cuts the request, as the other callbacks left it, down to max_tokens."""
+        system = str(llm_request.config.system_instruction or "") if llm_request.config else ""
+        budget = self.max_tokens - _tokens(system)
+        turns = split_turns(llm_request.contents)
+        # The leading group (summary, anything before the first user message) and the latest turn always stay.
+        fixed = turns.pop(0) if turns and not is_user_turn(turns[0][0]) else []
+        contents = list(llm_request.contents)
+        while len(turns) > 1 and sum(_content_tokens(content) for content in contents) > budget:
+            turns.pop(0)
+            contents = fixed + [content for turn in turns for content in turn]
+        over = _cut_longest(contents, budget, floor=FALLBACK_CHARS)
+        # Still over: whole messages go, oldest first, keeping the latest user message.
+        latest = turns[-1][0] if turns and is_user_turn(turns[-1][0]) else None
+        while over > 0 and any(content is not latest for content in contents):
+            contents.pop(next(index for index, content in enumerate(contents) if content is not latest))
+            # A tool response whose call was dropped would be rejected by the model.
+            while contents and contents[0] is not latest and any(part.function_response for part in contents[0].parts or []):
+                contents.pop(0)
+            over = sum(_content_tokens(content) for content in contents) - budget
+        if over > 0:
+            _cut_longest(contents, budget, floor=0)
+        llm_request.contents = contents
+        return None
+
+    async def before_model_callback(self, callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+        """Replaces the turns before the window with the rolling summary."""
+        self._clear_stale(callback_context)
+        turns = split_turns(llm_request.contents)
+        user_turns = [turn for turn in turns if is_user_turn(turn[0])]
+        folded = len(user_turns) - self.keep_turns
+        if folded <= 0:
+            return None
+        prefix = turns[0] if not is_user_turn(turns[0][0]) else []
+        text = await self.summary(callback_context, user_turns, folded)
+        note = types.Content(role="user", parts=[
+            types.Part(text="For context:"),
+            types.Part(text=f"[conversation summary] Earlier in this conversation:\n{text}"),
+        ])
+        llm_request.contents = prefix + [note] + [content for turn in user_turns[folded:] for content in turn]
+        return None
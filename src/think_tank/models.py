@@ -0,0 +1,95 @@
+import fnmatch
+import os
+from typing import Optional
+
+
+MODEL_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models.yaml")
+
+
+class ModelPolicy:
+    """
+    Which model each agent runs on, as a latency tier per agent.
+
+    The config maps agent names (or fnmatch patterns such as `*_synthesizer`)
+    to a tier like "fast" or "strong", or directly to a model name, and maps
+    each tier to a model. Agents not in the map use the tier they are built
+    with (a persona's `tier`), else the default tier. A tier without a model
+    falls back to VERTEX_AI_MODEL, so an unconfigured policy runs everything
+    on one model as before.
+    """
+
+    def __init__(self, tiers: dict, agents: Optional[dict] = None, default_tier: str = "standard", default_model: Optional[str] = None):
+        """
+        Args:
+            tiers: Tier name to model name (None uses default_model).
+            agents: Agent name or pattern to a tier or a model name, first match wins.
+            default_tier: The tier of agents neither mapped nor built with a tier.
+            default_model: The model of tiers without one; defaults to VERTEX_AI_MODEL.
+        """
+        self.tiers = dict(tiers)
+        self.agents = dict(agents or {})
+        self.default_tier = default_tier
+        self.default_model = default_model or os.getenv("VERTEX_AI_MODEL")
+
+    @classmethod
+    def from_file(cls, path: str) -> "ModelPolicy":
+        """
+        Loads the policy from a YAML file with `tiers`, `agents` and `default_tier`.
+
+        THINK_TANK_MODEL_<TIER> (e.g. THINK_TANK_MODEL_FAST) overrides the model of a tier.
+        """
+        import yaml
+
+        with open(path, encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+        tiers = dict(config.get("tiers") or {})
+        for tier in list(tiers):
+            tiers[tier] = os.getenv(f"THINK_TANK_MODEL_{tier.upper()}") or tiers[tier]
+        default_tier = config.get("default_tier", "standard")
+        if default_tier not in tiers:
+            raise ValueError(f"{path}: default_tier '{default_tier}' is not one of the tiers {list(tiers)}")
+        return cls(tiers, config.get("agents") or {}, default_tier)
+
+    @classmethod
+    def from_env(cls) -> "ModelPolicy":
+        """Loads the policy from THINK_TANK_MODEL_CONFIG, defaulting to the bundled models.yaml."""
+        return cls.from_file(os.getenv("THINK_TANK_MODEL_CONFIG") or MODEL_CONFIG)
+
+    def _entry(self, agent_name: str) -> Optional[str]:
+        if agent_name in self.agents:
+            return self.agents[agent_name]
+        for pattern, entry in self.agents.items():
+            if fnmatch.fnmatchcase(agent_name, pattern):
+                return entry
+        return None
+
+    def tier(self, agent_name: str, tier: Optional[str] = None) -> Optional[str]:
+        """The agent's tier, or None when the config pins it to a model."""
+        entry = self._entry(agent_name)
+        if entry is not None:
+            return entry if entry in self.tiers else None
+        return tier if tier in self.tiers else self.default_tier
+
+    def model(self, agent_name: str, tier: Optional[str] = None) -> str:
+        """
+        The model agent_name runs on.
+
+        Args:
+            agent_name: The agent's name.
+            tier: The tier the agent is built with, used unless the config maps the agent.
+        """
+        entry = self._entry(agent_name)
+        if entry is not None and entry not in self.tiers:
+            return entry
+        return self.tiers[self.tier(agent_name, tier)] or self.default_model
+
+
+_default_policy = None
+
+
+def default_policy() -> ModelPolicy:
+    """The process-wide policy built by ModelPolicy.from_env() on first use."""
+    global _default_policy
+    if _default_policy is None:
+        _default_policy = ModelPolicy.from_env()
+    return _default_policy
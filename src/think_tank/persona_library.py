@@ -0,0 +1,185 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from typing import Callable, Optional
+
+
+PERSONA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "personas")
+INDEX_DIR = os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "think_tank")
+# Bump when persona_schema changes, so stale indexes are recompiled.
+INDEX_VERSION = 3
+DEFAULT_RELOAD_INTERVAL = 2.0
+
+
+class PersonaLibrary:
+    """
+    Persona definitions loaded from a directory of YAML files.
+
+    The YAML is parsed and validated once and compiled into a pickled index
+    (names in priority order, tag -> personas, rendered instructions) in the
+    user's cache directory, never in the (possibly installed) package. Later loads only stat the files and unpickle the index, so YAML
+    isn't even imported while the library is unchanged.
+
+    refresh() re-stats the files at most every reload_interval seconds and
+    recompiles when one was added, edited or removed, then runs the on_reload
+    hooks. An edit that fails validation keeps the previous index and is
+    reported in last_error, so a running service never loses its personas.
+    """
+
+    def __init__(
+        self,
+        directory: str = PERSONA_DIR,
+        index_path: Optional[str] = None,
+        reload_interval: float = DEFAULT_RELOAD_INTERVAL,
+    ):
+        """
+        Args:
+            directory: The directory holding one `<name>.yaml` file per persona.
+            index_path: Where the compiled index is cached; defaults to a file per
+                library directory under ~/.cache/think_tank.
+            reload_interval: Minimum seconds between checks for changed files; 0
+                checks on every refresh(), a negative value disables hot reload.
+        """
+        self.directory = directory
+        self.index_path = index_path or self.default_index_path(directory)
+        self.reload_interval = reload_interval
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._hooks = []
+        self._checked_at = time.monotonic()
+        self._index = self._load(self._fingerprint(), strict=True)
+
+    @classmethod
+    def from_env(cls) -> "PersonaLibrary":
+        """
+        Builds the library from THINK_TANK_PERSONA_DIR, THINK_TANK_PERSONA_INDEX and
+        THINK_TANK_PERSONA_RELOAD_INTERVAL, defaulting to the bundled personas.
+        """
+        return cls(
+            directory=os.getenv("THINK_TANK_PERSONA_DIR") or PERSONA_DIR,
+            index_path=os.getenv("THINK_TANK_PERSONA_INDEX") or None,
+            reload_interval=float(os.getenv("THINK_TANK_PERSONA_RELOAD_INTERVAL", DEFAULT_RELOAD_INTERVAL)),
+        )
+
+    @staticmethod
+    def default_index_path(directory: str) -> str:
+        digest = hashlib.sha256(os.path.abspath(directory).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(INDEX_DIR, f"persona_index_{digest}.pickle")
+
+    def _fingerprint(self) -> tuple:
+        files = []
+        for entry in sorted(os.scandir(self.directory), key=lambda entry: entry.name):
+            if entry.is_file() and entry.name.endswith((".yaml", ".yml")):
+                stat = entry.stat()
+                files.append((entry.name, stat.st_mtime_ns, stat.st_size))
+        return (INDEX_VERSION, tuple(files))
+
+    def _parse(self, fingerprint: tuple) -> dict:
+        # Only needed when the index is stale; YAML and pydantic stay out of a warm start.
+        import yaml
+        from pydantic import ValidationError
+
+        from think_tank.persona_schema import PersonaSpec, compile_index
+
+        specs = {}
+        for filename, _, _ in fingerprint[1]:
+            path = os.path.join(self.directory, filename)
+            with open(path, encoding="utf-8") as f:
+                data = yaml.safe_load(f)
+            try:
+                spec = PersonaSpec.model_validate(data)
+            except ValidationError as e:
+                raise ValueError(f"{path}: invalid persona definition\n{e}") from e
+            if spec.name in specs:
+                raise ValueError(f"{path}: persona '{spec.name}' is already defined")
+            specs[spec.name] = spec
+        return compile_index(list(specs.values()), fingerprint)
+
+    def _load(self, fingerprint: tuple, strict: bool) -> dict:
+        try:
+            with open(self.index_path, "rb") as f:
+                index = pickle.load(f)
+            if index.get("fingerprint") == fingerprint:
+                return index
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+
+        try:
+            index = self._parse(fingerprint)
+        except Exception as e:
+            if strict:
+                raise
+            self.last_error = str(e)
+            return self._index
+        self.last_error = None
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            # An unwritable cache directory only costs the YAML parse on the next start.
+            pass
+        return index
+
+    def on_reload(self, hook: Callable[["PersonaLibrary"], None]) -> None:
+        """Calls hook with the library after every reload that changed it."""
+        self._hooks.append(hook)
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reloads the library if its files changed.
+
+        Returns:
+            True when a new index was loaded.
+        """
+        now = time.monotonic()
+        if not force and (self.reload_interval < 0 or now - self._checked_at < self.reload_interval):
+            return False
+        with self._lock:
+            self._checked_at = now
+            fingerprint = self._fingerprint()
+            if fingerprint == self._index["fingerprint"]:
+                return False
+            index = self._load(fingerprint, strict=False)
+            if index is self._index:
+                return False
+            self._index = index
+        for hook in self._hooks:
+            hook(self)
+        return True
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index["personas"]
+
+    def names(self) -> list:
+        """Persona names in priority order."""
+        return list(self._index["names"])
+
+    def get(self, name: str) -> dict:
+        """The compiled spec of a persona, including its rendered `instruction`."""
+        return self._index["personas"][name]
+
+    def with_tag(self, tag: str) -> list:
+        """Names of the personas tagged with tag, in priority order."""
+        return list(self._index["tags"].get(tag, []))
+
+    def priority(self, name: str) -> int:
+        return self._index["personas"][name]["priority"]
+
+    def instruction(self, name: str) -> str:
+        return self._index["personas"][name]["instruction"]
+
+
+_default_library = None
+
+
+def default_library() -> PersonaLibrary:
+    """The process-wide library built by PersonaLibrary.from_env() on first use."""
+    global _default_library
+    if _default_library is None:
+        _default_library = PersonaLibrary.from_env()
+    return _default_library
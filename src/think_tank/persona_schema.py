@@ -0,0 +1,74 @@
+import re
+from typing import Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+
+class PersonaSpec(BaseModel):
+    """One persona definition, as written in a library YAML file."""
+
+    name: str
+    """Agent name; also the prefix of the persona's `<name>_output` state key."""
+
+    title: str
+    description: str
+    tone: Optional[str] = None
+    tools: list[str] = Field(default_factory=list)
+    forbidden_shortcuts: list[str] = Field(default_factory=list)
+    output_format: list[str]
+    numbered_output: bool = False
+    constraints: str = ""
+    output_only: bool = False
+    """Ends the instruction with "Output *ONLY* above format."."""
+
+    tags: list[str] = Field(default_factory=list)
+    """Capabilities the selection rules look personas up by."""
+
+    priority: int = 100
+    """Fan-out order when the selection is cut down to the persona budget; lower runs first."""
+
+    tier: Optional[str] = None
+    """Latency tier of the model the persona runs on (a tier of models.yaml, e.g. "fast"); None uses the default tier."""
+
+    @field_validator("name")
+    @classmethod
+    def _identifier(cls, value: str) -> str:
+        if not re.fullmatch(r"[a-z][a-z0-9_]*", value):
+            raise ValueError("must be a lower-case identifier, e.g. 'scenario_planner'")
+        return value
+
+
+def render_instruction(spec: PersonaSpec) -> str:
+    """Builds the persona's agent instruction from its spec."""
+    lines = [f"ROLE: {spec.title}"]
+    if spec.tools:
+        lines.append(f"TOOLKIT: {', '.join(spec.tools)}.")
+    if spec.tone:
+        lines.append(f"TONE: {spec.tone}")
+    lines.append("OUTPUT FORMAT:")
+    for number, section in enumerate(spec.output_format, 1):
+        lines.append(f"{number}. {section}" if spec.numbered_output else f"- {section}")
+    lines.append("")
+    if spec.constraints:
+        lines.append(f"Constraints: {spec.constraints}")
+    if spec.forbidden_shortcuts:
+        lines.append(f"Never take these shortcuts: {'; '.join(spec.forbidden_shortcuts)}.")
+    if spec.output_only:
+        lines.append("")
+        lines.append("Output *ONLY* above format.")
+    return "\n" + "\n".join(lines) + "\n"
+
+
+def compile_index(specs: list, fingerprint: tuple) -> dict:
+    """Compiles validated specs into the lookup structure stored in the binary index."""
+    ordered = sorted(specs, key=lambda spec: (spec.priority, spec.name))
+    tags = {}
+    for spec in ordered:
+        for tag in spec.tags:
+            tags.setdefault(tag, []).append(spec.name)
+    return {
+        "fingerprint": fingerprint,
+        "names": [spec.name for spec in ordered],
+        "personas": {spec.name: {**spec.model_dump(), "instruction": render_instruction(spec)} for spec in ordered},
+        "tags": tags,
+    }
@@ -38,4 +38,23 @@ TASKS:
 5. Output only the question list—no additional explanation or recommendations.
 
 Constraints: Exactly 4 or 5 questions, each ≤ 25 words, no answers or assumptions, comply with privacy (don’t request sensitive personal data unless absolutely required).
-"""
\ No newline at end of file
+"""
+
+HISTORY_SUMMARY_PROMPT = """
+ROLE: Conversation summariser.
+
+Extend the running summary of a conversation between a user and a multi‑agent think tank with the turns below,
+which are about to leave the model's context.
+
+**Summary so far:**
+{summary}
+
+**Turns to fold in:**
+{transcript}
+
+RULES:
+- Keep the user's problem, constraints, answers to clarification questions and any decisions.
+- Keep each persona's key conclusions and recommendations in one line, cited with the persona name.
+- Drop wording, formatting and repetition; never invent facts.
+- ≤ 250 words. Output *ONLY* the updated summary.
+"""
@@ -0,0 +1,47 @@
+from typing import Callable
+
+from google.adk.agents import BaseAgent
+
+
+class AgentRegistry:
+    """
+    Named agent factories whose agents are only built on first use.
+
+    Registering an agent costs a dictionary entry; the agent itself (and
+    whatever its callbacks set up) is constructed the first time get() asks
+    for it and reused afterwards. Build hooks let caches and telemetry attach
+    to agents that don't exist yet.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._agents = {}
+        self._hooks = []
+
+    def register(self, name: str, factory: Callable[[], BaseAgent]) -> None:
+        """Registers a factory building the agent called name."""
+        self._factories[name] = factory
+
+    def names(self) -> list:
+        """Names of every registered agent, built or not, in registration order."""
+        return list(self._factories)
+
+    def built(self) -> list:
+        """The agents built so far, in build order."""
+        return list(self._agents.values())
+
+    def on_build(self, hook: Callable[[BaseAgent], None]) -> None:
+        """Calls hook with every agent built after this call."""
+        self._hooks.append(hook)
+
+    def get(self, name: str) -> BaseAgent:
+        """Returns the agent called name, building it on first use."""
+        agent = self._agents.get(name)
+        if agent is None:
+            if name not in self._factories:
+                raise KeyError(f"No agent named '{name}' is registered.")
+            agent = self._factories[name]()
+            for hook in self._hooks:
+                hook(agent)
+            self._agents[name] = agent
+        return agent
@@ -0,0 +1,288 @@
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Any, AsyncGenerator, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+
+from think_tank.callbacks import add_model_callbacks, llm_agents
+
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+"""Priority classes, most urgent first. A waiting call is served before any call of a later class."""
+
+PRIORITY_STATE_KEY = "priority"
+QUOTA_ERROR_CODES = {"429", "RESOURCE_EXHAUSTED"}
+
+_priority = contextvars.ContextVar("think_tank_priority", default="interactive")
+# The session's priority for the model call being made, rewritten by the before-model callback of every call.
+_call_priority = contextvars.ContextVar("think_tank_call_priority", default=None)
+
+
+def is_quota_error(error: Any) -> bool:
+    """Whether an exception or error response is a quota (HTTP 429) rejection."""
+    code = getattr(error, "code", None) or getattr(error, "error_code", None)
+    status = getattr(error, "status", None)
+    return str(code) in QUOTA_ERROR_CODES or str(status) in QUOTA_ERROR_CODES
+
+
+class _Waiter:
+    __slots__ = ("rank", "seq", "loop", "future")
+
+    def __init__(self, rank: int, seq: int, loop: asyncio.AbstractEventLoop):
+        self.rank = rank
+        self.seq = seq
+        self.loop = loop
+        self.future = None
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.rank, self.seq) < (other.rank, other.seq)
+
+    def wake(self) -> None:
+        future = self.future
+        if future is not None:
+            self.loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+
+class _Lane:
+    """The token bucket of one model and the calls waiting for it, by priority then arrival."""
+
+    def __init__(self, rpm: Optional[float], burst: float):
+        self.rate = rpm / 60 if rpm else None
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiters = []
+
+    def reserve(self, now: float) -> float:
+        """Takes a token and returns 0, or returns the seconds until one is available."""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.rate is None:
+            return 0.0
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def wake_head(self) -> None:
+        if self.waiters:
+            self.waiters[0].wake()
+
+
+class QuotaScheduler:
+    """
+    Process-wide admission control for model calls, shared by every session.
+
+    Each model has a token bucket refilled at its requests-per-minute limit.
+    A call waits for a token in a queue ordered by priority class, then by
+    arrival, so interactive sessions overtake batch jobs without starving
+    anything of its own class. When a call is still rejected with a quota
+    error (HTTP 429), the whole model backs off: the bucket is emptied and no
+    call is admitted for a jittered, exponentially growing delay, after which
+    the rejected call queues again. Partial streams are never retried.
+
+    The scheduler wraps every LlmAgent's model in a ScheduledLlm. The priority
+    of a call comes from the session's `priority` state ("interactive" or
+    "batch"), else from the enclosing priority() block, else "interactive".
+    """
+
+    def __init__(
+        self,
+        rpm: Optional[dict] = None,
+        default_rpm: Optional[float] = None,
+        burst: Optional[float] = None,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+    ):
+        """
+        Args:
+            rpm: Model name to requests per minute.
+            default_rpm: Requests per minute of models not in rpm; None leaves them
+                unlimited (quota errors still back off).
+            burst: Tokens a bucket holds, i.e. calls admitted at once after a quiet
+                period; defaults to a tenth of the minute's quota, at least 1.
+            max_retries: Quota errors retried per call before the error is raised.
+            base_delay: Backoff ceiling in seconds after the first quota error; doubles per retry.
+            max_delay: Upper bound of the backoff ceiling.
+        """
+        self.rpm = dict(rpm or {})
+        self.default_rpm = default_rpm
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = defaultdict(float)
+        self._lanes = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_env(cls) -> Optional["QuotaScheduler"]:
+        """
+        Builds the scheduler from THINK_TANK_RATE_LIMITS ("model=rpm,model=rpm"),
+        THINK_TANK_RATE_LIMIT_RPM (the default for other models), THINK_TANK_RATE_BURST
+        and THINK_TANK_QUOTA_RETRIES. Returns None when no limit is set.
+        """
+        limits = os.getenv("THINK_TANK_RATE_LIMITS", "")
+        default_rpm = os.getenv("THINK_TANK_RATE_LIMIT_RPM")
+        if not limits and not default_rpm:
+            return None
+        rpm = {}
+        for item in limits.split(","):
+            model, _, value = item.partition("=")
+            if model.strip():
+                rpm[model.strip()] = float(value)
+        burst = os.getenv("THINK_TANK_RATE_BURST")
+        return cls(
+            rpm=rpm,
+            default_rpm=float(default_rpm) if default_rpm else None,
+            burst=float(burst) if burst else None,
+            max_retries=int(os.getenv("THINK_TANK_QUOTA_RETRIES", 5)),
+        )
+
+    @staticmethod
+    @contextlib.contextmanager
+    def priority(name: str):
+        """Runs the model calls made inside the block (and the tasks it starts) with this priority."""
+        if name not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{name}', expected one of {list(PRIORITIES)}.")
+        token = _priority.set(name)
+        try:
+            yield
+        finally:
+            _priority.reset(token)
+
+    def _lane(self, model: str) -> _Lane:
+        lane = self._lanes.get(model)
+        if lane is None:
+            rpm = self.rpm.get(model, self.default_rpm)
+            burst = self.burst or max(1.0, (rpm or 0) / 10)
+            lane = self._lanes[model] = _Lane(rpm, burst)
+        return lane
+
+    async def acquire(self, model: str, priority: str = "interactive") -> float:
+        """
+        Waits until a call to model may be sent.
+
+        Returns:
+            The seconds spent waiting.
+        """
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        with self._lock:
+            lane = self._lane(model)
+            waiter = _Waiter(PRIORITIES[priority], next(self._seq), loop)
+            heapq.heappush(lane.waiters, waiter)
+        try:
+            while True:
+                with self._lock:
+                    delay = None
+                    if lane.waiters[0] is waiter:
+                        delay = lane.reserve(time.monotonic())
+                        if delay <= 0:
+                            heapq.heappop(lane.waiters)
+                            lane.wake_head()
+                            waited = time.monotonic() - start
+                            self.stats[f"{priority}_calls"] += 1
+                            self.stats[f"{priority}_wait_s"] += waited
+                            return waited
+                    waiter.future = loop.create_future()
+                try:
+                    await asyncio.wait_for(waiter.future, delay)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._lock:
+                if waiter in lane.waiters:
+                    lane.waiters.remove(waiter)
+                    heapq.heapify(lane.waiters)
+                    lane.wake_head()
+            raise
+
+    def backoff(self, model: str, attempt: int) -> float:
+        """
+        Records a quota error for model and holds the model's queue for a jittered delay.
+
+        Returns:
+            The delay in seconds.
+        """
+        ceiling = min(self.max_delay, self.base_delay * 2 ** attempt)
+        delay = random.uniform(ceiling / 2, ceiling)
+        with self._lock:
+            lane = self._lane(model)
+            lane.tokens = 0.0
+            lane.blocked_until = max(lane.blocked_until, time.monotonic() + delay)
+            self.stats["quota_errors"] += 1
+            self.stats["backoff_s"] += delay
+        return delay
+
+    def before_model_callback(self, callback_context: CallbackContext, llm_request: LlmRequest) -> None:
+        # Set for every call, so a batch session's priority never outlives its own call.
+        priority = callback_context.state.get(PRIORITY_STATE_KEY)
+        _call_priority.set(priority if priority in PRIORITIES else None)
+        return None
+
+    def instrument(self, root: BaseAgent) -> None:
+        """Routes the model calls of every LlmAgent under root through the scheduler."""
+        for agent in llm_agents(root):
+            if isinstance(agent.model, ScheduledLlm):
+                continue
+            add_model_callbacks(agent, before=self.before_model_callback, first=True)
+            inner = agent.canonical_model
+            agent.model = ScheduledLlm(model=inner.model, inner=inner, scheduler=self)
+
+
+_default_scheduler = None
+_default_scheduler_built = False
+
+
+def default_scheduler() -> Optional[QuotaScheduler]:
+    """The process-wide scheduler built by QuotaScheduler.from_env() on first use, or None when no limit is set."""
+    global _default_scheduler, _default_scheduler_built
+    if not _default_scheduler_built:
+        _default_scheduler = QuotaScheduler.from_env()
+        _default_scheduler_built = True
+    return _default_scheduler
+
+
+class ScheduledLlm(BaseLlm):
+    """A model whose calls wait for the QuotaScheduler and are retried on quota errors."""
+
+    inner: BaseLlm
+    scheduler: Any
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        priority = _call_priority.get() or _priority.get()
+        attempt = 0
+        while True:
+            await self.scheduler.acquire(self.model, priority)
+            started = False
+            try:
+                async for llm_response in self.inner.generate_content_async(llm_request, stream):
+                    if not started and is_quota_error(llm_response) and attempt < self.scheduler.max_retries:
+                        break
+                    started = True
+                    yield llm_response
+                else:
+                    return
+            except Exception as e:
+                if started or not is_quota_error(e) or attempt >= self.scheduler.max_retries:
+                    raise
+            await asyncio.sleep(self.scheduler.backoff(self.model, attempt))
+            attempt += 1
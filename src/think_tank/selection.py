@@ -0,0 +1,146 @@
+import os
+import re
+
+from think_tank.persona_library import PersonaLibrary, default_library
+
+DEFAULT_MAX_PERSONAS = 6
+
+# Persona groups reduced by one sub-synthesizer each in the tiered synthesis mode.
+PERSONA_CLUSTERS = {
+    "strategy": ["mckinsey", "aiml_lead", "debono_hats"],
+    "people_change": ["org_psychologist", "change_management", "ux_design_thinker"],
+    "risk_futures": ["devils_advocate", "ai_ethics", "scenario_planner"],
+}
+DEFAULT_CLUSTER = "strategy"
+
+BROAD_SCOPE_TERMS = [
+    "strategy", "strategi", "company", "företag", "organisation", "organization", "transformation",
+    "business model", "affärsmodell", "market", "marknad", "portfolio", "enterprise", "roadmap",
+]
+LONG_HORIZON_TERMS = [
+    "long-term", "long term", "långsiktig", "future", "framtid", "decade", "vision", "2030", "2035",
+]
+REGULATORY_TERMS = [
+    "regulat", "compliance", "gdpr", "ai act", "legal", "juridisk", "lag", "privacy", "integritet",
+    "ethic", "etik", "bias", "audit", "risk", "fairness", "psd2",
+]
+CHANGE_TERMS = [
+    "change", "förändring", "adoption", "transition", "övergång", "rollout", "culture", "kultur",
+    "team", "workshop", "employees", "medarbetare", "training", "utbildning", "reorg",
+]
+AI_TERMS = [
+    "ai", "agent", "machine learning", "ml", "model", "modell", "data", "llm", "automation",
+    "automatisering", "microservice", "mikrotjänst", "platform", "plattform",
+]
+USER_TERMS = [
+    "user", "användare", "customer", "kund", "ux", "journey", "experience", "upplevelse", "onboarding",
+    "prototype", "prototyp", "design",
+]
+DEBONO_TERMS = ["de bono", "thinking hats", "hattar", "brainstorm", "idea", "idé"]
+
+
+def _hits(text: str, terms: list) -> int:
+    # Short terms must match a whole word, longer ones may be word prefixes ("regulat").
+    return sum(
+        1 for term in terms
+        if re.search(r"\b" + re.escape(term) + (r"\b" if len(term) <= 3 else ""), text)
+    )
+
+
+def _horizon_years(text: str) -> int:
+    years = [int(value) for value in re.findall(r"(\d{1,2})\s*(?:-\s*)?(?:years?|år)\b", text)]
+    if years:
+        return max(years)
+    if _hits(text, LONG_HORIZON_TERMS):
+        return 5
+    return 1
+
+
+def classify_problem(problem: str) -> dict:
+    """
+    Classifies a problem description with cheap keyword heuristics.
+
+    Args:
+        problem: The user's problem description, including clarification answers.
+
+    Returns:
+        A dictionary with scope, time_horizon (years), regulatory_complexity,
+        change_impact, methodology_hint and the technical/user signals used by
+        select_personas.
+    """
+    text = problem.lower()
+    broad = _hits(text, BROAD_SCOPE_TERMS) >= 2 or len(text.split()) > 150
+    regulatory_hits = _hits(text, REGULATORY_TERMS)
+    return {
+        "scope": "broad" if broad else "focused",
+        "time_horizon": _horizon_years(text),
+        "regulatory_complexity": "high" if regulatory_hits >= 2 else "medium" if regulatory_hits else "low",
+        "change_impact": "high" if _hits(text, CHANGE_TERMS) else "low",
+        "methodology_hint": "de_bono" if _hits(text, DEBONO_TERMS) else None,
+        "technical": _hits(text, AI_TERMS) >= 2,
+        "user_facing": _hits(text, USER_TERMS) >= 1,
+    }
+
+
+def select_personas(classification: dict, max_personas: int = None, library: PersonaLibrary = None) -> tuple:
+    """
+    Picks the persona subset for a classified problem.
+
+    Personas are looked up by capability tag in the persona library, so a new
+    persona joins the selection by carrying one of the tags below.
+
+    Args:
+        classification: The output of classify_problem (or an equivalent dict).
+        max_personas: Upper bound on the fan-out size; defaults to THINK_TANK_MAX_PERSONAS.
+        library: The persona library; defaults to default_library().
+
+    Returns:
+        A tuple of (persona names in priority order, rationale lines).
+    """
+    if max_personas is None:
+        max_personas = int(os.getenv("THINK_TANK_MAX_PERSONAS", DEFAULT_MAX_PERSONAS))
+    library = library or default_library()
+
+    selected = library.with_tag("core")
+    rationale = [f"{', '.join(selected)}: core strategy, people and challenge coverage"] if selected else []
+
+    def add(tag, reason):
+        for name in library.with_tag(tag):
+            if name not in selected:
+                selected.append(name)
+                rationale.append(f"{name}: {reason}")
+
+    if classification.get("change_impact") == "high":
+        add("change", "high change impact")
+    if classification.get("time_horizon", 1) >= 3 or classification.get("scope") == "broad":
+        add("futures", f"{classification.get('scope')} scope, {classification.get('time_horizon')}-year horizon")
+    if classification.get("regulatory_complexity") == "high":
+        add("regulation", "high regulatory complexity")
+    if classification.get("technical"):
+        add("ai_delivery", "data/AI delivery questions")
+        if classification.get("regulatory_complexity") == "medium":
+            add("regulation", "AI use with regulatory exposure")
+    if classification.get("user_facing"):
+        add("user_experience", "user or customer experience at stake")
+    if classification.get("methodology_hint") == "de_bono" or len(selected) < 5:
+        add("meta_process", "balanced meta-perspective for a small or idea-driven panel")
+
+    selected.sort(key=library.priority)
+    dropped = selected[max_personas:]
+    if dropped:
+        rationale.append(f"dropped to stay within {max_personas} personas: {', '.join(dropped)}")
+    return selected[:max_personas], rationale
+
+def cluster_personas(personas: list) -> dict:
+    """
+    Groups persona names by PERSONA_CLUSTERS, keeping only non-empty clusters.
+
+    Personas missing from PERSONA_CLUSTERS land in DEFAULT_CLUSTER.
+    """
+    clusters = {}
+    for name in personas:
+        cluster = next(
+            (cluster for cluster, members in PERSONA_CLUSTERS.items() if name in members), DEFAULT_CLUSTER
+        )
+        clusters.setdefault(cluster, []).append(name)
+    return {cluster: clusters[cluster] for cluster in PERSONA_CLUSTERS if cluster in clusters}
@@ -0,0 +1,325 @@
+import asyncio
+import collections
+import itertools
+import json
+import time
+import uuid
+from typing import AsyncGenerator, Optional
+
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.events import Event
+from google.adk.runners import Runner
+from google.genai import types
+
+
+APP_NAME = "think_tank"
+DEFAULT_USER_ID = "web"
+DEFAULT_CLIENT_BUFFER = 256
+DEFAULT_HISTORY_LIMIT = 1024
+DEFAULT_RUN_TTL_SECONDS = 300
+DEFAULT_HEARTBEAT_SECONDS = 15
+
+
+def _text(event: Event) -> str:
+    if not event.content or not event.content.parts:
+        return ""
+    return "".join(part.text or "" for part in event.content.parts if not part.thought)
+
+
+def event_messages(event: Event) -> list:
+    """
+    Translates a runner event into the messages sent to clients.
+
+    Message types: `delta` (a streamed chunk of model text), `selection` (the
+    personas picked for the problem), `persona_done` (a persona delivered its
+    output), `missing` (personas that missed their deadline), `transfer` and
+    `message` (a complete model turn).
+    """
+    if event.partial:
+        text = _text(event)
+        return [{"type": "delta", "author": event.author, "text": text}] if text else []
+
+    messages = []
+    state_delta = event.actions.state_delta if event.actions else {}
+    if state_delta.get("persona_selection"):
+        messages.append({"type": "selection", "personas": state_delta["persona_selection"]["personas"]})
+    if state_delta.get(f"{event.author}_output") is not None:
+        messages.append({"type": "persona_done", "persona": event.author})
+    if state_delta.get("missing_personas"):
+        messages.append({"type": "missing", "personas": state_delta["missing_personas"]})
+    if event.actions and event.actions.transfer_to_agent:
+        messages.append({"type": "transfer", "author": event.author, "to": event.actions.transfer_to_agent})
+    text = _text(event)
+    if text:
+        messages.append({"type": "message", "author": event.author, "text": text, "final": event.is_final_response()})
+    return messages
+
+
+class ClientBuffer:
+    """
+    Bounded queue of messages waiting to be written to one client.
+
+    offer() never blocks, so a slow client can't stall the run. When the
+    buffer is full a `delta` is dropped (the complete `message` follows when
+    the model turn ends) and consecutive deltas of one author are merged. A
+    client that falls behind on anything else is cut off with an `overflow`
+    message; it can reconnect with Last-Event-ID and replay what it missed.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CLIENT_BUFFER):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.closed = False
+        self.last_id = 0
+        self._messages = collections.deque()
+        self._ready = asyncio.Event()
+
+    def offer(self, message: dict) -> None:
+        if self.closed:
+            return
+        last = self._messages[-1] if self._messages else None
+        if (
+            message["type"] == "delta" and last and last["type"] == "delta"
+            and last["author"] == message["author"]
+        ):
+            last["text"] += message["text"]
+            last["id"] = message["id"]
+        elif len(self._messages) < self.maxsize:
+            self._messages.append(dict(message))
+        elif message["type"] == "delta":
+            self.dropped += 1
+        else:
+            self._messages.clear()
+            # Carries the last delivered id, so reconnecting with it replays everything lost here.
+            self._messages.append({"id": self.last_id, "type": "overflow", "dropped": self.dropped})
+            self.closed = True
+        self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        Returns the next message, or None on timeout.
+
+        Raises:
+            EOFError: The buffer is closed and drained.
+        """
+        while not self._messages:
+            if self.closed:
+                raise EOFError
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        message = self._messages.popleft()
+        self.last_id = message["id"]
+        return message
+
+
+class AgentRun:
+    """
+    One runner invocation, fanned out to any number of SSE clients.
+
+    The run is driven by its own task, so it continues at full speed whether
+    its clients keep up, disconnect or never attach. Every message except
+    deltas is also kept (up to history_limit) for clients that connect late
+    or reconnect.
+    """
+
+    def __init__(self, session_id: str, user_id: str, history_limit: int = DEFAULT_HISTORY_LIMIT):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.user_id = user_id
+        self.finished_at = None
+        self.history = collections.deque(maxlen=history_limit)
+        self._ids = itertools.count(1)
+        self._clients = set()
+        self.task = None
+
+    def publish(self, message: dict) -> None:
+        message = {"id": next(self._ids), **message}
+        if message["type"] != "delta":
+            self.history.append(message)
+        for client in list(self._clients):
+            client.offer(message)
+            if client.closed:
+                self._clients.discard(client)
+
+    def subscribe(self, last_event_id: int = 0, maxsize: int = DEFAULT_CLIENT_BUFFER) -> ClientBuffer:
+        """Attaches a client, replaying the kept messages after last_event_id."""
+        replay = [message for message in self.history if message["id"] > last_event_id]
+        # The replay is already bounded by history_limit; only live messages count against maxsize.
+        client = ClientBuffer(maxsize + len(replay))
+        for message in replay:
+            client.offer(message)
+        if self.finished_at is None and not client.closed:
+            self._clients.add(client)
+        else:
+            client.close()
+        return client
+
+    def unsubscribe(self, client: ClientBuffer) -> None:
+        self._clients.discard(client)
+        client.close()
+
+    async def drive(self, runner: Runner, new_message: types.Content, run_config: RunConfig) -> None:
+        self.publish({"type": "run", "run_id": self.id, "session_id": self.session_id})
+        final = None
+        try:
+            async for event in runner.run_async(
+                user_id=self.user_id, session_id=self.session_id, new_message=new_message, run_config=run_config
+            ):
+                for message in event_messages(event):
+                    if message["type"] == "message" and message["final"]:
+                        final = message
+                    self.publish(message)
+            self.publish({"type": "done", "author": final["author"] if final else None, "text": final["text"] if final else ""})
+        except Exception as e:
+            self.publish({"type": "error", "error": str(e)})
+        finally:
+            self.finished_at = time.monotonic()
+            for client in list(self._clients):
+                client.close()
+            self._clients.clear()
+
+
+def format_sse(message: dict) -> str:
+    return f"id: {message['id']}\nevent: {message['type']}\ndata: {json.dumps(message, ensure_ascii=False)}\n\n"
+
+
+class AgentService:
+    """
+    Serves an agent over HTTP, streaming each run's events as Server-Sent Events.
+
+        POST /sessions                       {"user_id"?, "state"?} -> {"session_id", "user_id"}
+        POST /sessions/{session_id}/messages {"text", "user_id"?}   -> SSE stream of the run
+        GET  /runs/{run_id}/events           (Last-Event-ID)        -> SSE stream, replayed from the id
+        GET  /healthz
+
+    Each connected client gets its own bounded ClientBuffer, so memory per
+    client is capped and slow clients never hold up the run or each other.
+    A session runs one message at a time.
+    """
+
+    def __init__(
+        self,
+        agent,
+        session_service,
+        client_buffer: int = DEFAULT_CLIENT_BUFFER,
+        run_ttl_seconds: float = DEFAULT_RUN_TTL_SECONDS,
+        heartbeat_seconds: float = DEFAULT_HEARTBEAT_SECONDS,
+        streaming: bool = True,
+    ):
+        """
+        Args:
+            agent: The root agent to serve.
+            session_service: Where the sessions live.
+            client_buffer: Messages buffered per client before deltas are dropped.
+            run_ttl_seconds: How long a finished run can still be replayed.
+            heartbeat_seconds: Idle time after which a keep-alive comment is sent.
+            streaming: Stream model output as `delta` messages (StreamingMode.SSE).
+        """
+        self.session_service = session_service
+        self.runner = Runner(agent=agent, app_name=APP_NAME, session_service=session_service)
+        self.client_buffer = client_buffer
+        self.run_ttl_seconds = run_ttl_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.run_config = RunConfig(streaming_mode=StreamingMode.SSE if streaming else StreamingMode.NONE)
+        self.runs = {}
+        self._active = {}
+
+    def _expire_runs(self) -> None:
+        now = time.monotonic()
+        for run_id in [
+            run_id for run_id, run in self.runs.items()
+            if run.finished_at is not None and now - run.finished_at > self.run_ttl_seconds
+        ]:
+            del self.runs[run_id]
+
+    def start_run(self, session_id: str, user_id: str, text: str) -> AgentRun:
+        self._expire_runs()
+        active = self._active.get(session_id)
+        if active is not None and active.finished_at is None:
+            raise RuntimeError(f"Session '{session_id}' is already running {active.id}.")
+        run = AgentRun(session_id, user_id)
+        new_message = types.Content(role="user", parts=[types.Part(text=text)])
+        run.task = asyncio.ensure_future(run.drive(self.runner, new_message, self.run_config))
+        run.task.add_done_callback(lambda _: self._finish(run))
+        self.runs[run.id] = run
+        self._active[session_id] = run
+        return run
+
+    def _finish(self, run: AgentRun) -> None:
+        if self._active.get(run.session_id) is run:
+            del self._active[run.session_id]
+
+    async def stream(self, run: AgentRun, client: ClientBuffer) -> AsyncGenerator[str, None]:
+        try:
+            while True:
+                try:
+                    message = await client.get(timeout=self.heartbeat_seconds)
+                except EOFError:
+                    return
+                yield ": keep-alive\n\n" if message is None else format_sse(message)
+        finally:
+            run.unsubscribe(client)
+
+    def app(self):
+        """Builds the Starlette application."""
+        from starlette.applications import Starlette
+        from starlette.responses import JSONResponse, StreamingResponse
+        from starlette.routing import Route
+
+        def sse_response(run: AgentRun, client: ClientBuffer) -> StreamingResponse:
+            return StreamingResponse(
+                self.stream(run, client),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
+        async def create_session(request):
+            body = await request.json() if await request.body() else {}
+            user_id = body.get("user_id") or DEFAULT_USER_ID
+            session = self.session_service.create_session(
+                app_name=APP_NAME, user_id=user_id, state=body.get("state") or {}, session_id=str(uuid.uuid4())
+            )
+            return JSONResponse({"session_id": session.id, "user_id": user_id}, status_code=201)
+
+        async def post_message(request):
+            body = await request.json()
+            user_id = body.get("user_id") or DEFAULT_USER_ID
+            session_id = request.path_params["session_id"]
+            if not body.get("text"):
+                return JSONResponse({"error": "'text' is required"}, status_code=400)
+            if self.session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id) is None:
+                return JSONResponse({"error": f"Unknown session '{session_id}'."}, status_code=404)
+            try:
+                run = self.start_run(session_id, user_id, body["text"])
+            except RuntimeError as e:
+                return JSONResponse({"error": str(e)}, status_code=409)
+            return sse_response(run, run.subscribe(maxsize=self.client_buffer))
+
+        async def run_events(request):
+            run = self.runs.get(request.path_params["run_id"])
+            if run is None:
+                return JSONResponse({"error": "Unknown or expired run."}, status_code=404)
+            last_event_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id") or "0"
+            try:
+                last_event_id = int(last_event_id)
+            except ValueError:
+                return JSONResponse({"error": f"Invalid Last-Event-ID '{last_event_id}'."}, status_code=400)
+            return sse_response(run, run.subscribe(last_event_id, maxsize=self.client_buffer))
+
+        async def healthz(request):
+            active = sum(1 for run in self.runs.values() if run.finished_at is None)
+            return JSONResponse({"status": "ok", "active_runs": active})
+
+        return Starlette(routes=[
+            Route("/sessions", create_session, methods=["POST"]),
+            Route("/sessions/{session_id}/messages", post_message, methods=["POST"]),
+            Route("/runs/{run_id}/events", run_events, methods=["GET"]),
+            Route("/healthz", healthz, methods=["GET"]),
+        ])
@@ -0,0 +1,366 @@
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Optional
+
+from google.adk.events import Event
+from google.adk.sessions import DatabaseSessionService, Session
+from google.adk.sessions import _session_util
+from google.adk.sessions.base_session_service import BaseSessionService, GetSessionConfig
+from google.adk.sessions.database_session_service import (
+    Base,
+    StorageAppState,
+    StorageEvent,
+    StorageSession,
+    StorageUserState,
+    _extract_state_delta,
+    _merge_state,
+)
+from sqlalchemy import event as sqlalchemy_event
+from sqlalchemy import text
+from sqlalchemy.engine import Engine, create_engine
+from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import MetaData
+
+
+DEFAULT_BUSY_TIMEOUT_MS = 30000
+DEFAULT_MAX_BATCH = 32
+DEFAULT_COMPACT_EVERY = 50
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+_ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def _configure_connection(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={DEFAULT_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def sqlite_engine(db_url: str) -> Engine:
+    """
+    Returns this process's engine for a SQLite database URL.
+
+    Every connection runs in WAL mode with synchronous=NORMAL and a busy
+    timeout, so readers never block the writer and concurrent writers wait
+    for the lock instead of failing. Service instances in the same process
+    share one engine and its connection pool; a forked child gets its own.
+    """
+    key = (db_url, os.getpid())
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(key)
+        if engine is None:
+            engine = create_engine(
+                db_url,
+                connect_args={"check_same_thread": False, "timeout": DEFAULT_BUSY_TIMEOUT_MS / 1000},
+            )
+            sqlalchemy_event.listen(engine, "connect", _configure_connection)
+            _ENGINES[key] = engine
+        return engine
+
+
+class SqliteSessionService(DatabaseSessionService):
+    """
+    DatabaseSessionService tuned for many concurrent runs sharing one SQLite file.
+
+    On top of the WAL engine from sqlite_engine(), events are not written one
+    by one: they are buffered per session and flushed in a single write
+    transaction flush_interval seconds after the first of them, when
+    max_batch events are pending, when an event of the next invocation
+    arrives, or when the session is read back (as the runner does when a run
+    starts). Callers that know a run has ended can flush_session() it. State
+    deltas that a later event overwrites are dropped from the stored events
+    every compact_every flushes, since the session row already holds the
+    current value.
+
+    The in-memory session is updated immediately, so agents always see their
+    own writes. A batch whose write fails goes back to the front of the
+    buffer for the next flush, and the error is raised (or logged, when the
+    timer flushed). Events buffered when the process dies are lost; call
+    flush() or close() before exiting a long-lived process.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        compact_every: int = DEFAULT_COMPACT_EVERY,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        """
+        Args:
+            db_url: A sqlite:/// database URL.
+            max_batch: Pending events per session that force a flush.
+            compact_every: Flushes of a session between compactions of its
+                stored state deltas; 0 disables compaction.
+            flush_interval: Seconds an event stays buffered at most (the longest
+                a crash can lose); 0 flushes only on the other triggers.
+        """
+        if not db_url.startswith("sqlite"):
+            raise ValueError(f"SqliteSessionService needs a sqlite:/// URL, got '{db_url}'.")
+        # Not calling DatabaseSessionService.__init__: it builds a default engine
+        # and creates the tables without a lock, which races between processes.
+        self.db_engine = sqlite_engine(db_url)
+        self.metadata = MetaData()
+        self.inspector = inspect(self.db_engine)
+        self.DatabaseSessionFactory = sessionmaker(bind=self.db_engine)
+        with self.db_engine.begin() as connection:
+            connection.execute(text("BEGIN IMMEDIATE"))
+            Base.metadata.create_all(connection)
+        self.max_batch = max_batch
+        self.compact_every = compact_every
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flushes = {}
+        self._timers = {}
+        self._writers = {}
+        atexit.register(self.flush)
+
+    def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        with self.DatabaseSessionFactory() as db:
+            # The app and user state rows are created on first use; hold the
+            # write lock so two processes don't both try to insert them.
+            db.execute(text("BEGIN IMMEDIATE"))
+            storage_app_state = db.get(StorageAppState, (app_name))
+            if storage_app_state is None:
+                storage_app_state = StorageAppState(app_name=app_name, state={})
+                db.add(storage_app_state)
+            storage_user_state = db.get(StorageUserState, (app_name, user_id))
+            if storage_user_state is None:
+                storage_user_state = StorageUserState(app_name=app_name, user_id=user_id, state={})
+                db.add(storage_user_state)
+
+            app_delta, user_delta, session_state = _extract_state_delta(state)
+            app_state = {**(storage_app_state.state or {}), **app_delta}
+            user_state = {**(storage_user_state.state or {}), **user_delta}
+            if app_delta:
+                storage_app_state.state = app_state
+            if user_delta:
+                storage_user_state.state = user_state
+
+            storage_session = StorageSession(app_name=app_name, user_id=user_id, id=session_id, state=session_state)
+            db.add(storage_session)
+            db.commit()
+            db.refresh(storage_session)
+            return Session(
+                app_name=app_name,
+                user_id=user_id,
+                id=str(storage_session.id),
+                state=_merge_state(app_state, user_state, session_state),
+                last_update_time=storage_session.update_time.timestamp(),
+            )
+
+    @staticmethod
+    def _key(session: Session) -> tuple:
+        return (session.app_name, session.user_id, session.id)
+
+    def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        BaseSessionService.append_event(self, session=session, event=event)
+        key = self._key(session)
+        with self._lock:
+            pending = self._pending.get(key)
+            ended = pending is not None and pending[1][-1].invocation_id != event.invocation_id
+        if ended:
+            # The previous run is over; its events go out in their own batch.
+            self.flush_session(session)
+        with self._lock:
+            pending = self._pending.setdefault(key, (session, []))
+            pending[1].append(event)
+            flush = len(pending[1]) >= self.max_batch
+            if not flush and self.flush_interval and key not in self._timers:
+                timer = self._timers[key] = threading.Timer(self.flush_interval, self._flush_on_timer, (session,))
+                timer.daemon = True
+                timer.start()
+        if flush:
+            self.flush_session(session)
+        return event
+
+    def flush(self) -> None:
+        """Writes the buffered events of every session."""
+        with self._lock:
+            sessions = [session for session, _ in self._pending.values()]
+        for session in sessions:
+            self.flush_session(session)
+
+    def _flush_on_timer(self, session: Session) -> None:
+        try:
+            self.flush_session(session)
+        except Exception:
+            # Nobody is waiting on the timer to hear about it; the events stay buffered for the next flush.
+            logger.exception("Flushing the events of session %s failed; they are kept for the next flush.", session.id)
+
+    def flush_session(self, session: Session) -> None:
+        """
+        Writes the buffered events of one session in a single transaction.
+
+        If the write fails, the events are put back in front of any buffered
+        since and the error is raised.
+        """
+        key = self._key(session)
+        with self._lock:
+            writer = self._writers.setdefault(key, threading.Lock())
+        # One batch of a session at a time, in order, so each sees the update time the previous one left.
+        with writer:
+            with self._lock:
+                session, events = self._pending.pop(key, (session, []))
+                timer = self._timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+            if not events:
+                return
+            try:
+                self._write(key, session, events)
+            except Exception:
+                with self._lock:
+                    _, buffered = self._pending.get(key, (session, []))
+                    self._pending[key] = (session, events + buffered)
+                raise
+
+    def _write(self, key: tuple, session: Session, events: list) -> None:
+        with self.DatabaseSessionFactory() as db:
+            # Take the write lock up front so the read-modify-write of the
+            # shared app and user state can't interleave with another process.
+            db.execute(text("BEGIN IMMEDIATE"))
+            storage_session = db.get(StorageSession, key)
+            if storage_session.update_time.timestamp() > session.last_update_time:
+                db.rollback()
+                raise ValueError(
+                    f"Session last_update_time "
+                    f"{datetime.fromtimestamp(session.last_update_time):%Y-%m-%d %H:%M:%S} "
+                    f"is later than the update_time in storage "
+                    f"{storage_session.update_time:%Y-%m-%d %H:%M:%S}"
+                )
+            storage_app_state = db.get(StorageAppState, (session.app_name))
+            storage_user_state = db.get(StorageUserState, (session.app_name, session.user_id))
+            app_state = dict(storage_app_state.state)
+            user_state = dict(storage_user_state.state)
+            session_state = dict(storage_session.state)
+
+            for event in events:
+                if event.actions and event.actions.state_delta:
+                    app_delta, user_delta, session_delta = _extract_state_delta(event.actions.state_delta)
+                    app_state.update(app_delta)
+                    user_state.update(user_delta)
+                    session_state.update(session_delta)
+                db.add(self._storage_event(session, event))
+
+            storage_app_state.state = app_state
+            storage_user_state.state = user_state
+            storage_session.state = session_state
+            db.commit()
+            db.refresh(storage_session)
+            session.last_update_time = storage_session.update_time.timestamp()
+
+        with self._lock:
+            self._flushes[key] = self._flushes.get(key, 0) + 1
+            compact = self.compact_every and self._flushes[key] % self.compact_every == 0
+        if compact:
+            self.compact(*key)
+
+    @staticmethod
+    def _storage_event(session: Session, event: Event) -> StorageEvent:
+        storage_event = StorageEvent(
+            id=event.id,
+            invocation_id=event.invocation_id,
+            author=event.author,
+            branch=event.branch,
+            actions=event.actions,
+            session_id=session.id,
+            app_name=session.app_name,
+            user_id=session.user_id,
+            timestamp=datetime.fromtimestamp(event.timestamp),
+            long_running_tool_ids=event.long_running_tool_ids,
+            grounding_metadata=event.grounding_metadata,
+            partial=event.partial,
+            turn_complete=event.turn_complete,
+            error_code=event.error_code,
+            error_message=event.error_message,
+            interrupted=event.interrupted,
+        )
+        if event.content:
+            storage_event.content = _session_util.encode_content(event.content)
+        return storage_event
+
+    def compact(self, app_name: str, user_id: str, session_id: str) -> int:
+        """
+        Drops state-delta entries that a later event of the session overwrites.
+
+        The session, user and app rows hold the current state, so only the
+        newest write of each key is kept in the event log.
+
+        Returns:
+            The number of events rewritten.
+        """
+        rewritten = 0
+        with self.DatabaseSessionFactory() as db:
+            db.execute(text("BEGIN IMMEDIATE"))
+            storage_events = (
+                db.query(StorageEvent)
+                .filter(StorageEvent.app_name == app_name)
+                .filter(StorageEvent.user_id == user_id)
+                .filter(StorageEvent.session_id == session_id)
+                .order_by(StorageEvent.timestamp.desc())
+                .all()
+            )
+            seen = set()
+            for storage_event in storage_events:
+                actions = storage_event.actions
+                if not actions or not actions.state_delta:
+                    continue
+                keep = {key: value for key, value in actions.state_delta.items() if key not in seen}
+                seen.update(actions.state_delta)
+                if len(keep) < len(actions.state_delta):
+                    storage_event.actions = actions.model_copy(update={"state_delta": keep})
+                    rewritten += 1
+            db.commit()
+        return rewritten
+
+    def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        with self._lock:
+            pending = self._pending.get((app_name, user_id, session_id))
+        if pending:
+            self.flush_session(pending[0])
+        return super().get_session(app_name=app_name, user_id=user_id, session_id=session_id, config=config)
+
+    def delete_session(self, app_name: str, user_id: str, session_id: str) -> None:
+        with self._lock:
+            self._pending.pop((app_name, user_id, session_id), None)
+            self._flushes.pop((app_name, user_id, session_id), None)
+            self._writers.pop((app_name, user_id, session_id), None)
+            timer = self._timers.pop((app_name, user_id, session_id), None)
+        if timer is not None:
+            timer.cancel()
+        super().delete_session(app_name, user_id, session_id)
+
+    def close(self) -> None:
+        """Flushes every session and checkpoints the WAL into the database file."""
+        self.flush()
+        with self.db_engine.connect() as connection:
+            connection.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+        atexit.unregister(self.flush)
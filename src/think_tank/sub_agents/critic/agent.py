@@ -0,0 +1,50 @@
+from google.adk.agents import LlmAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest
+from google.genai import types
+from think_tank.sub_agents.critic.prompt import PROMPT, REVISION_NOTE
+from think_tank.models import default_policy
+from think_tank.workflows import persona_key, problem_text
+model_policy = default_policy()
+DESCRIPTION = """
+Quality agent that scores the synthesis and flags the personas behind unresolved contradictions.
+"""
+
+
+def attach_synthesis(callback_context: CallbackContext, llm_request: LlmRequest):
+    """Hands the critic the problem, the current synthesis and the persona outputs it merged."""
+    state = callback_context.state
+    names = (state.get("persona_selection") or {}).get("personas", [])
+    outputs = "\n\n".join(f"**{name}:**\n{state.get(f'{name}_output', '')}" for name in names)
+    problem = problem_text(callback_context._invocation_context)
+    text = f"**Problem:**\n{problem}\n\n**Syntes:**\n{state.get('synthesis') or '(tom)'}\n\n**Persona‑svar:**\n{outputs}"
+    llm_request.contents.append(types.Content(role="user", parts=[types.Part(text=text)]))
+
+
+critic_agent = LlmAgent(
+    name="critic",
+    model=model_policy.model("critic"),
+    description=DESCRIPTION,
+    instruction=PROMPT,
+    include_contents="none",
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True,
+    before_model_callback=attach_synthesis,
+    output_key="critique"
+)
+
+
+def attach_revision_request(callback_context: CallbackContext, llm_request: LlmRequest):
+    """Tells a persona re-run by the critic loop which contradictions to resolve."""
+    revision = callback_context.state.get("persona_revision") or {}
+    name = persona_key(callback_context.agent_name)
+    if name not in {persona_key(persona) for persona in revision.get("personas", [])}:
+        return None
+    issues = "\n".join(
+        f"- {item['issue']} ({', '.join(item['personas'])})"
+        for item in revision.get("contradictions", [])
+        if name in {persona_key(persona) for persona in item["personas"]}
+    )
+    text = REVISION_NOTE.format(issues=issues or "-", feedback=revision.get("feedback") or "-")
+    llm_request.contents.append(types.Content(role="user", parts=[types.Part(text=text)]))
+    return None
@@ -1,16 +1,167 @@
 
 from google.adk.agents import LlmAgent
-from think_tank.sub_agents.synthesizer.prompt import PROMPT
-from dotenv import load_dotenv
-import os
-load_dotenv()
-MODEL = os.getenv("VERTEX_AI_MODEL")
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.models import LlmRequest
+from google.genai import types
+from think_tank.sub_agents.synthesizer.prompt import PROMPT, MISSING_PERSONAS_NOTE, DRAFT_PROMPT, RECONCILE_PROMPT
+from think_tank.sub_agents.synthesizer.prompt import CLUSTER_PROMPT
+from think_tank.dedup import NearDuplicateCollapser
+from think_tank.selection import PERSONA_CLUSTERS
+from think_tank.workflows import problem_text
+from think_tank.models import default_policy
+model_policy = default_policy()
+collapser = NearDuplicateCollapser.from_env()
 DESCRIPTION = """
 Aggregation agent that consolidates specialist outputs, resolves conflicts, and crafts a concise yet engaging action plan.
 """
+
+
+def synthesizer_instruction(context: ReadonlyContext) -> str:
+    """Adds a note about personas that missed their deadline to the synthesis prompt."""
+    missing = context.state.get("missing_personas")
+    if not missing:
+        return PROMPT
+    return PROMPT + MISSING_PERSONAS_NOTE.format(personas=", ".join(missing))
+
+
+def attach_cluster_summaries(callback_context: CallbackContext, llm_request: LlmRequest):
+    """In tiered synthesis, swaps the raw persona history for the problem and the cluster summaries."""
+    state = callback_context.state
+    clusters = state.get("synthesis_clusters")
+    if not clusters:
+        return None
+    summaries = "\n\n".join(
+        f"**{cluster} ({', '.join(names)}):**\n{state.get(f'{cluster}_summary', '')}"
+        for cluster, names in clusters.items()
+    )
+    problem = problem_text(callback_context._invocation_context)
+    text = f"**Problem:**\n{problem}\n\n{summaries}"
+    llm_request.contents = [types.Content(role="user", parts=[types.Part(text=text)])]
+    return None
+
+
+def attach_revised_outputs(callback_context: CallbackContext, llm_request: LlmRequest):
+    """
+    In a critic revision round, swaps the history (earlier drafts included) for the
+    problem, the current persona outputs and the critic's feedback to address.
+    """
+    state = callback_context.state
+    revision = state.get("persona_revision") or {}
+    if state.get("synthesis_clusters") or not revision.get("personas"):
+        return None
+    names = (state.get("persona_selection") or {}).get("personas", [])
+    outputs = "\n\n".join(f"**{name}:**\n{state.get(f'{name}_output', '')}" for name in names)
+    issues = "\n".join(
+        f"- {item['issue']} ({', '.join(item['personas'])})" for item in revision.get("contradictions", [])
+    )
+    problem = problem_text(callback_context._invocation_context)
+    text = (
+        f"**Problem:**\n{problem}\n\n{outputs}\n\n"
+        f"**Kritikerns återkoppling:**\n{issues or '-'}\n{revision.get('feedback') or '-'}"
+    )
+    llm_request.contents = [types.Content(role="user", parts=[types.Part(text=text)])]
+    return None
+
+
+def attach_collapsed_outputs(callback_context: CallbackContext, llm_request: LlmRequest):
+    """Swaps the history for the problem and the persona outputs with near-duplicate bullets merged."""
+    state = callback_context.state
+    if state.get("synthesis_clusters"):
+        return None
+    names = (state.get("persona_selection") or {}).get("personas", [])
+    outputs = {name: state.get(f"{name}_output") for name in names if state.get(f"{name}_output")}
+    if not outputs:
+        return None
+    text, stats = collapser.collapse(outputs)
+    problem = problem_text(callback_context._invocation_context)
+    llm_request.contents = [types.Content(role="user", parts=[types.Part(text=f"**Problem:**\n{problem}\n\n{text}")])]
+    state["synthesis_dedup"] = stats
+    return None
+
+
 synthesizer_agent = LlmAgent(
     name="synthesizer",
-    model=MODEL,
+    model=model_policy.model("synthesizer"),
     description=DESCRIPTION,
-    instruction=PROMPT
-) 
\ No newline at end of file
+    instruction=synthesizer_instruction,
+    before_model_callback=[attach_cluster_summaries, attach_revised_outputs]
+    + ([attach_collapsed_outputs] if collapser else []),
+    output_key="synthesis"
+)
+
+
+def attach_fold_inputs(callback_context: CallbackContext, llm_request: LlmRequest):
+    """Hands the drafter the problem, the current draft and the persona outputs to fold in."""
+    state = callback_context.state
+    outputs = "\n\n".join(
+        f"**{name}:**\n{state.get(f'{name}_output', '')}" for name in state.get("synthesis_folding") or []
+    )
+    problem = problem_text(callback_context._invocation_context)
+    text = f"**Problem:**\n{problem}\n\n**Utkast:**\n{state.get('synthesis_draft') or '(tomt)'}\n\n**Nya persona‑svar:**\n{outputs}"
+    llm_request.contents.append(types.Content(role="user", parts=[types.Part(text=text)]))
+
+
+def attach_draft(callback_context: CallbackContext, llm_request: LlmRequest):
+    """Hands the reconciler the problem, the finished draft and the perspectives that never arrived."""
+    state = callback_context.state
+    problem = problem_text(callback_context._invocation_context)
+    text = f"**Problem:**\n{problem}\n\n**Utkast:**\n{state.get('synthesis_draft') or '(tomt)'}"
+    if state.get("missing_personas"):
+        text += MISSING_PERSONAS_NOTE.format(personas=", ".join(state.get("missing_personas")))
+    llm_request.contents.append(types.Content(role="user", parts=[types.Part(text=text)]))
+
+
+draft_synthesizer_agent = LlmAgent(
+    name="draft_synthesizer",
+    model=model_policy.model("draft_synthesizer"),
+    description="Folds persona outputs into a running synthesis draft as they arrive.",
+    instruction=DRAFT_PROMPT,
+    include_contents="none",
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True,
+    before_model_callback=attach_fold_inputs,
+    output_key="synthesis_draft"
+)
+
+reconciler_agent = LlmAgent(
+    name="reconciler",
+    model=model_policy.model("reconciler"),
+    description="Final reconciliation pass that turns the running synthesis draft into the action plan.",
+    instruction=RECONCILE_PROMPT,
+    include_contents="none",
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True,
+    before_model_callback=attach_draft,
+    output_key="synthesis"
+)
+
+
+def attach_cluster_inputs(callback_context: CallbackContext, llm_request: LlmRequest):
+    """Hands a cluster synthesizer the problem and the outputs of the personas in its cluster."""
+    state = callback_context.state
+    cluster = callback_context.agent_name.removesuffix("_synthesizer")
+    names = (state.get("synthesis_clusters") or {}).get(cluster, [])
+    if collapser:
+        outputs, _ = collapser.collapse({name: state.get(f"{name}_output", "") for name in names})
+    else:
+        outputs = "\n\n".join(f"**{name}:**\n{state.get(f'{name}_output', '')}" for name in names)
+    problem = problem_text(callback_context._invocation_context)
+    text = f"**Problem:**\n{problem}\n\n{outputs}"
+    llm_request.contents.append(types.Content(role="user", parts=[types.Part(text=text)]))
+
+
+cluster_synthesizer_agents = [
+    LlmAgent(
+        name=f"{cluster}_synthesizer",
+        model=model_policy.model(f"{cluster}_synthesizer"),
+        description=f"Reduces the {cluster} personas' outputs to one cluster summary.",
+        instruction=CLUSTER_PROMPT,
+        include_contents="none",
+        disallow_transfer_to_parent=True,
+        disallow_transfer_to_peers=True,
+        before_model_callback=attach_cluster_inputs,
+        output_key=f"{cluster}_summary"
+    )
+    for cluster in PERSONA_CLUSTERS
+]
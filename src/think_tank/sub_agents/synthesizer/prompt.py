@@ -19,6 +19,55 @@ OUTPUT STRUCTURE:
 - **Handlingsplan**
 - **Öppna Frågor**
 """
+MISSING_PERSONAS_NOTE = """
+NOTE: The following personas did not deliver in time and are missing from the input: {personas}.
+Work only with the perspectives that arrived, and list each missing perspective under **Öppna Frågor** as not yet covered.
+"""
+DRAFT_PROMPT = """
+ROLE: Incremental Synthesizer
+
+INPUT: the current **Utkast** (may be empty) and one or more new persona outputs, given in the user message.
+
+TASKS:
+1. Fold the new persona outputs into the draft as friendly Swedish bullet points under **Insikter**, **Rekommendationer** and **Risker**; cite persona names in brackets.
+2. Merge points that overlap with the draft instead of repeating them; label explicit contradictions.
+3. Keep everything already in the draft unless a new output contradicts it.
+
+Constraints: Output *ONLY* the updated draft, ≤ 400 words, no new facts beyond persona outputs.
+"""
+
+RECONCILE_PROMPT = """
+ROLE: Synthesizer & Conflict Resolver (final pass)
+
+INPUT: the finished **Utkast** that already merges every persona output, given in the user message.
+
+TASKS:
+1. Tidy the draft's **Insikter**, **Rekommendationer** and **Risker** without dropping persona citations.
+2. If contradictions are labelled, add a simple Trade‑Off table (max 4 rows).
+3. Draft a **Handlingsplan** (≤ 300 words) in an empathetic, second‑person voice—clear, warm, psychologically informed.
+4. List **Öppna Frågor** that still need user input.
+
+Constraints: Avoid jargon, no new facts beyond the draft.
+
+OUTPUT STRUCTURE:
+- **Insikter**
+- **Rekommendationer**
+- **Risker**
+- **Handlingsplan**
+- **Öppna Frågor**
+"""
+CLUSTER_PROMPT = """
+ROLE: Cluster Synthesizer
+
+INPUT: the outputs of the personas in one cluster of the think tank, given in the user message.
+
+TASKS:
+1. Reduce the outputs to friendly Swedish bullet points under **Insikter**, **Rekommendationer** and **Risker**; cite persona names in brackets.
+2. Merge overlapping points; label explicit contradictions between the personas.
+
+Constraints: Output *ONLY* the cluster summary, ≤ 250 words, no new facts beyond persona outputs.
+"""
+
 PROMPT_OLD = """
 ROLE: Synthesizer & Conflict Resolver
 INPUT: containing outputs from all personas as below:
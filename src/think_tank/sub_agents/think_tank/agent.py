@@ -1,124 +1,111 @@
 
-from google.adk.agents import LlmAgent, ParallelAgent
-from think_tank.sub_agents.think_tank.prompt import MCKINSEY_PROMPT, ORG_PSYCHOLOGIST_PROMPT, CHANGE_MANAGEMENT_PROMPT
-from think_tank.sub_agents.think_tank.prompt import AIML_LEAD_PROMPT, AI_ETHICS_PROMPT, SCENARIO_PLANNER_PROMPT
-from think_tank.sub_agents.think_tank.prompt import DEBONO_HATS_PROMPT, DEVILS_ADVOCATE_PROMPT, UX_DESIGN_THINKER_PROMPT
-from dotenv import load_dotenv
+from google.adk.agents import LlmAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+from think_tank.cache import PersonaResponseCache
+from think_tank.context_cache import SharedContextCache
+from think_tank.callbacks import add_model_callbacks
+from think_tank.persona_library import PersonaLibrary, default_library
+from think_tank.registry import AgentRegistry
+from think_tank.sub_agents.critic.agent import attach_revision_request
+from think_tank.sub_agents.think_tank.prompt import PATCH_PROMPT
+from think_tank.workflows import AdaptiveParallelAgent
 import os
-load_dotenv()
-MODEL = os.getenv("VERTEX_AI_MODEL")
-
-MCKINSEY_DESCRIPTION = """
-Strategy consultant applying MECE, issue‑tree thinking, 
-and 7‑S analysis to frame the problem, size opportunities, and surface no‑regret moves.
-"""
-mckinsey_agent = LlmAgent(
-    name="mckinsey",
-    model=MODEL,
-    description=MCKINSEY_DESCRIPTION,
-    instruction=MCKINSEY_PROMPT,
-    output_key="mckinsey_output"
-) 
-
-ORG_PSYCHOLOGIST_DESCRIPTION = """
-Expert in human behaviour and change management, revealing cultural blockers, motivation levers, and intervention roadmaps.
-"""
-org_psychologist_agent = LlmAgent(
-    name="org_psychologist",
-    model=MODEL,
-    description=ORG_PSYCHOLOGIST_DESCRIPTION,
-    instruction=ORG_PSYCHOLOGIST_PROMPT,
-    output_key="org_psychologist_output"
-) 
-CM_DESCRIPTION = """
-Guides organisations through adoption by crafting a compelling change narrative, activating champions and sequencing interventions for maximum uptake.
-"""
-change_management_agent = LlmAgent(
-    name="change_management",
-    model=MODEL,
-    description=CM_DESCRIPTION,
-    instruction=CHANGE_MANAGEMENT_PROMPT,
-    output_key="change_management_output"
-)
+from think_tank.models import default_policy
+model_policy = default_policy()
+PERSONA_DEADLINE = float(os.getenv("THINK_TANK_PERSONA_DEADLINE", 20))
+FANOUT_BUDGET = float(os.getenv("THINK_TANK_FANOUT_BUDGET", 25))
 
-AIML_LEAD_DESCRIPTION = """
-Technical lead who defines data strategy, model approach, and MLOps path to production while safeguarding performance, cost, and responsibility.
-"""
-aiml_lead_agent = LlmAgent(
-    name="aiml_lead",
-    model=MODEL,
-    description=AIML_LEAD_DESCRIPTION,
-    instruction=AIML_LEAD_PROMPT,
-    output_key="aiml_lead_output"
-)
+# Personas come from the YAML library and are built the first time a run selects them.
+persona_library = default_library()
+persona_registry = AgentRegistry()
 
-AI_ETHICS_DESCRIPTION = """
-Evaluates ethical tensions and societal impact, ensuring alignment with legal frameworks and human values.
-"""
-ai_ethics_agent = LlmAgent(
-    name="ai_ethics",
-    model=MODEL,
-    description=AI_ETHICS_DESCRIPTION,
-    instruction=AI_ETHICS_PROMPT,
-    output_key="ai_ethics_output"
-)
 
-UX_DESIGN_THINKER_DESCRIPTION = """
-Uncovers user needs and pain points, turning insights into prototype hypotheses and test plans.
-"""
-ux_design_thinker_agent = LlmAgent(
-    name="ux_design_thinker",
-    model=MODEL,
-    description=UX_DESIGN_THINKER_DESCRIPTION,
-    instruction=UX_DESIGN_THINKER_PROMPT,
-    output_key="ux_design_thinker_output"
-)
+def attach_speculative_patch(callback_context: CallbackContext, llm_request: LlmRequest):
+    """Turns the call into a patch of the persona's speculative output when the fan-out asks for one."""
+    state = callback_context.state
+    patch = state.get("persona_patch") or {}
+    name = callback_context.agent_name
+    if name not in patch.get("personas", []):
+        return None
+    text = PATCH_PROMPT.format(
+        output=state.get(f"{name}_output", ""),
+        questions=state.get("clarification_questions") or "-",
+        answers=patch.get("answers") or "-",
+    )
+    llm_request.contents = [types.Content(role="user", parts=[types.Part(text=text)])]
+    return None
 
-SCENARIO_PLANNER_DESCRIPTION = """
-CExplores plausible futures, stress‑testing strategies against external drivers across 5‑ and 10‑year horizons.
-"""
-scenario_planner_agent = LlmAgent(
-    name="scenario_planner",
-    model=MODEL,
-    description=SCENARIO_PLANNER_DESCRIPTION,
-    instruction=SCENARIO_PLANNER_PROMPT,
-    output_key="scenario_planner_output"
-)
 
-DEBONO_HATS_DESCRIPTION = """
-Applies the Six Thinking Hats methodology to generate balanced viewpoints and organise group thinking.
-"""
-debono_hats_agent = LlmAgent(
-    name="debono_hats",
-    model=MODEL,
-    description=DEBONO_HATS_DESCRIPTION,
-    instruction=DEBONO_HATS_PROMPT,
-    output_key="debono_hats_output"
-)
+def restore_kept_output(callback_context: CallbackContext, llm_response: LlmResponse):
+    """Replaces a `KEEP` patch reply with the speculative output it keeps."""
+    patch = callback_context.state.get("persona_patch") or {}
+    name = callback_context.agent_name
+    if llm_response.partial or name not in patch.get("personas", []) or not llm_response.content:
+        return None
+    text = "".join(part.text or "" for part in llm_response.content.parts or [])
+    if text.strip().strip("`").upper() == "KEEP":
+        # Edited in place rather than returned, so the response cache after us stores the full output.
+        llm_response.content.parts = [types.Part(text=callback_context.state.get(f"{name}_output", ""))]
+    return None
+
+
+def persona_instruction(name: str, built_with: str) -> str:
+    """The persona's current instruction, or the one it was built with once it is removed from the library."""
+    return persona_library.instruction(name) if name in persona_library else built_with
 
-DEVILS_ADVOCATE_DESCRIPTION = """
-Stress‑tests proposals by inverting assumptions, spotlighting failure modes, and articulating the strongest counterarguments.
-"""
-devils_advocate_agent = LlmAgent(
-    name="devils_advocate",
-    model=MODEL,
-    description=DEVILS_ADVOCATE_DESCRIPTION,
-    instruction=DEVILS_ADVOCATE_PROMPT,
-    output_key="devils_advocate_output"
-)
 
-think_tank_agent = ParallelAgent(
+def build_persona(name: str) -> LlmAgent:
+    spec = persona_library.get(name)
+    return LlmAgent(
+        name=name,
+        model=model_policy.model(name, tier=spec.get("tier")),
+        description=spec["description"],
+        # Read on every call, so edits to the library apply to agents already built.
+        instruction=lambda context: persona_instruction(name, spec["instruction"]),
+        before_model_callback=[attach_revision_request, attach_speculative_patch],
+        after_model_callback=restore_kept_output,
+        output_key=f"{name}_output"
+    )
+
+
+def register_personas(library: PersonaLibrary) -> None:
+    """Registers personas added to the library and refreshes the built ones' descriptions."""
+    registered = set(persona_registry.names())
+    for name in library.names():
+        if name not in registered:
+            persona_registry.register(name, lambda name=name: build_persona(name))
+    for persona_agent in persona_registry.built():
+        if persona_agent.name in library.names():
+            persona_agent.description = library.get(persona_agent.name)["description"]
+
+
+register_personas(persona_library)
+persona_library.on_reload(register_personas)
+
+think_tank_agent = AdaptiveParallelAgent(
     name="think_tank",
     description="Think Tank agent runs multiple paralell analysis to provide a comprehensive multi-perspective analysis.",
-    sub_agents=[
-        mckinsey_agent,
-        org_psychologist_agent,
-        change_management_agent,
-        #aiml_lead_agent,
-        #ai_ethics_agent,
-        #ux_design_thinker_agent,
-        scenario_planner_agent,
-        debono_hats_agent,
-        devils_advocate_agent
-    ]
-) 
\ No newline at end of file
+    persona_registry=persona_registry,
+    persona_library=persona_library,
+    persona_deadline=PERSONA_DEADLINE,
+    fanout_budget=FANOUT_BUDGET,
+)
+
+persona_cache = PersonaResponseCache.from_env()
+if persona_cache:
+    persona_registry.on_build(
+        lambda persona_agent: add_model_callbacks(
+            persona_agent,
+            before=persona_cache.before_model_callback,
+            after=persona_cache.after_model_callback,
+        )
+    )
+
+# Installed after the response cache, whose keys are computed on the unmodified request.
+context_cache = SharedContextCache.from_env()
+if context_cache:
+    persona_registry.on_build(
+        lambda persona_agent: add_model_callbacks(persona_agent, before=context_cache.before_model_callback)
+    )
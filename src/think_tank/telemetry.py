@@ -0,0 +1,249 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, AsyncGenerator, Callable, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+
+from think_tank.callbacks import add_model_callbacks, llm_agents
+
+
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60)
+
+_call = contextvars.ContextVar("think_tank_telemetry_call", default=None)
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for responses without usage metadata."""
+    return (len(text) + 3) // 4
+
+
+def _request_text(llm_request: LlmRequest) -> str:
+    texts = [str(llm_request.config.system_instruction or "")] if llm_request.config else []
+    for content in llm_request.contents:
+        texts.extend(part.text for part in content.parts or [] if part.text)
+    return "".join(texts)
+
+
+class AgentTelemetry:
+    """
+    Per-agent model-call telemetry: wall time, time-to-first-token, tokens, errors and retries.
+
+    Wraps the model of every LlmAgent in a tree, below the scheduler and
+    hedging layers, so every request actually sent to the model is one
+    record: a call retried after a quota error gives one record per attempt,
+    the later ones flagged as retries, and a call that raises is recorded with
+    its error. Records are tagged with the agent name and output_key,
+    appended to a JSONL file and aggregated into Prometheus text metrics that
+    can be served over HTTP. Time to first token is only measured for
+    streamed calls, where it differs from the wall time.
+    """
+
+    def __init__(self, jsonl_path: Optional[str] = None):
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        self._output_keys = {}
+        self._metrics = defaultdict(lambda: defaultdict(float))
+        self._collectors = []
+        self._server = None
+
+    @classmethod
+    def from_env(cls) -> Optional["AgentTelemetry"]:
+        """
+        Builds telemetry from THINK_TANK_TELEMETRY_JSONL and THINK_TANK_METRICS_PORT.
+        Returns None when neither is set.
+        """
+        jsonl_path = os.getenv("THINK_TANK_TELEMETRY_JSONL")
+        port = os.getenv("THINK_TANK_METRICS_PORT")
+        if not jsonl_path and not port:
+            return None
+        telemetry = cls(jsonl_path=jsonl_path or None)
+        if port:
+            telemetry.serve_metrics(int(port))
+        return telemetry
+
+    def instrument(self, root: BaseAgent) -> None:
+        """
+        Records the model calls of every LlmAgent under root.
+
+        Install before the scheduler and hedging, so their retries and hedges
+        go through this layer one request at a time.
+        """
+        for agent in llm_agents(root):
+            self._output_keys[agent.name] = agent.output_key
+            if isinstance(agent.model, TelemetryLlm):
+                continue
+            add_model_callbacks(agent, before=self.before_model_callback, first=True)
+            inner = agent.canonical_model
+            agent.model = TelemetryLlm(model=inner.model, inner=inner, telemetry=self)
+
+    def before_model_callback(self, callback_context: CallbackContext, llm_request: LlmRequest) -> None:
+        # Shared by every attempt of this call, including the scheduler's retries and hedges run in other tasks.
+        _call.set({"invocation_id": callback_context.invocation_id, "agent": callback_context.agent_name, "failed": False})
+        return None
+
+    def record_call(
+        self,
+        call: dict,
+        model: str,
+        llm_request: LlmRequest,
+        start: float,
+        first_token: Optional[float],
+        llm_response: Optional[LlmResponse],
+        error: Optional[str],
+    ) -> None:
+        """Builds the record of one model request from its timings and final response or error."""
+        now = time.perf_counter()
+        text = ""
+        if llm_response is not None and llm_response.content:
+            text = "".join(part.text for part in llm_response.content.parts or [] if part.text)
+        usage = getattr(llm_response, "usage_metadata", None)
+        input_tokens = getattr(usage, "prompt_token_count", None) or _estimate_tokens(_request_text(llm_request))
+        output_tokens = getattr(usage, "candidates_token_count", None) or _estimate_tokens(text)
+        self.record({
+            "timestamp": time.time(),
+            "invocation_id": call["invocation_id"],
+            "agent": call["agent"],
+            "output_key": self._output_keys.get(call["agent"]),
+            "model": model,
+            "wall_time_s": round(now - start, 4),
+            "ttft_s": round(first_token - start, 4) if first_token is not None else None,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "tokens_estimated": usage is None,
+            "retry": call["failed"],
+            "error": error,
+        })
+        if error:
+            call["failed"] = True
+
+    def record(self, entry: dict) -> None:
+        """Aggregates one call record and appends it to the JSONL sink."""
+        labels = (entry["agent"], entry["output_key"] or "")
+        with self._lock:
+            metrics = self._metrics[labels]
+            metrics["calls"] += 1
+            metrics["errors"] += 1 if entry["error"] else 0
+            metrics["retries"] += 1 if entry["retry"] else 0
+            metrics["wall_time_sum"] += entry["wall_time_s"]
+            if entry["ttft_s"] is not None:
+                metrics["streamed"] += 1
+                metrics["ttft_sum"] += entry["ttft_s"]
+            metrics["input_tokens"] += entry["input_tokens"]
+            metrics["output_tokens"] += entry["output_tokens"]
+            for bucket in LATENCY_BUCKETS:
+                if entry["wall_time_s"] <= bucket:
+                    metrics[f"bucket_{bucket}"] += 1
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def add_collector(self, collector: Callable[[], str]) -> None:
+        """Appends the Prometheus text returned by collector to every metrics scrape."""
+        self._collectors.append(collector)
+
+    def prometheus_text(self) -> str:
+        """Renders the aggregated metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            series = sorted((labels, dict(values)) for labels, values in self._metrics.items())
+
+        def label(agent, output_key, le=None):
+            bucket = f',le="{le}"' if le is not None else ""
+            return f'{{agent="{agent}",output_key="{output_key}"{bucket}}}'
+
+        counters = [
+            ("think_tank_llm_calls_total", "calls", "Requests sent to the model."),
+            ("think_tank_llm_errors_total", "errors", "Model requests that raised or returned an error response."),
+            ("think_tank_llm_retries_total", "retries", "Model requests retrying a call whose earlier attempt failed."),
+            ("think_tank_llm_input_tokens_total", "input_tokens", "Input tokens sent to the model."),
+            ("think_tank_llm_output_tokens_total", "output_tokens", "Output tokens received from the model."),
+        ]
+        for name, key, help_text in counters:
+            family(name, "counter", help_text)
+            for (agent, output_key), values in series:
+                lines.append(f"{name}{label(agent, output_key)} {values.get(key, 0):g}")
+
+        family("think_tank_llm_call_seconds", "histogram", "Wall time of model calls.")
+        for (agent, output_key), values in series:
+            for bucket in LATENCY_BUCKETS:
+                count = values.get(f"bucket_{bucket}", 0)
+                lines.append(f"think_tank_llm_call_seconds_bucket{label(agent, output_key, f'{bucket:g}')} {count:g}")
+            lines.append(f"think_tank_llm_call_seconds_bucket{label(agent, output_key, '+Inf')} {values['calls']:g}")
+            lines.append(f"think_tank_llm_call_seconds_sum{label(agent, output_key)} {values['wall_time_sum']:.4f}")
+            lines.append(f"think_tank_llm_call_seconds_count{label(agent, output_key)} {values['calls']:g}")
+
+        family("think_tank_llm_ttft_seconds", "summary", "Time to first token of streamed model calls.")
+        for (agent, output_key), values in series:
+            lines.append(f"think_tank_llm_ttft_seconds_sum{label(agent, output_key)} {values.get('ttft_sum', 0):.4f}")
+            lines.append(f"think_tank_llm_ttft_seconds_count{label(agent, output_key)} {values.get('streamed', 0):g}")
+        return "\n".join(lines) + "\n" + "".join(collector() for collector in self._collectors)
+
+    def serve_metrics(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serves prometheus_text() on http://host:port/metrics from a daemon thread."""
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = telemetry.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server
+
+
+class TelemetryLlm(BaseLlm):
+    """A model whose every request is recorded by its AgentTelemetry, whether it responds, fails or raises."""
+
+    inner: BaseLlm
+    telemetry: Any
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        call = _call.get() or {"invocation_id": None, "agent": self.model, "failed": False}
+        start = time.perf_counter()
+        first_token, last, recorded = None, None, False
+        try:
+            async for llm_response in self.inner.generate_content_async(llm_request, stream):
+                if first_token is None and stream:
+                    first_token = time.perf_counter()
+                if not llm_response.partial:
+                    last = llm_response
+                    if llm_response.error_code:
+                        # Recorded before it is yielded: the scheduler drops the stream to retry a quota error.
+                        self.telemetry.record_call(call, self.model, llm_request, start, first_token, last, last.error_code)
+                        recorded = True
+                yield llm_response
+        except Exception as e:
+            if not recorded:
+                error = getattr(e, "status", None) or type(e).__name__
+                self.telemetry.record_call(call, self.model, llm_request, start, first_token, last, error)
+                recorded = True
+            raise
+        finally:
+            # A call cancelled before responding (a hedge that lost) is not recorded.
+            if not recorded and last is not None:
+                self.telemetry.record_call(call, self.model, llm_request, start, first_token, last, None)
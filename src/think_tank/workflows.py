@@ -0,0 +1,624 @@
+import asyncio
+import json
+import logging
+import re
+import time
+from typing import AsyncGenerator, Optional
+
+from google.adk.agents import BaseAgent, ParallelAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from pydantic import Field
+from typing_extensions import override
+
+from think_tank.persona_library import PersonaLibrary
+from think_tank.registry import AgentRegistry
+from think_tank.selection import classify_problem, cluster_personas, select_personas
+
+logger = logging.getLogger(__name__)
+
+def problem_text(ctx: InvocationContext) -> str:
+    """Returns everything the user has written in the session, oldest first."""
+    texts = []
+    for event in ctx.session.events:
+        if event.author == "user" and event.content and event.content.parts:
+            texts.extend(part.text for part in event.content.parts if part.text)
+    return "\n".join(texts)
+
+
+async def _merge_agent_runs(
+    agent_runs: dict,
+    deadlines: Optional[dict] = None,
+    timed_out: Optional[list] = None,
+) -> AsyncGenerator[Event, None]:
+    """
+    Merges the event streams of several agents, dropping the ones that overrun.
+
+    Like ParallelAgent, each agent only moves on once its previous event has
+    been processed upstream. An agent still running at its deadline is
+    cancelled and its name appended to timed_out.
+
+    Args:
+        agent_runs: Agent name to its run_async generator.
+        deadlines: Agent name to an absolute event loop time, or None for no deadline.
+        timed_out: Receives the names of the agents that were cancelled.
+    """
+    deadlines = deadlines or {}
+    timed_out = timed_out if timed_out is not None else []
+    loop = asyncio.get_running_loop()
+    tasks = {name: asyncio.ensure_future(run.__anext__()) for name, run in agent_runs.items()}
+    while tasks:
+        now = loop.time()
+        for name in [name for name in tasks if deadlines.get(name) is not None and deadlines[name] <= now]:
+            task = tasks.pop(name)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await agent_runs[name].aclose()
+            timed_out.append(name)
+        if not tasks:
+            break
+
+        pending_deadlines = [deadlines[name] for name in tasks if deadlines.get(name) is not None]
+        timeout = max(min(pending_deadlines) - now, 0) if pending_deadlines else None
+        done, _ = await asyncio.wait(tasks.values(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for name, task in list(tasks.items()):
+            if task not in done:
+                continue
+            try:
+                event = task.result()
+            except StopAsyncIteration:
+                del tasks[name]
+                continue
+            yield event
+            tasks[name] = asyncio.ensure_future(agent_runs[name].__anext__())
+
+
+class SpeculativeFanout:
+    """
+    Runs the persona fan-out on the raw prompt while the user answers the clarification questions.
+
+    Installed as the clarification agent's after-agent callback, it starts the
+    fan-out in the background on a copy of the session as soon as the
+    questions have been sent. When the facilitator's fan-out runs on the
+    answered problem, take() hands it the speculative outputs so the personas
+    only have to patch them instead of starting over. Nothing the background
+    run does is written to the real session.
+
+    The background run is a task on the event loop of the turn that asked the
+    questions, so it only pays off where turns share one long-lived loop
+    (Runner.run_async in the HTTP server or batch mode). Runner.run starts a
+    new loop per turn, which cancels the task when the turn ends; take() then
+    finds nothing and the full panel runs as without speculation. Runs that
+    fail or are cancelled are dropped at once, and runs whose answers don't
+    arrive within max_age seconds are cancelled.
+    """
+
+    def __init__(self, fanout: BaseAgent, max_pending: int = 64, max_age: float = 600.0):
+        """
+        Args:
+            fanout: The persona fan-out agent to run speculatively.
+            max_pending: Speculative runs kept for sessions whose answers haven't
+                arrived; the oldest is cancelled beyond this.
+            max_age: Seconds a speculative run is kept waiting for the answers.
+        """
+        self.fanout = fanout
+        self.max_pending = max_pending
+        self.max_age = max_age
+        self._runs = {}
+
+    def after_agent_callback(self, callback_context: CallbackContext) -> None:
+        """Starts a speculative fan-out for the session the clarification agent just answered."""
+        self.start(callback_context._invocation_context)
+        return None
+
+    def _drop(self, session_id: str) -> None:
+        _, task, _ = self._runs.pop(session_id)
+        if not task.done() and not task.get_loop().is_closed():
+            task.cancel()
+
+    def _discard_failed(self, session_id: str, run: tuple) -> None:
+        task = run[1]
+        if task.cancelled() or task.exception() is not None:
+            if self._runs.get(session_id) is run:
+                del self._runs[session_id]
+
+    def start(self, ctx: InvocationContext) -> None:
+        """Starts the fan-out on a copy of ctx's session, replacing an earlier speculation."""
+        now = time.monotonic()
+        for session_id, (_, task, started) in list(self._runs.items()):
+            if now - started > self.max_age or task.get_loop().is_closed():
+                self._drop(session_id)
+        session = ctx.session.model_copy(deep=True)
+        session.state["speculative"] = True
+        speculative_ctx = ctx.model_copy(update={"session": session, "invocation_id": f"{ctx.invocation_id}-speculative"})
+        if session.id in self._runs:
+            self._drop(session.id)
+        run = (problem_text(ctx), asyncio.ensure_future(self._run(speculative_ctx)), now)
+        self._runs[session.id] = run
+        run[1].add_done_callback(lambda task: self._discard_failed(session.id, run))
+        while len(self._runs) > self.max_pending:
+            self._drop(next(iter(self._runs)))
+
+    async def _run(self, ctx: InvocationContext) -> dict:
+        # Stands in for the runner: the copied session only lives as long as this run.
+        async for event in self.fanout.run_async(ctx):
+            if event.partial:
+                continue
+            ctx.session.events.append(event)
+            if event.actions.state_delta:
+                ctx.session.state.update(event.actions.state_delta)
+        outputs = {}
+        for name in (ctx.session.state.get("persona_selection") or {}).get("personas", []):
+            agent = self.fanout.find_sub_agent(name)
+            output_key = getattr(agent, "output_key", None)
+            if output_key in ctx.session.state:
+                outputs[name] = ctx.session.state[output_key]
+        return outputs
+
+    async def take(self, ctx: InvocationContext) -> Optional[dict]:
+        """
+        Waits for the speculative run of ctx's session and hands it over.
+
+        Returns:
+            {"problem": the text the personas saw, "outputs": persona name to
+            output}, or None when there was no speculation or it failed.
+        """
+        if ctx.session.state.get("speculative"):
+            return None
+        problem, task, _ = self._runs.pop(ctx.session.id, (None, None, None))
+        # A task of another turn's loop (Runner.run) can't be awaited here, and is cancelled anyway.
+        if task is None or task.cancelled() or task.get_loop() is not asyncio.get_running_loop():
+            return None
+        try:
+            outputs = await task
+        except Exception:
+            return None
+        return {"problem": problem, "outputs": outputs}
+
+
+class AdaptiveParallelAgent(ParallelAgent):
+    """
+    ParallelAgent that only fans out to the personas selected for the current problem.
+
+    All personas in the library are registered as sub-agents, but each run
+    classifies the problem (or reuses `state["problem_classification"]` when the
+    orchestrator already set it), records the choice in
+    `state["persona_selection"]` and runs just that subset.
+
+    Each persona gets `persona_deadline` seconds (overridable per persona in
+    `persona_deadlines`) and the whole fan-out is capped by `fanout_budget`.
+    Personas that have not delivered their output by then are cancelled and
+    listed in `state["missing_personas"]`, so the synthesizer can proceed with
+    the perspectives that did arrive.
+
+    With a `persona_registry`, personas are built the first time they are
+    selected and attached as sub-agents then, so `sub_agents` only lists the
+    personas used so far. Selected personas that have since been removed from
+    the library are skipped and dropped from the selection.
+
+    With a `speculation`, personas that already answered the raw prompt while
+    the user was answering the clarification questions are only asked to patch
+    their output with the answers (`state["persona_patch"]`), or are reused
+    as-is when nothing was added to the problem.
+    """
+
+    persona_library: Optional[PersonaLibrary] = None
+    """Where selection looks personas up; refreshed before each run so edits are picked up."""
+
+    persona_registry: Optional[AgentRegistry] = None
+    """Builds personas on first selection. None means every persona is in sub_agents."""
+
+    persona_deadline: Optional[float] = None
+    """Seconds each persona may run before it is cancelled. None disables the deadline."""
+
+    persona_deadlines: dict[str, float] = Field(default_factory=dict)
+    """Per-persona overrides of persona_deadline, keyed by agent name."""
+
+    fanout_budget: Optional[float] = None
+    """Seconds the whole fan-out may take. None disables the budget."""
+
+    speculation: Optional[SpeculativeFanout] = None
+    """Speculative runs of this fan-out on the raw prompt. None always runs the full panel."""
+
+    def deadline_for(self, name: str, start: float) -> Optional[float]:
+        limits = [
+            limit for limit in (self.persona_deadlines.get(name, self.persona_deadline), self.fanout_budget)
+            if limit is not None
+        ]
+        return start + min(limits) if limits else None
+
+    def select(self, ctx: InvocationContext) -> dict:
+        classification = ctx.session.state.get("problem_classification") or classify_problem(problem_text(ctx))
+        if self.persona_library:
+            self.persona_library.refresh()
+        personas, rationale = select_personas(classification, library=self.persona_library)
+        available = {agent.name for agent in self.sub_agents}
+        if self.persona_registry:
+            available.update(self.persona_registry.names())
+        return {
+            "classification": classification,
+            "personas": [name for name in personas if name in available],
+            "rationale": rationale,
+        }
+
+    def removed(self, names: list) -> list:
+        """
+        The personas among names that were removed from the library since they were
+        selected, e.g. by a reload between a run and its critic revision round.
+        """
+        if not self.persona_library:
+            return []
+        return [name for name in names if name not in self.persona_library]
+
+    def persona(self, name: str) -> BaseAgent:
+        """Returns the persona sub-agent called name, building it from the registry if needed."""
+        agent = self.find_sub_agent(name)
+        if agent is None:
+            agent = self.persona_registry.get(name)
+            agent.parent_agent = self
+            self.sub_agents.append(agent)
+        return agent
+
+    def revision(self, ctx: InvocationContext) -> Optional[list]:
+        """The personas a critic revision round asks to re-run, or None outside a revision."""
+        revision = ctx.session.state.get("persona_revision") or {}
+        if not revision.get("personas") or not ctx.session.state.get("persona_selection"):
+            return None
+        return list(revision["personas"])
+
+    def reuse_outputs(self, ctx: InvocationContext, agents: list, outputs: dict) -> list:
+        """
+        Events re-announcing earlier outputs as if the personas had just delivered them,
+        so downstream synthesis sees the full panel while only some personas call the model.
+        """
+        return [
+            Event(
+                invocation_id=ctx.invocation_id,
+                author=agent.name,
+                branch=ctx.branch,
+                actions=EventActions(state_delta={agent.output_key: outputs[agent.name]}),
+            )
+            for agent in agents
+            if agent.name in outputs
+        ]
+
+    @override
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        rerun = self.revision(ctx)
+        speculative = await self.speculation.take(ctx) if self.speculation and rerun is None else None
+        if rerun is None:
+            selection = self.select(ctx)
+            yield Event(
+                invocation_id=ctx.invocation_id,
+                author=self.name,
+                branch=ctx.branch,
+                actions=EventActions(state_delta={"persona_selection": selection}),
+            )
+        else:
+            selection = ctx.session.state["persona_selection"]
+        removed = self.removed(selection["personas"])
+        if removed:
+            logger.warning("Skipping personas removed from the library: %s", ", ".join(removed))
+            selection = {**selection, "personas": [name for name in selection["personas"] if name not in removed]}
+            yield Event(
+                invocation_id=ctx.invocation_id,
+                author=self.name,
+                branch=ctx.branch,
+                actions=EventActions(state_delta={"persona_selection": selection}),
+            )
+        ctx.branch = f"{ctx.branch}.{self.name}" if ctx.branch else self.name
+        personas = [self.persona(name) for name in selection["personas"]]
+        patched = {}
+        if rerun is not None:
+            kept = {
+                agent.name: ctx.session.state[agent.output_key]
+                for agent in personas
+                if agent.name not in rerun and getattr(agent, "output_key", None) in ctx.session.state
+            }
+            for event in self.reuse_outputs(ctx, personas, kept):
+                yield event
+            personas = [agent for agent in personas if agent.name in rerun]
+        elif speculative:
+            patched = {
+                agent.name: speculative["outputs"][agent.name]
+                for agent in personas
+                if agent.name in speculative["outputs"] and getattr(agent, "output_key", None)
+            }
+            problem = problem_text(ctx)
+            answers = problem[len(speculative["problem"]):].strip() if problem.startswith(speculative["problem"]) else problem
+            if not answers:
+                for event in self.reuse_outputs(ctx, personas, patched):
+                    yield event
+                personas = [agent for agent in personas if agent.name not in patched]
+                patched = {}
+            elif patched:
+                # The speculative outputs go into state first, so a persona whose
+                # patch overruns still contributes what it had.
+                yield Event(
+                    invocation_id=ctx.invocation_id,
+                    author=self.name,
+                    branch=ctx.branch,
+                    actions=EventActions(state_delta={
+                        **{agent.output_key: patched[agent.name] for agent in personas if agent.name in patched},
+                        "persona_patch": {"personas": list(patched), "answers": answers},
+                    }),
+                )
+        start = asyncio.get_running_loop().time()
+        agent_runs = {agent.name: agent.run_async(ctx) for agent in personas}
+        deadlines = {agent.name: self.deadline_for(agent.name, start) for agent in personas}
+        output_keys = {agent.name: getattr(agent, "output_key", None) for agent in personas}
+        arrived = set()
+        timed_out = []
+        async for event in _merge_agent_runs(agent_runs, deadlines, timed_out):
+            if output_keys.get(event.author) in event.actions.state_delta:
+                arrived.add(event.author)
+            yield event
+
+        missing = [name for name in timed_out if name not in arrived]
+        if rerun is not None:
+            # A re-run persona that overruns keeps its earlier output.
+            missing = [name for name in ctx.session.state.get("missing_personas") or [] if name not in arrived]
+        overrun = [agent for agent in personas if agent.name in patched and agent.name not in arrived]
+        for event in self.reuse_outputs(ctx, overrun, patched):
+            yield event
+        state_delta = {"missing_personas": [name for name in missing if name not in patched]}
+        if patched:
+            state_delta["persona_patch"] = None
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            actions=EventActions(state_delta=state_delta),
+        )
+
+
+class IncrementalSynthesisAgent(BaseAgent):
+    """
+    Runs the persona fan-out and folds each output into a running draft as it lands.
+
+    Expects three sub-agents: the fan-out agent, a drafting agent that merges
+    the personas listed in `state["synthesis_folding"]` into
+    `state["synthesis_draft"]`, and a reconciliation agent that turns the
+    finished draft into the final answer. Outputs that arrive while a fold is
+    in progress are batched into the next fold.
+    """
+
+    @override
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        fanout, drafter, reconciler = self.sub_agents
+        arrived = asyncio.Queue()
+
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            actions=EventActions(state_delta={"synthesis_draft": "", "synthesis_folding": []}),
+        )
+
+        async def run_fanout():
+            async for event in fanout.run_async(ctx):
+                yield event
+                # Read per event: personas can be attached to the fan-out while it runs.
+                persona = fanout.find_sub_agent(event.author) if event.actions.state_delta else None
+                if persona and getattr(persona, "output_key", None) in event.actions.state_delta:
+                    arrived.put_nowait(persona.name)
+            arrived.put_nowait(None)
+
+        async def run_folds():
+            finished = False
+            while not finished:
+                names = [await arrived.get()]
+                while not arrived.empty():
+                    names.append(arrived.get_nowait())
+                finished = None in names
+                names = [name for name in names if name is not None]
+                if not names:
+                    continue
+                yield Event(
+                    invocation_id=ctx.invocation_id,
+                    author=self.name,
+                    branch=ctx.branch,
+                    actions=EventActions(state_delta={"synthesis_folding": names}),
+                )
+                async for event in drafter.run_async(ctx):
+                    yield event
+
+        async for event in _merge_agent_runs({fanout.name: run_fanout(), drafter.name: run_folds()}):
+            yield event
+        async for event in reconciler.run_async(ctx):
+            yield event
+
+
+class TieredSynthesisAgent(BaseAgent):
+    """
+    Map-reduce synthesis: the persona outputs are reduced per cluster, then merged.
+
+    Expects the fan-out agent first, the final synthesizer last and, in between,
+    one cluster synthesizer per PERSONA_CLUSTERS entry named `<cluster>_synthesizer`.
+    The delivered outputs are grouped with cluster_personas() into
+    `state["synthesis_clusters"]` and the clusters are reduced in parallel into
+    `state["<cluster>_summary"]`, so the final synthesizer reads a fixed number
+    of summaries however large the panel is. A cluster with a single persona
+    skips its reducer and passes the output through, and in a critic revision
+    round a cluster none of whose personas re-ran keeps its earlier summary.
+    """
+
+    @override
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        fanout, *reducers, synthesizer = self.sub_agents
+        reducers = {agent.name.removesuffix("_synthesizer"): agent for agent in reducers}
+
+        arrived = []
+        async for event in fanout.run_async(ctx):
+            yield event
+            persona = fanout.find_sub_agent(event.author) if event.actions.state_delta else None
+            if persona and getattr(persona, "output_key", None) in event.actions.state_delta:
+                arrived.append(persona.name)
+        output_keys = {agent.name: getattr(agent, "output_key", None) for agent in fanout.sub_agents}
+
+        clusters = cluster_personas(arrived)
+        passed_through = {
+            f"{cluster}_summary": ctx.session.state.get(output_keys[names[0]], "")
+            for cluster, names in clusters.items()
+            if len(names) == 1 or cluster not in reducers
+        }
+        rerun = (ctx.session.state.get("persona_revision") or {}).get("personas")
+        if rerun:
+            passed_through.update({
+                f"{cluster}_summary": ctx.session.state[f"{cluster}_summary"]
+                for cluster, names in clusters.items()
+                if f"{cluster}_summary" not in passed_through
+                and f"{cluster}_summary" in ctx.session.state
+                and not set(names) & set(rerun)
+            })
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            actions=EventActions(state_delta={"synthesis_clusters": clusters, **passed_through}),
+        )
+
+        agent_runs = {
+            reducers[cluster].name: reducers[cluster].run_async(ctx)
+            for cluster in clusters
+            if f"{cluster}_summary" not in passed_through
+        }
+        async for event in _merge_agent_runs(agent_runs):
+            yield event
+        async for event in synthesizer.run_async(ctx):
+            yield event
+
+
+
+def persona_key(name: str) -> str:
+    """A persona name as agents are named, however the critic wrote it: "Devils Advocate " -> "devils_advocate"."""
+    return re.sub(r"[\s\-]+", "_", name.strip().lower())
+
+
+def parse_critique(text: str) -> dict:
+    """
+    Parses the critic's JSON verdict, tolerating code fences and prose around it.
+
+    Returns:
+        {"score", "contradictions", "feedback"}, where each contradiction is
+        {"personas": [...], "issue": str} with the names normalized by
+        persona_key(). A verdict without a readable score has score None.
+    """
+    critique = {}
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        try:
+            critique = json.loads(text[start:end + 1])
+        except ValueError:
+            critique = {}
+    if not isinstance(critique, dict):
+        critique = {}
+
+    score = critique.get("score")
+    if not isinstance(score, (int, float)):
+        match = re.search(r'"?score"?\s*[:=]\s*(\d+(?:\.\d+)?)', text)
+        score = float(match.group(1)) if match else None
+    contradictions = []
+    for item in critique.get("contradictions") or []:
+        if isinstance(item, dict) and isinstance(item.get("personas"), list):
+            contradictions.append({
+                "personas": [persona_key(str(name)) for name in item["personas"]],
+                "issue": str(item.get("issue") or ""),
+            })
+    return {
+        "score": float(score) if score is not None else None,
+        "contradictions": contradictions,
+        "feedback": str(critique.get("feedback") or ""),
+    }
+
+
+class CriticLoopAgent(BaseAgent):
+    """
+    Generator–critic loop: the facilitator drafts, the critic scores, flagged personas revise.
+
+    Expects two sub-agents: the facilitator (a fan-out over AdaptiveParallelAgent
+    followed by synthesis) and a critic whose output_key holds a JSON verdict
+    (see parse_critique). After each critique the loop stops when the score
+    reaches score_threshold, improves by less than min_improvement on the best
+    score so far, flags no contradiction, or max_revisions rounds have run.
+    Otherwise `state["persona_revision"]` names the personas involved in the
+    flagged contradictions and the facilitator runs again: only those personas
+    call the model, the other `*_output` keys are reused, and the synthesis is
+    rebuilt from the mix. Each round is recorded in `state["critique_history"]`.
+    """
+
+    score_threshold: float = 8.0
+    """Critic score (0–10) at which the synthesis is accepted."""
+
+    min_improvement: float = 0.5
+    """Smallest gain over the best score so far that justifies another round."""
+
+    max_revisions: int = 2
+    """Revision rounds after the first draft; each re-runs the flagged personas once."""
+
+    def stop_reason(self, critique: dict, best: Optional[float], flagged: list, revision: int) -> Optional[str]:
+        score = critique["score"]
+        if score is None:
+            return "unscored"
+        if score >= self.score_threshold:
+            return "converged"
+        if best is not None and score < best + self.min_improvement:
+            return "stalled"
+        if not flagged:
+            return "no_contradictions"
+        if revision >= self.max_revisions:
+            return "max_revisions"
+        return None
+
+    @override
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        facilitator, critic = self.sub_agents
+
+        async for event in facilitator.run_async(ctx):
+            yield event
+
+        history = []
+        best = None
+        revision = 0
+        while True:
+            async for event in critic.run_async(ctx):
+                yield event
+            critique = parse_critique(ctx.session.state.get(critic.output_key) or "")
+            selected = (ctx.session.state.get("persona_selection") or {}).get("personas", [])
+            flagged = [
+                name for name in selected
+                if any(persona_key(name) in item["personas"] for item in critique["contradictions"])
+            ]
+            reason = self.stop_reason(critique, best, flagged, revision)
+            history.append({"revision": revision, "score": critique["score"], "personas": flagged, "stopped": reason})
+            if critique["score"] is not None:
+                best = critique["score"] if best is None else max(best, critique["score"])
+            if reason:
+                break
+
+            revision += 1
+            yield Event(
+                invocation_id=ctx.invocation_id,
+                author=self.name,
+                branch=ctx.branch,
+                actions=EventActions(state_delta={
+                    "critique_history": list(history),
+                    "persona_revision": {
+                        "revision": revision,
+                        "personas": flagged,
+                        "contradictions": critique["contradictions"],
+                        "feedback": critique["feedback"],
+                    },
+                }),
+            )
+            async for event in facilitator.run_async(ctx):
+                yield event
+
+        # Clear the revision so the next turn's fan-out selects and runs a full panel.
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            actions=EventActions(state_delta={"critique_history": history, "persona_revision": None}),
+        )
@@ -1 +1,9 @@
-from . import agent
\ No newline at end of file
+import importlib
+
+
+def __getattr__(name):
+    # ADK loads `content_publisher.agent.root_agent`; importing it on first access
+    # lets the PDF render workers import content_publisher.tools without ADK.
+    if name == "agent":
+        return importlib.import_module(f"{__name__}.agent")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,13 +1,35 @@
+import asyncio
+import hashlib
 import io
+import json
+import logging
+import multiprocessing
 import os
-from fpdf import FPDF
-from google.genai.types import Part
-import markdown2
-from weasyprint import HTML, CSS
-#from weasyprint.fonts import FontConfiguration # Optional: for advanced font control if ever needed
-
+import shutil
+import sqlite3
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+# WeasyPrint, markdown2, fpdf and google.genai are imported where they are used,
+# so the render workers, which import this module, start without loading
+# google.genai and the agent process doesn't load WeasyPrint.
+
+logger = logging.getLogger(__name__)
 
 ARTIFACTS_DIR = os.getenv("ARTIFACTS_DIR")
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", 2))
+# Rendered PDFs are written here, named by render digest, and artifacts reference them by file URI.
+PDF_SPOOL_DIR = os.getenv("PDF_SPOOL_DIR") or os.path.join(ARTIFACTS_DIR or ".", ".pdf_spool")
+# The oldest spooled PDFs no artifact references are deleted once the spool holds more than this.
+PDF_SPOOL_MAX_BYTES = int(os.getenv("PDF_SPOOL_MAX_BYTES", 1 << 30))
+# File references only work where every artifact consumer reads this disk. Set
+# PDF_FILE_REFERENCES=0 when artifacts are stored in GCS or read on other hosts,
+# so they carry the PDF bytes instead.
+PDF_FILE_REFERENCES = os.getenv("PDF_FILE_REFERENCES", "1").lower() not in ("0", "false", "no")
+# Which spooled files saved artifacts point at, so pruning never breaks an artifact.
+SPOOL_REFERENCES_DB = "references.sqlite"
+COPY_CHUNK_SIZE = 1 << 20
 
 
 REPORT_STYLES = """
@@ -216,12 +238,253 @@ REPORT_STYLES = """
     }
 """
 
+MARKDOWN_EXTRAS = [
+    "tables",
+    "fenced-code-blocks",
+    "nofollow",
+    "cuddled-lists",
+    "strike",
+    "task_list",
+    "smarty-pants"
+]
+
+# Per-process WeasyPrint state, built once by _init_render_worker in each pool worker.
+_worker_stylesheet = None
+_worker_font_config = None
+_render_pool = None
+
+
+def _init_render_worker():
+    """Parses REPORT_STYLES and loads the fonts once per worker process."""
+    global _worker_stylesheet, _worker_font_config
+    from weasyprint import CSS, HTML
+    from weasyprint.text.fonts import FontConfiguration
+
+    _worker_font_config = FontConfiguration()
+    _worker_stylesheet = CSS(string=REPORT_STYLES, font_config=_worker_font_config)
+    # Render a tiny document so fontconfig and Pango are warm before the first real report.
+    HTML(string="<p>warm-up</p>").write_pdf(stylesheets=[_worker_stylesheet], font_config=_worker_font_config)
+
+
+def _render_pdf(markdown_text: str, title_text: str, target=None):
+    """
+    Converts markdown to PDF. Runs inside a render pool worker.
+
+    With a target (a path or file object) the PDF is streamed into it and
+    None is returned; otherwise the PDF bytes are returned.
+    """
+    import markdown2
+    from weasyprint import HTML
+
+    if _worker_stylesheet is None:
+        _init_render_worker()
+
+    # --- 1. Convert Markdown to HTML ---
+    html_body_content = markdown2.markdown(markdown_text, extras=MARKDOWN_EXTRAS)
+
+    # --- 2. Construct the full HTML document ---
+    full_html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <title>{title_text}</title> </head>
+    <body>
+        {html_body_content}
+    </body>
+    </html>
+    """
+
+    # --- 3. Generate PDF using WeasyPrint with the worker's parsed stylesheet ---
+    html_doc = HTML(string=full_html)
+    return html_doc.write_pdf(target, stylesheets=[_worker_stylesheet], font_config=_worker_font_config)
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _render_pdf_to_file(markdown_text: str, title_text: str, path: str) -> dict:
+    """
+    Renders the PDF straight into a file. Runs inside a render pool worker.
+
+    Only the file's size and sha256 travel back to the agent process, so the
+    PDF is never held in memory as one bytes object nor pickled between
+    processes. The file appears atomically once it is complete.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            _render_pdf(markdown_text, title_text, target=f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return {"size": os.path.getsize(path), "sha256": _file_sha256(path)}
+
+
+def _spool_references() -> sqlite3.Connection:
+    conn = sqlite3.connect(os.path.join(PDF_SPOOL_DIR, SPOOL_REFERENCES_DB), timeout=30)
+    with conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS artifact_files ("
+            " id INTEGER PRIMARY KEY,"
+            " path TEXT NOT NULL,"
+            " artifact TEXT NOT NULL,"
+            " version INTEGER)"
+        )
+    return conn
+
+
+def _add_reference(path: str, artifact_name: str) -> int:
+    """
+    Records that artifact_name is about to reference the spooled file at path.
+
+    The reference is recorded before the render starts, so a concurrent prune
+    never deletes a file between its render and its artifact save.
+    """
+    conn = _spool_references()
+    try:
+        with conn:
+            return conn.execute(
+                "INSERT INTO artifact_files (path, artifact) VALUES (?, ?)", (os.path.abspath(path), artifact_name)
+            ).lastrowid
+    finally:
+        conn.close()
+
+
+def _set_reference(reference: int, version: Optional[int]) -> None:
+    """Fills in the artifact version once it is saved, or drops the reference (version None) when the save failed."""
+    conn = _spool_references()
+    try:
+        with conn:
+            if version is None:
+                conn.execute("DELETE FROM artifact_files WHERE id = ?", (reference,))
+            else:
+                conn.execute("UPDATE artifact_files SET version = ? WHERE id = ?", (version, reference))
+    finally:
+        conn.close()
+
+
+def _prune_spool() -> None:
+    """
+    Deletes the oldest spooled PDFs until the spool fits in PDF_SPOOL_MAX_BYTES.
+
+    Files a saved artifact points at are never deleted, since the artifact
+    would be left pointing at nothing; when those alone exceed the limit a
+    warning is logged instead.
+    """
+    conn = _spool_references()
+    try:
+        referenced = {path for (path,) in conn.execute("SELECT path FROM artifact_files")}
+    finally:
+        conn.close()
+    entries = []
+    with os.scandir(PDF_SPOOL_DIR) as spool:
+        for entry in spool:
+            if entry.is_file() and entry.name.endswith(".pdf"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, os.path.abspath(entry.path)))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= PDF_SPOOL_MAX_BYTES:
+            break
+        if path in referenced:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+    if total > PDF_SPOOL_MAX_BYTES:
+        logger.warning(
+            "The PDF spool %s holds %d bytes of files that artifacts reference, more than PDF_SPOOL_MAX_BYTES (%d).",
+            PDF_SPOOL_DIR, total, PDF_SPOOL_MAX_BYTES,
+        )
+
+
+def _local_path(file_uri: str) -> str:
+    return file_uri[len("file://"):] if file_uri.startswith("file://") else file_uri
+
+
+def render_digest(markdown_text: str, title_text: str) -> str:
+    """Content address of a rendered report: markdown, stylesheet and render options."""
+    payload = json.dumps([markdown_text, REPORT_STYLES, MARKDOWN_EXTRAS, title_text])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def _has_rendered_pdf(tool_context, artifact_name: str, digest: str) -> bool:
+    """Whether the latest version of artifact_name is still the render with this digest."""
+    entry = (tool_context.state.get("user:pdf_renders") or {}).get(artifact_name)
+    if not entry or entry.get("digest") != digest:
+        return False
+    pdf_part = await tool_context.load_artifact(artifact_name)
+    if pdf_part and pdf_part.file_data and pdf_part.file_data.file_uri:
+        path = _local_path(pdf_part.file_data.file_uri)
+        return os.path.exists(path) and os.path.getsize(path) == entry.get("size") and _file_sha256(path) == entry.get("pdf_sha256")
+    if not pdf_part or not pdf_part.inline_data or not pdf_part.inline_data.data:
+        return False
+    return hashlib.sha256(pdf_part.inline_data.data).hexdigest() == entry.get("pdf_sha256")
+
+
+def _warm_up_worker() -> int:
+    return os.getpid()
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """
+    Returns the process pool that renders PDFs, starting and warming it on first use.
+
+    Workers are spawned (not forked, which is unsafe with the agent's threads)
+    and each one parses REPORT_STYLES and loads fonts in its initializer.
+    """
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(
+            max_workers=PDF_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_render_worker,
+        )
+        for _ in range(PDF_RENDER_WORKERS):
+            _render_pool.submit(_warm_up_worker)
+    return _render_pool
+
+
+async def _run_in_render_pool(fn, *args):
+    """
+    Runs fn(*args) in the render pool.
+
+    A worker that dies (e.g. killed for memory) breaks the whole pool, so a
+    broken pool is shut down and replaced, and the call retried once.
+    """
+    global _render_pool
+    loop = asyncio.get_running_loop()
+    pool = get_render_pool()
+    try:
+        return await loop.run_in_executor(pool, fn, *args)
+    except BrokenProcessPool:
+        pool.shutdown(wait=False, cancel_futures=True)
+        # Calls that failed on the same pool at once replace it only once.
+        if _render_pool is pool:
+            _render_pool = None
+        return await loop.run_in_executor(get_render_pool(), fn, *args)
+
+
 async def markdown_to_pdf(tool_context, markdown_text: str, filename: str = "generated_report.pdf") -> dict:
     """
     Converts a markdown string to a professional-looking PDF using WeasyPrint,
     saves it as an artifact, and returns a JSON-compatible dictionary.
     It includes styles for headers, lists, tables, code blocks, etc.
 
+    Rendering runs in a warmed process pool, so the event loop keeps serving
+    other sessions while the report is produced. The artifact references the
+    spooled file, so the PDF is never read into memory, unless
+    PDF_FILE_REFERENCES is off; then it carries the PDF bytes.
+
     Args:
         tool_context: The ADK ToolContext for managing artifacts.
         markdown_text: The markdown text to convert.
@@ -231,53 +494,66 @@ async def markdown_to_pdf(tool_context, markdown_text: str, filename: str = "gen
         A dictionary with status, message, and artifact name.
     """
     try:
-        # --- 1. Define the CSS for a professional report look ---
-        css_stylesheet = CSS(string=REPORT_STYLES)
-
-        # --- 2. Convert Markdown to HTML ---
-        html_body_content = markdown2.markdown(
-            markdown_text,
-            extras=[
-                "tables",
-                "fenced-code-blocks",
-                "nofollow",
-                "cuddled-lists",
-                "strike",
-                "task_list",
-                "smarty-pants"
-            ]
-        )
-
-        # --- 3. Construct the full HTML document ---
-        # Corrected the comment to use proper HTML comment syntax # Also, it's generally better to place comments on their own line or after content
-        # for clarity within the f-string, though not strictly necessary for HTML.
         title_text = filename.replace('.pdf', '')
-        full_html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <title>{title_text}</title> </head>
-        <body>
-            {html_body_content}
-        </body>
-        </html>
-        """
-
-        # --- 4. Generate PDF using WeasyPrint ---
-        
-        html_doc = HTML(string=full_html)
-        pdf_bytes = html_doc.write_pdf(stylesheets=[css_stylesheet])
-
-        # --- 5. Create and save artifact ---
-        pdf_part = Part.from_bytes(data=pdf_bytes, mime_type="application/pdf")
         artifact_name = f"user:{filename}"
-        await tool_context.save_artifact(artifact_name, pdf_part)
+        digest = render_digest(markdown_text, title_text)
+
+        # --- 1. Reuse the existing artifact when this exact report was rendered before ---
+        if await _has_rendered_pdf(tool_context, artifact_name, digest):
+            return {
+                "status": "success",
+                "message": f"Unchanged report, reusing PDF artifact '{artifact_name}'.",
+                "artifact_name": artifact_name,
+                "content_hash": digest,
+                "reused": True
+            }
+
+        from google.genai.types import FileData, Part
+
+        # --- 2. Render the PDF in the worker pool, straight into the spool directory ---
+        os.makedirs(PDF_SPOOL_DIR, exist_ok=True)
+        by_reference = PDF_FILE_REFERENCES
+        if by_reference:
+            pdf_path = os.path.abspath(os.path.join(PDF_SPOOL_DIR, f"{digest}.pdf"))
+            reference = _add_reference(pdf_path, artifact_name)
+        else:
+            fd, pdf_path = tempfile.mkstemp(suffix=".render", dir=PDF_SPOOL_DIR)
+            os.close(fd)
+        try:
+            rendered = await _run_in_render_pool(_render_pdf_to_file, markdown_text, title_text, pdf_path)
+
+            # --- 3. Save the artifact, as a reference to the file where consumers share this disk ---
+            if by_reference:
+                pdf_part = Part(file_data=FileData(file_uri=f"file://{pdf_path}", mime_type="application/pdf"))
+            else:
+                with open(pdf_path, "rb") as f:
+                    pdf_part = Part.from_bytes(data=f.read(), mime_type="application/pdf")
+            version = await tool_context.save_artifact(artifact_name, pdf_part)
+        except BaseException:
+            if by_reference:
+                _set_reference(reference, None)
+            raise
+        finally:
+            if not by_reference and os.path.exists(pdf_path):
+                os.remove(pdf_path)
+        if by_reference:
+            _set_reference(reference, version)
+            _prune_spool()
+        renders = dict(tool_context.state.get("user:pdf_renders") or {})
+        renders[artifact_name] = {
+            "digest": digest,
+            "version": version,
+            "pdf_sha256": rendered["sha256"],
+            "size": rendered["size"]
+        }
+        tool_context.state["user:pdf_renders"] = renders
 
         return {
             "status": "success",
             "message": f"Professional PDF artifact '{artifact_name}' created and saved.",
-            "artifact_name": artifact_name
+            "artifact_name": artifact_name,
+            "content_hash": digest,
+            "reused": False
         }
     except Exception as e:
         return {
@@ -298,6 +574,9 @@ async def markdown_to_pdf_old(tool_context, markdown_text: str, filename: str =
         A dictionary with status, message, and artifact name.
     """
     try:
+        from fpdf import FPDF
+        from google.genai.types import Part
+
         # Basic markdown to plain text (MVP: ignore formatting)
         plain_text = markdown_text.replace("#", "").replace("*", "").replace("`", "")
 
@@ -331,9 +610,33 @@ async def markdown_to_pdf_old(tool_context, markdown_text: str, filename: str =
             "artifact_name": None
         }
 
+def _file_matches(path: str, data: bytes) -> bool:
+    """Whether the file at path exists with exactly these bytes (size check first, then sha256)."""
+    if not os.path.exists(path) or os.path.getsize(path) != len(data):
+        return False
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.digest() == hashlib.sha256(data).digest()
+
+def _files_match(path: str, source_path: str) -> bool:
+    """Whether the file at path has the same bytes as source_path, compared chunk by chunk."""
+    if not os.path.exists(path) or os.path.getsize(path) != os.path.getsize(source_path):
+        return False
+    with open(path, "rb") as f, open(source_path, "rb") as source:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+            if chunk != source.read(len(chunk)):
+                return False
+    return True
+
 async def publish_pdf(tool_context, pdf_artifact_name: str, filename: str = "published_report.pdf") -> dict:
     """
     Saves a PDF artifact as a local file in the artifacts directory.
+
+    Artifacts that reference a rendered file are copied file to file (sendfile
+    where the OS supports it), so the PDF is never loaded into memory.
+
     Args:
         tool_context: The ADK ToolContext for accessing artifacts.
         pdf_artifact_name: The name of the PDF artifact to retrieve.
@@ -345,32 +648,61 @@ async def publish_pdf(tool_context, pdf_artifact_name: str, filename: str = "pub
         # Ensure the output directory exists
         output_dir = ARTIFACTS_DIR
         os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, filename)
 
         # Retrieve the PDF artifact
         pdf_part = await tool_context.load_artifact(pdf_artifact_name)
-        if not pdf_part or not hasattr(pdf_part, 'inline_data') or not pdf_part.inline_data.data:
+        source_path = None
+        if pdf_part and pdf_part.file_data and pdf_part.file_data.file_uri:
+            source_path = _local_path(pdf_part.file_data.file_uri)
+            if not os.path.exists(source_path):
+                source_path = None
+        elif not pdf_part or not hasattr(pdf_part, 'inline_data') or not pdf_part.inline_data or not pdf_part.inline_data.data:
+            pdf_part = None
+        if pdf_part is not None and pdf_part.file_data and source_path is None:
+            return {
+                "status": "error",
+                "message": f"The rendered file of artifact '{pdf_artifact_name}' was removed from the spool; render the report again.",
+                "file_path": None
+            }
+        if pdf_part is None:
             return {
                 "status": "error",
                 "message": f"Artifact '{pdf_artifact_name}' not found or invalid.",
                 "file_path": None
             }
 
-        # Extract PDF bytes
-        pdf_bytes = pdf_part.inline_data.data
+        # Skip the write when the file on disk already holds these bytes
+        if source_path:
+            unchanged = _files_match(output_path, source_path)
+        else:
+            unchanged = _file_matches(output_path, pdf_part.inline_data.data)
+        if unchanged:
+            return {
+                "status": "success",
+                "message": f"PDF already up to date at {output_path}",
+                "file_path": output_path,
+                "unchanged": True
+            }
 
-        # Write the PDF to a local file
-        output_path = os.path.join(output_dir, filename)
-        with open(output_path, "wb") as f:
-            f.write(pdf_bytes)
+        # Write the PDF to a local file, replacing the old one only once the copy is complete
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        if source_path:
+            shutil.copyfile(source_path, tmp_path)
+        else:
+            with open(tmp_path, "wb") as f:
+                f.write(pdf_part.inline_data.data)
+        os.replace(tmp_path, output_path)
 
         return {
             "status": "success",
             "message": f"PDF saved locally as {output_path}",
-            "file_path": output_path
+            "file_path": output_path,
+            "unchanged": False
         }
     except Exception as e:
         return {
             "status": "error",
             "message": f"Failed to publish PDF: {str(e)}",
             "file_path": None
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,31 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "src"), os.path.join(ROOT, "src", "util_agents")]
+
+# The agent modules read these at import time; every test runs offline on the fake model.
+os.environ.setdefault("VERTEX_AI_MODEL", "fake-model")
+os.environ["THINK_TANK_CACHE_DIR"] = ""
+
+import think_tank.fake_llm  # noqa: E402,F401  registers the fake-* models
+
+import pytest  # noqa: E402
+
+from think_tank import fake_llm  # noqa: E402
+
+
+@pytest.fixture
+def fast_model(monkeypatch):
+    """Makes the fake model answer in about a millisecond and records every request it gets."""
+    monkeypatch.setattr(fake_llm, "FAKE_LLM_CONFIG", fake_llm.FAKE_LLM_CONFIG.model_copy(update={"latency_ms": 1, "latency_sigma": 0}))
+    requests = []
+    generate = fake_llm.FakeLlm.generate_content_async
+
+    async def recording(self, llm_request, stream=False):
+        requests.append(llm_request.model_copy(deep=True))
+        async for llm_response in generate(self, llm_request, stream):
+            yield llm_response
+
+    monkeypatch.setattr(fake_llm.FakeLlm, "generate_content_async", recording)
+    return requests
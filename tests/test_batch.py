@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import json
+
+from think_tank import fake_llm
+from think_tank.__main__ import APP_NAME, NO_ANSWERS, USER_ID, run_batch
+from think_tank.agent import facilitator_agent
+from think_tank.sessions import SqliteSessionService
+
+
+def test_batch_answers_come_from_the_panel_not_the_clarification_questions(tmp_path, monkeypatch):
+    monkeypatch.setattr(fake_llm, "FAKE_LLM_CONFIG", fake_llm.FAKE_LLM_CONFIG.model_copy(update={"latency_ms": 1, "latency_sigma": 0}))
+    questions = tmp_path / "questions.jsonl"
+    questions.write_text(json.dumps({"id": "q1", "question": "How do we roll out AI agents?"}) + "\n")
+    output = tmp_path / "answers.jsonl"
+    args = argparse.Namespace(input=str(questions), output=str(output), concurrency=1, state=None, db_url=None)
+
+    summary = asyncio.run(run_batch(args))
+
+    assert summary["ok"] == 1
+    result = json.loads(output.read_text())
+    assert "clarification" not in [response["author"] for response in result["responses"]]
+    assert result["responses"][-1]["author"] == "synthesizer"
+
+
+def test_batch_sessions_queue_at_batch_priority(tmp_path, fast_model):
+    questions = tmp_path / "questions.jsonl"
+    questions.write_text(json.dumps({"id": "q1", "question": "How do we roll out AI agents?"}) + "\n")
+    output = tmp_path / "answers.jsonl"
+    db_url = f"sqlite:///{tmp_path}/sessions.db"
+    args = argparse.Namespace(input=str(questions), output=str(output), concurrency=1, state=None, db_url=db_url)
+
+    asyncio.run(run_batch(args))
+
+    session_id = json.loads(output.read_text())["session_id"]
+    session = SqliteSessionService(db_url).get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+    assert session.state["priority"] == "batch"
+
+
+def test_clarification_questions_without_answers_are_waived(tmp_path, fast_model, monkeypatch):
+    # The root asks for clarification first; once answered, the clarification agent hands over to the panel.
+    calls = []
+
+    def transfer_target(self, name, llm_request):
+        calls.append(name)
+        if "transfer_to_agent" not in llm_request.tools_dict or any(part.function_response for part in llm_request.contents[-1].parts or []):
+            return None
+        if name == "problem_solver":
+            return "clarification" if calls.count(name) == 1 else facilitator_agent.name
+        if name == "clarification" and calls.count(name) > 1:
+            return facilitator_agent.name
+        return None
+
+    monkeypatch.setattr(fake_llm.FakeLlm, "_transfer_target", transfer_target)
+    questions = tmp_path / "questions.jsonl"
+    questions.write_text(json.dumps({"id": "q1", "question": "How do we roll out AI agents?"}) + "\n")
+    output = tmp_path / "answers.jsonl"
+    args = argparse.Namespace(input=str(questions), output=str(output), concurrency=1, state=None, db_url=None)
+
+    asyncio.run(run_batch(args))
+
+    result = json.loads(output.read_text())
+    assert result["status"] == "ok"
+    assert [response["author"] for response in result["responses"]][0] == "clarification"
+    assert result["responses"][-1]["author"] == "synthesizer"
+    clarification = [request for request in fast_model if fake_llm.agent_name(request) == "clarification"]
+    assert any(NO_ANSWERS in (part.text or "") for content in clarification[-1].contents for part in content.parts)
@@ -0,0 +1,49 @@
+import json
+import os
+import subprocess
+import sys
+
+import bench_think_tank
+from bench_think_tank import busy_time, compare, summarize
+
+SRC = os.path.dirname(os.path.abspath(bench_think_tank.__file__))
+SUMMARY = {"p50", "p95", "p99", "mean"}
+
+
+def bench(*args: str) -> subprocess.CompletedProcess:
+    command = [sys.executable, "bench_think_tank.py", "--runs", "2", "--warmup", "0", "--latency-ms", "1", "--latency-sigma", "0", *args]
+    return subprocess.run(command, cwd=SRC, capture_output=True, text=True, timeout=300)
+
+
+def test_benchmark_reports_every_field_on_the_fake_model(tmp_path):
+    output = tmp_path / "bench.json"
+    result = bench("--label", "smoke", "--output", str(output))
+    assert result.returncode == 0, result.stderr
+    report = json.loads(output.read_text())
+    assert report["meta"]["label"] == "smoke" and report["meta"]["config"]["runs"] == 2
+    for metric in ("e2e_ms", "overhead_ms", "model_calls", "events"):
+        assert set(report[metric]) == SUMMARY, metric
+    assert report["model_calls"]["p50"] >= 3
+    assert 0 < report["overhead_ms"]["p50"] <= report["e2e_ms"]["p50"]
+    assert report["peak_traced_mb"] > 0 and report["max_rss_mb"] > 0
+    assert {"problem_solver", "synthesizer"} <= set(report["agents"])
+    for agent in report["agents"].values():
+        assert set(agent) == {"finished_at_ms", "model_latency_ms", "events"}
+
+    # Against itself with a generous tolerance, nothing regresses.
+    assert bench("--baseline", str(output), "--tolerance", "100").returncode == 0
+
+
+def test_busy_time_counts_overlapping_calls_once():
+    assert busy_time([(0, 2), (1, 3), (5, 6)]) == 4
+    assert busy_time([]) == 0
+
+
+def test_compare_flags_only_regressions_beyond_the_tolerance():
+    baseline = {"e2e_ms": summarize([100.0]), "overhead_ms": summarize([10.0])}
+    result = {"e2e_ms": summarize([105.0]), "overhead_ms": summarize([20.0])}
+    assert compare(result, baseline, tolerance=0.10) == [
+        "overhead_ms.p50: 10.0 -> 20.0 (+100.0%)",
+        "overhead_ms.p95: 10.0 -> 20.0 (+100.0%)",
+        "overhead_ms.p99: 10.0 -> 20.0 (+100.0%)",
+    ]
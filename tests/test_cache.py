@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from think_tank.cache import PersonaResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def test_hit_and_miss(tmp_path, clock):
+    cache = PersonaResponseCache(str(tmp_path / "cache.sqlite"))
+    key = cache.make_key("instruction", "fake-model", "user: problem")
+    assert cache.get(key) is None
+    cache.put(key, "answer")
+    assert cache.get(key) == "answer"
+
+
+def test_key_ignores_whitespace():
+    assert PersonaResponseCache.make_key("a  b", "m", "x\n y") == PersonaResponseCache.make_key("a b", "m", "x y")
+    assert PersonaResponseCache.make_key("a", "m", "x") != PersonaResponseCache.make_key("a", "other", "x")
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = PersonaResponseCache(str(tmp_path / "cache.sqlite"), ttl_seconds=60)
+    cache.put("key", "answer")
+    clock[0] += 59
+    assert cache.get("key") == "answer"
+    clock[0] += 2
+    assert cache.get("key") is None
+    # An expired entry is purged, not just hidden.
+    clock[0] -= 10
+    assert cache.get("key") is None
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = PersonaResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.put("a", "1")
+    clock[0] += 1
+    cache.put("b", "2")
+    clock[0] += 1
+    assert cache.get("a") == "1"  # a is now more recent than b
+    clock[0] += 1
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
@@ -0,0 +1,86 @@
+import asyncio
+from typing import AsyncGenerator
+
+from google.adk.agents import LlmAgent
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from think_tank.cassette import Cassette, CassetteLlm
+
+
+class KeepLlm(BaseLlm):
+    """Answers every call with `KEEP`, as a persona does when its speculative draft stands."""
+
+    calls: int = 0
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="KEEP")]))
+
+
+def _build(cassette: Cassette, seen: list) -> tuple:
+    llm = KeepLlm(model="keep-model")
+
+    def restore(callback_context, llm_response):
+        if not llm_response.content:
+            return None
+        seen.append(llm_response.content.parts[0].text)
+        if llm_response.content.parts[0].text == "KEEP":
+            return LlmResponse(content=types.Content(role="model", parts=[types.Part(text="the full draft")]))
+        return None
+
+    agent = LlmAgent(name="persona", model=llm, instruction="Answer.", after_model_callback=restore)
+    cassette.instrument(agent)
+    return agent, llm
+
+
+def _run(agent) -> str:
+    async def main():
+        runner = InMemoryRunner(agent, app_name="test")
+        session = runner.session_service.create_session(app_name="test", user_id="u")
+        texts = []
+        message = types.Content(role="user", parts=[types.Part(text="The problem.")])
+        async for event in runner.run_async(user_id="u", session_id=session.id, new_message=message):
+            if event.content and event.content.parts and event.content.parts[0].text:
+                texts.append(event.content.parts[0].text)
+        return texts[-1]
+
+    return asyncio.run(main())
+
+
+def test_replays_the_model_response_through_the_callbacks(tmp_path):
+    path = str(tmp_path / "run.cassette.jsonl.gz")
+    recorder = Cassette(path, mode="record")
+    agent, llm = _build(recorder, [])
+    assert _run(agent) == "the full draft"
+    recorder.close()
+    assert recorder.stats["recorded"] == 1
+
+    player = Cassette(path, mode="replay", speed=0)
+    seen = []
+    agent, llm = _build(player, seen)
+    assert isinstance(agent.model, CassetteLlm)
+    assert _run(agent) == "the full draft"
+    # The model is never called, but the agent's own after-model callback restores the replayed `KEEP` again.
+    assert llm.calls == 0
+    assert seen == ["KEEP"]
+    assert player.stats["replayed"] == 1 and player.stats["drift"] == 0
+
+
+def test_replay_miss_returns_an_error_response(tmp_path):
+    path = str(tmp_path / "empty.cassette.jsonl.gz")
+    Cassette(path, mode="record").close()
+    player = Cassette(path, mode="replay", speed=0)
+    agent, llm = _build(player, [])
+    asyncio.run(_run_quietly(agent))
+    assert player.stats["misses"] == 1
+    assert llm.calls == 0
+
+
+async def _run_quietly(agent) -> None:
+    runner = InMemoryRunner(agent, app_name="test")
+    session = runner.session_service.create_session(app_name="test", user_id="u")
+    message = types.Content(role="user", parts=[types.Part(text="The problem.")])
+    async for _ in runner.run_async(user_id="u", session_id=session.id, new_message=message):
+        pass
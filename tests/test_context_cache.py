@@ -0,0 +1,97 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from google.adk.models import LlmRequest
+from google.genai import errors, types
+
+from think_tank import context_cache
+from think_tank.context_cache import LocalContextCacheBackend, SharedContextCache, resolve_local_cache, shared_prefix
+from think_tank.fake_llm import FakeLlm
+
+
+def user(text: str) -> types.Content:
+    return types.Content(role="user", parts=[types.Part(text=text)])
+
+
+PROBLEM = user("How do we roll out the new platform? " + "Background. " * 200)
+NOTE = types.Content(role="user", parts=[types.Part(text="For context:"), types.Part(text="[clarification] Answers.")])
+
+
+def persona_request(name: str, *extra) -> tuple:
+    llm_request = LlmRequest(
+        model="fake-model",
+        contents=[PROBLEM, NOTE, *extra],
+        config=types.GenerateContentConfig(system_instruction=f'Your internal name is "{name}". Persona {name}.'),
+    )
+    callback_context = SimpleNamespace(invocation_id="run-1", user_content=PROBLEM)
+    return callback_context, llm_request
+
+
+def test_prefix_ends_after_the_notes_following_the_user_message():
+    revision = user("Resolve the rollout contradiction.")
+    assert shared_prefix([PROBLEM, NOTE, revision], PROBLEM) == 2
+    assert shared_prefix([PROBLEM, NOTE], None) == 0
+    assert shared_prefix([user("patch prompt")], PROBLEM) == 0
+
+
+def test_personas_share_one_upload_whatever_they_append():
+    backend = LocalContextCacheBackend()
+    cache = SharedContextCache(backend, min_tokens=100)
+
+    async def run():
+        requests = [
+            persona_request("mckinsey"),
+            persona_request("devils_advocate", user("Resolve the rollout contradiction.")),
+        ]
+        await asyncio.gather(*(cache.before_model_callback(*request) for request in requests))
+        return [llm_request for _, llm_request in requests]
+
+    mckinsey, devils_advocate = asyncio.run(run())
+    assert backend.creates == 1
+    assert mckinsey.config.cached_content == devils_advocate.config.cached_content
+    assert backend.resolve(mckinsey.config.cached_content) == [PROBLEM, NOTE]
+    assert mckinsey.config.system_instruction is None
+    assert [content.parts[0].text for content in devils_advocate.contents] == [
+        "Resolve the rollout contradiction.", 'Your internal name is "devils_advocate". Persona devils_advocate.',
+    ]
+
+
+def test_small_prefix_is_left_alone_even_with_a_long_suffix():
+    backend = LocalContextCacheBackend()
+    cache = SharedContextCache(backend, min_tokens=10_000)
+    callback_context, llm_request = persona_request("mckinsey", user("Long revision. " * 5000))
+    asyncio.run(cache.before_model_callback(callback_context, llm_request))
+    assert backend.creates == 0
+    assert llm_request.config.cached_content is None
+    assert len(llm_request.contents) == 3
+
+
+def test_fake_model_answers_from_the_cached_prefix():
+    cache = SharedContextCache(LocalContextCacheBackend(), min_tokens=100)
+    callback_context, llm_request = persona_request("mckinsey")
+    asyncio.run(cache.before_model_callback(callback_context, llm_request))
+    llm = FakeLlm(model="fake-model")
+
+    async def generate(llm_request):
+        return [response async for response in llm.generate_content_async(llm_request)]
+
+    responses = asyncio.run(generate(llm_request))
+    assert "[mckinsey]" in responses[-1].content.parts[0].text
+
+    llm_request.config.cached_content = "local/cachedContents/unknown"
+    with pytest.raises(errors.ClientError):
+        asyncio.run(generate(llm_request))
+
+
+def test_expired_local_caches_are_purged(monkeypatch):
+    monkeypatch.setattr(context_cache, "_LOCAL_CACHES", {})
+    backend = LocalContextCacheBackend()
+    expired = asyncio.run(backend.create("fake-model", [PROBLEM], ttl_seconds=-1))
+    live = asyncio.run(backend.create("fake-model", [PROBLEM], ttl_seconds=600))
+    assert list(context_cache._LOCAL_CACHES) == [live] and backend.names == [live]
+
+    context_cache._LOCAL_CACHES[expired] = {"model": "fake-model", "contents": [PROBLEM], "expires_at": 0}
+    assert resolve_local_cache(expired) is None
+    assert resolve_local_cache(live) == [PROBLEM]
+    assert list(context_cache._LOCAL_CACHES) == [live]
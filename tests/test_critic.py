@@ -0,0 +1,111 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from google.adk.agents import LlmAgent, ParallelAgent, SequentialAgent
+from google.adk.models import LlmRequest, LlmResponse
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from think_tank.fake_llm import agent_name
+from think_tank.sub_agents.critic.agent import attach_revision_request, attach_synthesis
+from think_tank.sub_agents.synthesizer.agent import attach_revised_outputs
+from think_tank.workflows import CriticLoopAgent, parse_critique, persona_key
+
+
+CRITIQUE = """```json
+{"score": 6, "contradictions": [{"personas": ["McKinsey ", "Devils Advocate"], "issue": "Pilot or big bang?"}],
+ "feedback": "Resolve the rollout."}
+```"""
+
+
+def test_persona_names_are_normalized_once_for_every_consumer():
+    assert persona_key(" Devils-Advocate ") == "devils_advocate"
+    critique = parse_critique(CRITIQUE)
+    assert critique["score"] == 6
+    assert critique["contradictions"][0]["personas"] == ["mckinsey", "devils_advocate"]
+
+
+def test_flagged_persona_gets_the_revision_request_whatever_the_critic_wrote():
+    critique = parse_critique(CRITIQUE)
+    revision = {"personas": ["devils_advocate"], "contradictions": critique["contradictions"], "feedback": critique["feedback"]}
+    llm_request = LlmRequest()
+    attach_revision_request(SimpleNamespace(state={"persona_revision": revision}, agent_name="devils_advocate"), llm_request)
+    assert "Pilot or big bang?" in llm_request.contents[-1].parts[0].text
+
+    llm_request = LlmRequest()
+    attach_revision_request(SimpleNamespace(state={"persona_revision": revision}, agent_name="mckinsey"), llm_request)
+    assert not llm_request.contents
+
+
+PROBLEM = "Should we roll out AI agents as a pilot or company-wide?"
+
+
+def verdict(score: float, feedback: str = "Agree on the pace.") -> str:
+    return json.dumps({"score": score, "contradictions": [{"personas": ["mckinsey", "devils_advocate"], "issue": "Pilot or big bang?"}], "feedback": feedback})
+
+
+def run_loop(verdicts: list, max_revisions: int = 2) -> tuple:
+    """Runs a critic loop over two fake-model personas, the critic answering with verdicts in turn."""
+    critic_requests = []
+
+    def scripted_verdict(callback_context, llm_request):
+        critic_requests.append(llm_request.contents[-1].parts[0].text)
+        return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=verdicts.pop(0))]))
+
+    personas = [
+        LlmAgent(name=name, model="fake-model", before_model_callback=attach_revision_request, output_key=f"{name}_output")
+        for name in ("mckinsey", "devils_advocate")
+    ]
+    synthesizer = LlmAgent(name="synthesizer", model="fake-model", before_model_callback=attach_revised_outputs, output_key="synthesis")
+    critic = LlmAgent(
+        name="critic",
+        model="fake-model",
+        include_contents="none",
+        before_model_callback=[attach_synthesis, scripted_verdict],
+        output_key="critique",
+    )
+    loop = CriticLoopAgent(
+        name="facilitator",
+        sub_agents=[SequentialAgent(name="panel", sub_agents=[ParallelAgent(name="personas", sub_agents=personas), synthesizer]), critic],
+        max_revisions=max_revisions,
+        score_threshold=8,
+        min_improvement=0.5,
+    )
+    runner = InMemoryRunner(loop, app_name="tt")
+    session = runner.session_service.create_session(
+        app_name="tt", user_id="u", state={"persona_selection": {"personas": ["mckinsey", "devils_advocate"]}}
+    )
+
+    async def run():
+        message = types.Content(role="user", parts=[types.Part(text=PROBLEM)])
+        async for _ in runner.run_async(user_id="u", session_id=session.id, new_message=message):
+            pass
+
+    asyncio.run(run())
+    state = runner.session_service.get_session(app_name="tt", user_id="u", session_id=session.id).state
+    return state, critic_requests
+
+
+def test_loop_stops_once_the_critic_accepts(fast_model):
+    state, critic_requests = run_loop([verdict(9)])
+    assert [round["stopped"] for round in state["critique_history"]] == ["converged"]
+    assert critic_requests[0].startswith(f"**Problem:**\n{PROBLEM}\n\n**Syntes:**")
+
+
+def test_revision_round_reruns_flagged_personas_with_the_feedback(fast_model):
+    state, _ = run_loop([verdict(5, "Settle on a pilot."), verdict(5.2)])
+    assert [round["stopped"] for round in state["critique_history"]] == [None, "stalled"]
+    assert state["persona_revision"] is None
+
+    revised = [request for request in fast_model if any("REVISION REQUEST" in (part.text or "") for content in request.contents for part in content.parts)]
+    assert sorted(agent_name(request) for request in revised) == ["devils_advocate", "mckinsey"]
+    synthesis = [request for request in fast_model if agent_name(request) == "synthesizer"][-1].contents[-1].parts[0].text
+    assert synthesis.startswith(f"**Problem:**\n{PROBLEM}\n\n")
+    assert "Pilot or big bang?" in synthesis and "Settle on a pilot." in synthesis
+
+
+def test_loop_stops_after_max_revisions(fast_model):
+    state, critic_requests = run_loop([verdict(3), verdict(5)], max_revisions=1)
+    assert [round["stopped"] for round in state["critique_history"]] == [None, "max_revisions"]
+    assert len(critic_requests) == 2
@@ -0,0 +1,33 @@
+from think_tank.dedup import NearDuplicateCollapser, jaccard, shingles, split_units
+
+
+OUTPUTS = {
+    "mckinsey": "**Rekommendation:**\n- Start with a small pilot in one business unit before scaling\n- Define clear KPIs for adoption",
+    "org_psychologist": "- Start with a small pilot in one business unit before scaling up\n- Address employee fear of automation early",
+}
+
+
+def test_units_keep_headings_and_join_continuation_lines():
+    assert split_units("## Plan\n- first bullet\n  continued\n1. numbered") == [
+        ("heading", "## Plan"), ("unit", "first bullet continued"), ("unit", "numbered"),
+    ]
+
+
+def test_shingles_ignore_citations_and_case():
+    assert shingles("Run a Pilot [mckinsey]") == shingles("run a pilot")
+    assert jaccard(set(), set()) == 0.0
+
+
+def test_near_duplicates_across_personas_are_merged_with_every_citation():
+    text, stats = NearDuplicateCollapser().collapse(OUTPUTS)
+    assert "- Start with a small pilot in one business unit before scaling up [mckinsey, org_psychologist]" in text
+    # The rest stays in its persona's section, under its heading.
+    assert "**mckinsey:**\n**Rekommendation:**\n- Define clear KPIs for adoption" in text
+    assert "**org_psychologist:**\n- Address employee fear of automation early" in text
+    assert stats["clusters"] == 1 and stats["merged_units"] == 2 and stats["units"] == 4
+
+
+def test_repeats_within_one_persona_are_not_merged():
+    text, stats = NearDuplicateCollapser().collapse({"mckinsey": "- Run a pilot first\n- Run a pilot first"})
+    assert stats["clusters"] == 0
+    assert text.count("Run a pilot first") == 2
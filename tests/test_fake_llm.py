@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+import pytest
+from google.adk.models import LlmRequest
+from google.genai import errors, types
+
+from think_tank import fake_llm
+from think_tank.fake_llm import FakeLlm, agent_name
+
+
+def request(name: str, text: str = "Plan the rollout", **config) -> LlmRequest:
+    return LlmRequest(
+        contents=[types.Content(role="user", parts=[types.Part(text=text)])],
+        config=types.GenerateContentConfig(system_instruction=f'You are an agent. Your internal name is "{name}".', **config),
+    )
+
+
+def generate(llm_request: LlmRequest, model: str = "fake-model", stream: bool = False) -> list:
+    async def run():
+        return [response async for response in FakeLlm(model=model).generate_content_async(llm_request, stream)]
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def config(monkeypatch):
+    """Restores the process-wide fake model configuration after the test."""
+    monkeypatch.setattr(fake_llm, "FAKE_LLM_CONFIG", fake_llm.FAKE_LLM_CONFIG.model_copy(update={"latency_ms": 1, "latency_sigma": 0}))
+    monkeypatch.setattr(fake_llm, "_quota_buckets", {})
+    return fake_llm.configure
+
+
+def test_agent_name_is_read_from_the_identity_instruction():
+    assert agent_name(request("mckinsey")) == "mckinsey"
+    assert agent_name(LlmRequest()) == "unknown"
+
+
+def test_identical_requests_get_identical_answers(config):
+    text = generate(request("mckinsey"))[-1].content.parts[0].text
+    assert text.startswith("- [mckinsey] ")
+    assert generate(request("mckinsey"))[-1].content.parts[0].text == text
+    assert generate(request("mckinsey", "Another problem"))[-1].content.parts[0].text != text
+    config(seed=1)
+    assert generate(request("mckinsey"))[-1].content.parts[0].text != text
+
+
+def test_streamed_chunks_add_up_to_the_final_answer(config):
+    responses = generate(request("mckinsey"), stream=True)
+    assert all(response.partial for response in responses[:-1]) and not responses[-1].partial
+    assert "".join(response.content.parts[0].text for response in responses[:-1]).strip() == responses[-1].content.parts[0].text
+
+
+def test_latency_follows_the_agent_and_model_overrides(config):
+    config(latency_ms=0, agent_latency_ms={"critic": 200}, model_latency_scale={"fake-fast": 0.25})
+    for model, minimum in (("fake-model", 0.2), ("fake-fast", 0.05)):
+        start = time.perf_counter()
+        generate(request("critic"), model=model)
+        assert minimum <= time.perf_counter() - start < minimum + 0.1
+
+
+def test_calls_over_the_quota_fail_with_a_429(config):
+    config(quota_rpm=60, quota_burst=1)
+    generate(request("mckinsey"))
+    with pytest.raises(errors.ClientError) as error:
+        generate(request("mckinsey"))
+    assert error.value.code == 429
+    assert fake_llm.FAKE_LLM_REJECTED[-1][0] == "mckinsey"
+
+
+def test_unknown_cached_content_is_rejected(config):
+    with pytest.raises(errors.ClientError) as error:
+        generate(request("mckinsey", cached_content="cachedContents/missing"))
+    assert error.value.code == 404
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from typing import AsyncGenerator
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from think_tank.workflows import AdaptiveParallelAgent, _merge_agent_runs
+
+
+class SlowPersona(BaseAgent):
+    """Delivers its output after delay seconds and notes whether it was cancelled."""
+
+    delay: float
+    output_key: str
+    cancelled: bool = False
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            actions=EventActions(state_delta={self.output_key: f"{self.name} answer"}),
+        )
+
+
+class FixedPanel(AdaptiveParallelAgent):
+    """Selects every sub-agent, so the tests don't depend on the persona library."""
+
+    def select(self, ctx: InvocationContext) -> dict:
+        return {"classification": {}, "personas": [agent.name for agent in self.sub_agents], "rationale": []}
+
+
+def persona(name: str, delay: float) -> SlowPersona:
+    return SlowPersona(name=name, delay=delay, output_key=f"{name}_output")
+
+
+def run_panel(panel: FixedPanel) -> dict:
+    runner = InMemoryRunner(panel, app_name="tt")
+    session = runner.session_service.create_session(app_name="tt", user_id="u")
+
+    async def run():
+        message = types.Content(role="user", parts=[types.Part(text="Plan the rollout")])
+        async for _ in runner.run_async(user_id="u", session_id=session.id, new_message=message):
+            pass
+
+    asyncio.run(run())
+    return runner.session_service.get_session(app_name="tt", user_id="u", session_id=session.id).state
+
+
+def test_per_persona_deadlines_override_the_default_within_the_budget():
+    panel = FixedPanel(name="panel", persona_deadline=20, persona_deadlines={"quick": 2, "patient": 60}, fanout_budget=25)
+    assert panel.deadline_for("quick", 100) == 102
+    assert panel.deadline_for("patient", 100) == 125
+    assert panel.deadline_for("mckinsey", 100) == 120
+    assert FixedPanel(name="open").deadline_for("mckinsey", 100) is None
+
+
+def test_overrunning_persona_is_cancelled_and_listed_as_missing():
+    fast, slow = persona("mckinsey", 0.01), persona("devils_advocate", 10)
+    panel = FixedPanel(name="panel", sub_agents=[fast, slow], persona_deadlines={"devils_advocate": 0.1}, fanout_budget=5)
+    start = time.perf_counter()
+    state = run_panel(panel)
+    assert time.perf_counter() - start < 2
+    assert slow.cancelled and not fast.cancelled
+    assert state["mckinsey_output"] == "mckinsey answer" and "devils_advocate_output" not in state
+    assert state["missing_personas"] == ["devils_advocate"]
+
+
+def test_fanout_budget_caps_every_persona():
+    personas = [persona("mckinsey", 10), persona("devils_advocate", 10)]
+    state = run_panel(FixedPanel(name="panel", sub_agents=personas, persona_deadline=20, fanout_budget=0.1))
+    assert all(agent.cancelled for agent in personas)
+    assert sorted(state["missing_personas"]) == ["devils_advocate", "mckinsey"]
+
+
+def test_merge_passes_events_on_as_they_arrive():
+    async def events(name, delays):
+        for delay in delays:
+            await asyncio.sleep(delay)
+            yield name
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        timed_out = []
+        runs = {"slow": events("slow", [0.05, 10]), "fast": events("fast", [0.01, 0.01])}
+        merged = [name async for name in _merge_agent_runs(runs, {"slow": loop.time() + 0.2}, timed_out)]
+        return merged, timed_out
+
+    assert asyncio.run(run()) == (["fast", "fast", "slow"], ["slow"])
@@ -0,0 +1,64 @@
+import asyncio
+import time
+from typing import AsyncGenerator
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import types
+
+from think_tank.hedging import HedgedLlm, HedgingPolicy, percentile
+
+
+class DelayedLlm(BaseLlm):
+    """Answers its nth call after delays[n] seconds, with the call's number as the text."""
+
+    delays: list
+    calls: int = 0
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        number = self.calls
+        self.calls += 1
+        await asyncio.sleep(self.delays[number])
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=str(number))]))
+
+
+def generate(llm: BaseLlm) -> str:
+    async def run():
+        return [response async for response in llm.generate_content_async(LlmRequest(model=llm.model))]
+
+    return asyncio.run(run())[-1].content.parts[0].text
+
+
+def warmed_policy(**kwargs) -> HedgingPolicy:
+    policy = HedgingPolicy(percentile=50, min_samples=2, **kwargs)
+    for _ in range(10):
+        policy.record("fake-model", 0.02, hedge_won=False)
+    return policy
+
+
+def test_percentile_interpolates():
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([5], 95) == 5
+
+
+def test_no_hedge_before_min_samples():
+    policy = HedgingPolicy(min_samples=3)
+    policy.record("fake-model", 0.1, hedge_won=False)
+    assert policy.hedge_delay("fake-model") is None
+
+
+def test_slow_call_is_won_by_its_hedge():
+    policy = warmed_policy(max_extra=0.5)
+    llm = DelayedLlm(model="fake-model", delays=[5.0, 0.01])
+    start = time.perf_counter()
+    assert generate(HedgedLlm(model="fake-model", inner=llm, policy=policy)) == "1"
+    assert time.perf_counter() - start < 1.0
+    stats = policy.stats()["fake-model"]
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+
+
+def test_hedges_are_capped_by_the_spend_limit():
+    policy = warmed_policy(max_extra=0.0)
+    llm = DelayedLlm(model="fake-model", delays=[0.2])
+    assert generate(HedgedLlm(model="fake-model", inner=llm, policy=policy)) == "0"
+    assert llm.calls == 1
+    assert policy.stats()["fake-model"]["denied"] == 1
@@ -0,0 +1,141 @@
+import asyncio
+from types import SimpleNamespace
+
+from google.adk.agents import LlmAgent
+from google.adk.events import Event, EventActions
+from google.adk.models import LlmRequest
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from think_tank.fake_llm import agent_name
+from think_tank.history import SUMMARY_STATE_KEY, HistoryWindow, TRUNCATION_MARK, is_user_turn, split_turns
+
+
+def _text(role: str, *texts: str) -> types.Content:
+    return types.Content(role=role, parts=[types.Part(text=text) for text in texts])
+
+
+def _tokens(llm_request: LlmRequest) -> int:
+    return sum((len(part.text) + 3) // 4 for content in llm_request.contents for part in content.parts if part.text)
+
+
+def test_split_turns_starts_a_turn_at_each_user_message():
+    contents = [
+        _text("user", "first"),
+        _text("model", "answer"),
+        _text("user", "For context:", "[mckinsey] said: ..."),
+        _text("user", "second"),
+    ]
+    assert not is_user_turn(contents[2])
+    assert [len(turn) for turn in split_turns(contents)] == [3, 1]
+
+
+def test_ceiling_cuts_long_texts_and_accounts_for_the_mark():
+    window = HistoryWindow(max_tokens=1000)
+    llm_request = LlmRequest(contents=[_text("user", "latest"), _text("user", "For context:", "x" * 8000)])
+    window.enforce_ceiling(None, llm_request)
+    assert _tokens(llm_request) <= 1000
+    assert len(llm_request.contents) == 2
+    assert llm_request.contents[1].parts[1].text.endswith(TRUNCATION_MARK)
+    assert llm_request.contents[0].parts[0].text == "latest"
+
+
+def test_ceiling_holds_with_many_short_messages():
+    window = HistoryWindow(max_tokens=500)
+    notes = [_text("user", "For context:", "n" * 300) for _ in range(40)]
+    llm_request = LlmRequest(contents=[_text("user", "latest")] + notes)
+    window.enforce_ceiling(None, llm_request)
+    assert _tokens(llm_request) <= 500
+    assert llm_request.contents[0].parts[0].text == "latest"
+
+
+def test_ceiling_cuts_the_latest_message_last():
+    window = HistoryWindow(max_tokens=200)
+    llm_request = LlmRequest(contents=[_text("user", "older"), _text("model", "reply"), _text("user", "y" * 4000)])
+    window.enforce_ceiling(None, llm_request)
+    assert _tokens(llm_request) <= 200
+    assert len(llm_request.contents) == 1
+    assert llm_request.contents[0].parts[0].text.startswith("yyy")
+
+
+def test_summary_without_a_model_keeps_excerpts():
+    window = HistoryWindow(summary_model=None)
+    turns = [[_text("user", "a" * 1000), _text("model", "the answer")]]
+    text = asyncio.run(window._summarize(None, "earlier", turns))
+    assert text.splitlines() == ["earlier", "- " + "a" * 400, "- the answer"]
+
+
+def test_turns_leaving_the_window_are_folded_into_a_rolling_summary(fast_model):
+    window = HistoryWindow(keep_turns=1, summary_model="fake-model")
+    assistant = LlmAgent(name="assistant", model="fake-model")
+    window.instrument(assistant)
+    runner = InMemoryRunner(assistant, app_name="tt")
+    session = runner.session_service.create_session(app_name="tt", user_id="u")
+    summaries = []
+
+    async def turn(text):
+        async for _ in runner.run_async(user_id="u", session_id=session.id, new_message=_text("user", text)):
+            pass
+        summaries.append(runner.session_service.get_session(app_name="tt", user_id="u", session_id=session.id).state.get(SUMMARY_STATE_KEY))
+
+    async def run():
+        for text in ("first question", "second question", "third question"):
+            await turn(text)
+
+    asyncio.run(run())
+    assert summaries[0] is None
+    assert summaries[1]["turns"] == 1 and summaries[2]["turns"] == 2
+    assert summaries[1]["text"].startswith("- [history_summarizer]")
+
+    summarizer_requests = [request.contents[-1].parts[0].text for request in fast_model if agent_name(request) == "history_summarizer"]
+    assert len(summarizer_requests) == 2
+    assert "first question" in summarizer_requests[0]
+    # The next eviction extends the stored summary with only the turn that just left the window.
+    assert summaries[1]["text"] in summarizer_requests[1]
+    assert "second question" in summarizer_requests[1] and "first question" not in summarizer_requests[1]
+
+    last = [request for request in fast_model if agent_name(request) == "assistant"][-1]
+    texts = [part.text for content in last.contents for part in content.parts if part.text]
+    assert f"[conversation summary] Earlier in this conversation:\n{summaries[2]['text']}" in texts
+    assert "third question" in texts and not any("first question" in text for text in texts)
+
+
+def test_concurrent_callers_share_one_summary_call():
+    window = HistoryWindow(summary_model=None)
+    calls = []
+
+    async def summarize(ctx, summary, turns):
+        calls.append(turns)
+        await asyncio.sleep(0.01)
+        return "folded"
+
+    window._summarize = summarize
+    context = SimpleNamespace(state={}, _invocation_context=SimpleNamespace(session=SimpleNamespace(id="s")))
+    turns = [[_text("user", "first")], [_text("user", "second")]]
+
+    async def run():
+        return await asyncio.gather(*(window.summary(context, turns, 1) for _ in range(3)))
+
+    assert asyncio.run(run()) == ["folded"] * 3
+    assert len(calls) == 1 and window._folding == {}
+    assert context.state[SUMMARY_STATE_KEY] == {"turns": 1, "text": "folded"}
+
+
+def _run_context(invocation_id: str, state: dict, written: dict) -> SimpleNamespace:
+    events = [
+        Event(invocation_id="run-1", author="mckinsey", actions=EventActions(state_delta={"mckinsey_output": "old"})),
+        Event(invocation_id=invocation_id, author="aiml_lead", actions=EventActions(state_delta=written)),
+    ]
+    return SimpleNamespace(state=state, _invocation_context=SimpleNamespace(invocation_id=invocation_id, session=SimpleNamespace(events=events)))
+
+
+def test_outputs_of_earlier_runs_are_cleared_once_per_run():
+    window = HistoryWindow(stale_keys=lambda: ["mckinsey_output", "aiml_lead_output"])
+    state = {"mckinsey_output": "old", "aiml_lead_output": "new"}
+    window._clear_stale(_run_context("run-2", state, {"aiml_lead_output": "new"}))
+    assert state["mckinsey_output"] == "" and state["aiml_lead_output"] == "new"
+
+    # Outputs written later in the same run are left alone.
+    state["mckinsey_output"] = "rerun"
+    window._clear_stale(_run_context("run-2", state, {"aiml_lead_output": "new"}))
+    assert state["mckinsey_output"] == "rerun"
@@ -0,0 +1,37 @@
+from email_writer.merge import build_message, completed_ids, read_recipients
+
+
+def test_recipients_default_to_their_row_number(tmp_path):
+    path = tmp_path / "recipients.csv"
+    path.write_text("id,name,email\nr-1,Ada,ada@example.com\n,,\n,Grace,grace@example.com\n", encoding="utf-8")
+    assert read_recipients(str(path)) == [
+        {"id": "r-1", "fields": {"name": "Ada", "email": "ada@example.com"}},
+        {"id": "3", "fields": {"name": "Grace", "email": "grace@example.com"}},
+    ]
+
+
+def test_message_starts_with_the_shared_brief():
+    message = build_message("  Invite them to the launch.\n", {"name": "Ada", "company": ""})
+    assert message == "Invite them to the launch.\n\n**Recipient:**\n- name: Ada"
+
+
+def test_torn_final_line_is_cut_off(tmp_path):
+    path = tmp_path / "emails.jsonl"
+    path.write_bytes(b'{"id": "1", "email": {}}\n{"id": "2", "email": {}}\n{"id": "3", "em')
+    assert completed_ids(str(path)) == {"1", "2"}
+    assert path.read_bytes() == b'{"id": "1", "email": {}}\n{"id": "2", "email": {}}\n'
+
+
+def test_corrupt_middle_line_is_skipped_and_reported(tmp_path):
+    path = tmp_path / "emails.jsonl"
+    content = b'{"id": "1", "email": {}}\nnot json\n["no id"]\n{"id": "4", "email": {}}\n'
+    path.write_bytes(content)
+    corrupt = []
+    assert completed_ids(str(path), corrupt) == {"1", "4"}
+    assert corrupt == [2, 3]
+    # Nothing after the bad lines is lost.
+    assert path.read_bytes() == content
+
+
+def test_missing_output_has_nothing_done(tmp_path):
+    assert completed_ids(str(tmp_path / "emails.jsonl")) == set()
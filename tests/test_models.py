@@ -0,0 +1,41 @@
+import pytest
+
+from think_tank.models import MODEL_CONFIG, ModelPolicy
+
+
+def policy() -> ModelPolicy:
+    return ModelPolicy(
+        tiers={"fast": "fake-fast", "standard": None, "strong": "fake-strong"},
+        agents={"draft_synthesizer": "fast", "*_synthesizer": "standard", "critic": "fake-pinned"},
+        default_model="fake-model",
+    )
+
+
+def test_exact_names_win_over_patterns():
+    assert policy().model("draft_synthesizer") == "fake-fast"
+    assert policy().model("fold_synthesizer") == "fake-model"  # standard has no model of its own
+
+
+def test_agents_can_be_pinned_to_a_model():
+    assert policy().model("critic") == "fake-pinned"
+    assert policy().tier("critic") is None
+
+
+def test_unmapped_agents_use_their_own_tier_or_the_default():
+    assert policy().model("mckinsey", tier="strong") == "fake-strong"
+    assert policy().model("mckinsey", tier="unknown") == "fake-model"
+    assert policy().tier("mckinsey") == "standard"
+
+
+def test_tier_models_can_be_set_from_the_environment(monkeypatch):
+    monkeypatch.setenv("THINK_TANK_MODEL_STRONG", "fake-pro")
+    bundled = ModelPolicy.from_file(MODEL_CONFIG)
+    assert bundled.model("problem_solver") == "fake-pro"
+    assert bundled.model("clarification") == bundled.default_model
+
+
+def test_default_tier_must_exist(tmp_path):
+    path = tmp_path / "models.yaml"
+    path.write_text("tiers:\n  fast: null\ndefault_tier: standard\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        ModelPolicy.from_file(str(path))
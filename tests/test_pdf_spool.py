@@ -0,0 +1,156 @@
+import asyncio
+import os
+
+import pytest
+
+from content_publisher import tools
+
+
+class FakeToolContext:
+    """Keeps state and every saved artifact version in memory, like the in-memory artifact service."""
+
+    def __init__(self, fail_saves: bool = False):
+        self.state = {}
+        self.artifacts = {}
+        self.fail_saves = fail_saves
+
+    async def save_artifact(self, filename, artifact):
+        if self.fail_saves:
+            raise RuntimeError("artifact store unavailable")
+        self.artifacts.setdefault(filename, []).append(artifact)
+        return len(self.artifacts[filename]) - 1
+
+    async def load_artifact(self, filename, version=None):
+        versions = self.artifacts.get(filename)
+        return versions[-1 if version is None else version] if versions else None
+
+
+def _render_to_file(markdown_text, title_text, path):
+    with open(path, "wb") as f:
+        f.write(f"%PDF {title_text}: {markdown_text}".encode("utf-8"))
+    return {"size": os.path.getsize(path), "sha256": tools._file_sha256(path)}
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    async def run_in_render_pool(fn, *args):
+        return _render_to_file(*args)
+
+    monkeypatch.setattr(tools, "PDF_SPOOL_DIR", str(tmp_path))
+    monkeypatch.setattr(tools, "_run_in_render_pool", run_in_render_pool)
+    return tmp_path
+
+
+def _fill(spool, monkeypatch, max_bytes):
+    monkeypatch.setattr(tools, "PDF_SPOOL_MAX_BYTES", max_bytes)
+    paths = []
+    for i in range(4):
+        path = spool / f"{i}.pdf"
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (1000 + i, 1000 + i))
+        paths.append(str(path))
+    return paths
+
+
+def test_prune_deletes_the_oldest_pdfs_until_the_spool_fits(spool, monkeypatch):
+    paths = _fill(spool, monkeypatch, max_bytes=250)
+    tools._prune_spool()
+    assert [os.path.exists(path) for path in paths] == [False, False, True, True]
+
+
+def test_prune_never_deletes_a_pdf_an_artifact_references(spool, monkeypatch, caplog):
+    paths = _fill(spool, monkeypatch, max_bytes=150)
+    tools._set_reference(tools._add_reference(paths[0], "user:old.pdf"), 0)
+    tools._set_reference(tools._add_reference(paths[3], "user:new.pdf"), 0)
+    tools._prune_spool()
+    assert [os.path.exists(path) for path in paths] == [True, False, False, True]
+    assert "more than PDF_SPOOL_MAX_BYTES" in caplog.text
+
+
+def test_artifacts_reference_the_spooled_file_by_default(spool, monkeypatch):
+    monkeypatch.setattr(tools, "PDF_SPOOL_MAX_BYTES", 0)
+    context = FakeToolContext()
+    first = asyncio.run(tools.markdown_to_pdf(context, "# First", filename="a.pdf"))
+    second = asyncio.run(tools.markdown_to_pdf(context, "# Second", filename="a.pdf"))
+    assert first["status"] == second["status"] == "success"
+    # Both versions still point at a file, though the spool is over its limit.
+    for part in context.artifacts["user:a.pdf"]:
+        assert part.inline_data is None
+        assert os.path.exists(tools._local_path(part.file_data.file_uri))
+
+
+def test_failed_save_drops_the_reference(spool, monkeypatch):
+    monkeypatch.setattr(tools, "PDF_SPOOL_MAX_BYTES", 0)
+    result = asyncio.run(tools.markdown_to_pdf(FakeToolContext(fail_saves=True), "# Report", filename="a.pdf"))
+    assert result["status"] == "error"
+    tools._prune_spool()
+    assert not list(spool.glob("*.pdf"))
+
+
+def test_artifacts_carry_the_bytes_when_file_references_are_off(spool, monkeypatch):
+    monkeypatch.setattr(tools, "PDF_FILE_REFERENCES", False)
+    context = FakeToolContext()
+    asyncio.run(tools.markdown_to_pdf(context, "# Report", filename="a.pdf"))
+    part = context.artifacts["user:a.pdf"][-1]
+    assert part.file_data is None and part.inline_data.data.startswith(b"%PDF")
+    assert not list(spool.glob("*.pdf")) and not list(spool.glob("*.render"))
+
+
+@pytest.fixture
+def renders(spool, monkeypatch):
+    """Records the title of every render the pool is asked for."""
+    rendered = []
+
+    async def run_in_render_pool(fn, *args):
+        rendered.append(args[1])
+        return _render_to_file(*args)
+
+    monkeypatch.setattr(tools, "_run_in_render_pool", run_in_render_pool)
+    return rendered
+
+
+def test_render_digest_covers_the_markdown_and_the_title():
+    assert tools.render_digest("# Report", "a") == tools.render_digest("# Report", "a")
+    assert tools.render_digest("# Report", "a") != tools.render_digest("# Report!", "a")
+    assert tools.render_digest("# Report", "a") != tools.render_digest("# Report", "b")
+
+
+@pytest.mark.parametrize("file_references", [True, False])
+def test_unchanged_report_is_not_rendered_again(renders, monkeypatch, file_references):
+    monkeypatch.setattr(tools, "PDF_FILE_REFERENCES", file_references)
+    context = FakeToolContext()
+    first = asyncio.run(tools.markdown_to_pdf(context, "# Report", filename="a.pdf"))
+    again = asyncio.run(tools.markdown_to_pdf(context, "# Report", filename="a.pdf"))
+    assert not first["reused"] and again["reused"] and again["content_hash"] == first["content_hash"]
+    assert renders == ["a"] and len(context.artifacts["user:a.pdf"]) == 1
+
+    edited = asyncio.run(tools.markdown_to_pdf(context, "# Report, edited", filename="a.pdf"))
+    assert not edited["reused"] and renders == ["a", "a"]
+
+
+def test_report_is_rendered_again_when_its_spooled_file_changed(renders):
+    context = FakeToolContext()
+    asyncio.run(tools.markdown_to_pdf(context, "# Report", filename="a.pdf"))
+    path = tools._local_path(context.artifacts["user:a.pdf"][-1].file_data.file_uri)
+    with open(path, "ab") as f:
+        f.write(b"tampered")
+    assert not asyncio.run(tools.markdown_to_pdf(context, "# Report", filename="a.pdf"))["reused"]
+    assert len(renders) == 2
+
+
+@pytest.mark.parametrize("file_references", [True, False])
+def test_publish_skips_an_unchanged_pdf(renders, tmp_path, monkeypatch, file_references):
+    monkeypatch.setattr(tools, "PDF_FILE_REFERENCES", file_references)
+    monkeypatch.setattr(tools, "ARTIFACTS_DIR", str(tmp_path / "published"))
+    context = FakeToolContext()
+    asyncio.run(tools.markdown_to_pdf(context, "# Report", filename="a.pdf"))
+    first = asyncio.run(tools.publish_pdf(context, "user:a.pdf", filename="a.pdf"))
+    again = asyncio.run(tools.publish_pdf(context, "user:a.pdf", filename="a.pdf"))
+    assert first["status"] == again["status"] == "success"
+    assert not first["unchanged"] and again["unchanged"]
+
+    asyncio.run(tools.markdown_to_pdf(context, "# Report, edited", filename="a.pdf"))
+    edited = asyncio.run(tools.publish_pdf(context, "user:a.pdf", filename="a.pdf"))
+    assert not edited["unchanged"]
+    with open(edited["file_path"], "rb") as f:
+        assert f.read() == b"%PDF a: # Report, edited"
@@ -0,0 +1,133 @@
+import asyncio
+import importlib.util
+import os
+import shutil
+from typing import AsyncGenerator
+
+import pytest
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from think_tank.persona_library import PERSONA_DIR, PersonaLibrary
+from think_tank.registry import AgentRegistry
+from think_tank.workflows import AdaptiveParallelAgent
+
+BASELINE_PROMPTS = os.path.join(os.path.dirname(__file__), "data", "baseline_persona_prompts.py")
+
+
+class Persona(BaseAgent):
+    """Answers at once with its name."""
+
+    @property
+    def output_key(self) -> str:
+        return f"{self.name}_output"
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            actions=EventActions(state_delta={self.output_key: f"{self.name} answer"}),
+        )
+
+
+@pytest.fixture
+def library(tmp_path):
+    return PersonaLibrary(index_path=str(tmp_path / "index.pickle"), reload_interval=-1)
+
+
+def test_rendered_instructions_match_the_original_prompts(library):
+    spec = importlib.util.spec_from_file_location("baseline_persona_prompts", BASELINE_PROMPTS)
+    prompts = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(prompts)
+    for name in library.names():
+        assert library.instruction(name) == getattr(prompts, f"{name.upper()}_PROMPT"), name
+
+
+def test_index_is_cached_outside_the_persona_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr("think_tank.persona_library.INDEX_DIR", str(tmp_path / "cache"))
+    library = PersonaLibrary(reload_interval=-1)
+    assert os.path.exists(library.index_path)
+    assert not library.index_path.startswith(PERSONA_DIR)
+    # A second load is served from the index.
+    assert PersonaLibrary(reload_interval=-1).names() == library.names()
+
+
+@pytest.fixture
+def persona_dir(tmp_path):
+    directory = tmp_path / "personas"
+    directory.mkdir()
+    for name in ("mckinsey", "devils_advocate"):
+        shutil.copy(os.path.join(PERSONA_DIR, f"{name}.yaml"), directory / f"{name}.yaml")
+    return directory
+
+
+def reloading_library(tmp_path, persona_dir) -> PersonaLibrary:
+    return PersonaLibrary(directory=str(persona_dir), index_path=str(tmp_path / "index.pickle"), reload_interval=0)
+
+
+def test_refresh_picks_up_edited_and_removed_personas(tmp_path, persona_dir):
+    library = reloading_library(tmp_path, persona_dir)
+    reloads = []
+    library.on_reload(lambda library: reloads.append(library.names()))
+    assert not library.refresh()
+
+    path = persona_dir / "mckinsey.yaml"
+    path.write_text(path.read_text(encoding="utf-8").replace("Strategy consultant", "Edited consultant"), encoding="utf-8")
+    assert library.refresh()
+    assert library.get("mckinsey")["description"].startswith("Edited consultant")
+
+    (persona_dir / "devils_advocate.yaml").unlink()
+    assert library.refresh()
+    assert "devils_advocate" not in library and "mckinsey" in library
+    assert reloads == [["mckinsey", "devils_advocate"], ["mckinsey"]]
+
+
+def test_invalid_edit_keeps_the_previous_personas(tmp_path, persona_dir):
+    library = reloading_library(tmp_path, persona_dir)
+    (persona_dir / "mckinsey.yaml").write_text("name: mckinsey\n", encoding="utf-8")
+    assert not library.refresh()
+    assert "mckinsey" in library and "invalid persona definition" in library.last_error
+
+
+def test_removed_persona_keeps_the_instruction_it_was_built_with(tmp_path, persona_dir, monkeypatch):
+    from think_tank.sub_agents.think_tank import agent as think_tank_agent
+
+    library = reloading_library(tmp_path, persona_dir)
+    monkeypatch.setattr(think_tank_agent, "persona_library", library)
+    persona = think_tank_agent.build_persona("devils_advocate")
+    instruction = library.instruction("devils_advocate")
+    (persona_dir / "devils_advocate.yaml").unlink()
+    library.refresh()
+    assert persona.instruction(None) == instruction
+
+
+def test_revision_round_skips_personas_removed_from_the_library(tmp_path, persona_dir, caplog):
+    library = reloading_library(tmp_path, persona_dir)
+    registry = AgentRegistry()
+    for name in library.names():
+        # Like build_persona, the factory needs the persona in the library.
+        registry.register(name, lambda name=name: Persona(name=name, description=library.get(name)["description"]))
+    panel = AdaptiveParallelAgent(name="panel", persona_library=library, persona_registry=registry)
+    runner = InMemoryRunner(panel, app_name="tt")
+    personas = ["mckinsey", "devils_advocate"]
+    session = runner.session_service.create_session(
+        app_name="tt", user_id="u",
+        state={"persona_selection": {"personas": personas}, "persona_revision": {"personas": personas}},
+    )
+    (persona_dir / "devils_advocate.yaml").unlink()
+    library.refresh()
+
+    async def run():
+        message = types.Content(role="user", parts=[types.Part(text="Plan the rollout")])
+        async for _ in runner.run_async(user_id="u", session_id=session.id, new_message=message):
+            pass
+
+    asyncio.run(run())
+    state = runner.session_service.get_session(app_name="tt", user_id="u", session_id=session.id).state
+    assert state["persona_selection"]["personas"] == ["mckinsey"]
+    assert state["mckinsey_output"] == "mckinsey answer" and "devils_advocate_output" not in state
+    assert "Skipping personas removed from the library: devils_advocate" in caplog.text
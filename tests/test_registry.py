@@ -0,0 +1,29 @@
+import pytest
+from google.adk.agents import LlmAgent
+
+from think_tank.registry import AgentRegistry
+
+
+def test_agents_are_built_once_on_first_use():
+    registry = AgentRegistry()
+    builds = []
+    registry.register("mckinsey", lambda: builds.append("mckinsey") or LlmAgent(name="mckinsey", model="fake-model"))
+    assert registry.names() == ["mckinsey"] and registry.built() == []
+    agent = registry.get("mckinsey")
+    assert registry.get("mckinsey") is agent
+    assert builds == ["mckinsey"] and registry.built() == [agent]
+
+
+def test_build_hooks_see_agents_built_after_them():
+    registry = AgentRegistry()
+    registry.register("mckinsey", lambda: LlmAgent(name="mckinsey", model="fake-model"))
+    seen = []
+    registry.on_build(lambda agent: seen.append(agent.name))
+    registry.get("mckinsey")
+    registry.get("mckinsey")
+    assert seen == ["mckinsey"]
+
+
+def test_unknown_agent_raises():
+    with pytest.raises(KeyError):
+        AgentRegistry().get("nobody")
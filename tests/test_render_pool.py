@@ -0,0 +1,28 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from content_publisher import tools
+
+
+def _crash():
+    os._exit(1)
+
+
+def _pid():
+    return os.getpid()
+
+
+def test_broken_pool_is_replaced_and_the_call_retried(monkeypatch):
+    broken = ProcessPoolExecutor(max_workers=1)
+    try:
+        broken.submit(_crash).exception()
+    except Exception:
+        pass
+    replacement = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(tools, "_render_pool", broken)
+    monkeypatch.setattr(tools, "get_render_pool", lambda: tools._render_pool or replacement)
+
+    assert asyncio.run(tools._run_in_render_pool(_pid)) == os.getpid()
+    assert tools._render_pool is None
+    replacement.shutdown()
@@ -0,0 +1,95 @@
+import asyncio
+from types import SimpleNamespace
+from typing import AsyncGenerator
+
+import pytest
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import errors, types
+
+from think_tank.scheduler import QuotaScheduler, ScheduledLlm, is_quota_error
+
+
+def quota_error() -> errors.ClientError:
+    return errors.ClientError(429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Quota exceeded."}})
+
+
+class ScriptedLlm(BaseLlm):
+    """Answers each call with the next item of script: an exception to raise or a text to return."""
+
+    script: list
+    calls: int = 0
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        item = self.script.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=item)]))
+
+
+def generate(llm: BaseLlm) -> list:
+    async def run():
+        return [response async for response in llm.generate_content_async(LlmRequest(model=llm.model))]
+
+    return asyncio.run(run())
+
+
+def test_quota_errors_are_recognised_as_exceptions_and_responses():
+    assert is_quota_error(quota_error())
+    assert is_quota_error(LlmResponse(error_code="RESOURCE_EXHAUSTED"))
+    assert not is_quota_error(RuntimeError("boom"))
+
+
+def test_interactive_calls_overtake_queued_batch_calls():
+    scheduler = QuotaScheduler(rpm={"fake-model": 600}, burst=1)
+    order = []
+
+    async def call(name, priority):
+        await scheduler.acquire("fake-model", priority)
+        order.append(name)
+
+    async def run():
+        await scheduler.acquire("fake-model")  # takes the only token
+        batch = asyncio.ensure_future(call("batch", "batch"))
+        await asyncio.sleep(0)
+        await asyncio.gather(batch, call("interactive", "interactive"))
+
+    asyncio.run(run())
+    assert order == ["interactive", "batch"]
+    assert scheduler.stats["batch_calls"] == 1 and scheduler.stats["interactive_calls"] == 2
+
+
+def test_quota_error_is_retried_after_a_backoff():
+    scheduler = QuotaScheduler(base_delay=0.01)
+    inner = ScriptedLlm(model="fake-model", script=[quota_error(), "answer"])
+    responses = generate(ScheduledLlm(model="fake-model", inner=inner, scheduler=scheduler))
+    assert responses[-1].content.parts[0].text == "answer"
+    assert inner.calls == 2 and scheduler.stats["quota_errors"] == 1
+
+
+def test_other_errors_and_exhausted_retries_are_raised():
+    scheduler = QuotaScheduler(base_delay=0.01, max_retries=1)
+    with pytest.raises(RuntimeError):
+        generate(ScheduledLlm(model="fake-model", inner=ScriptedLlm(model="fake-model", script=[RuntimeError("boom")]), scheduler=scheduler))
+    inner = ScriptedLlm(model="fake-model", script=[quota_error(), quota_error()])
+    with pytest.raises(errors.ClientError):
+        generate(ScheduledLlm(model="fake-model", inner=inner, scheduler=scheduler))
+    assert inner.calls == 2
+
+
+def test_session_priority_applies_to_its_own_call_only():
+    scheduler = QuotaScheduler()
+    llm = ScheduledLlm(model="fake-model", inner=ScriptedLlm(model="fake-model", script=["a", "b", "c"]), scheduler=scheduler)
+
+    async def call(state):
+        scheduler.before_model_callback(SimpleNamespace(state=state), LlmRequest())
+        return [response async for response in llm.generate_content_async(LlmRequest(model="fake-model"))]
+
+    async def run():
+        await call({"priority": "batch"})
+        await call({})
+        with QuotaScheduler.priority("batch"):
+            await call({})
+
+    asyncio.run(run())
+    assert scheduler.stats["batch_calls"] == 2 and scheduler.stats["interactive_calls"] == 1
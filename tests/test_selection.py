@@ -0,0 +1,34 @@
+from think_tank.persona_library import PersonaLibrary
+from think_tank.selection import classify_problem, cluster_personas, select_personas
+
+
+def library(tmp_path) -> PersonaLibrary:
+    return PersonaLibrary(index_path=str(tmp_path / "index.pickle"))
+
+
+def test_classification_reads_scope_horizon_and_regulation():
+    classification = classify_problem("A 10-year AI platform strategy for the company under GDPR and the AI Act")
+    assert classification["time_horizon"] == 10
+    assert classification["regulatory_complexity"] == "high"
+    assert classification["technical"]
+    assert classify_problem("Fix the onboarding flow")["scope"] == "focused"
+
+
+def test_narrow_problem_gets_a_small_panel(tmp_path):
+    personas, rationale = select_personas(classify_problem("Plan a team workshop"), max_personas=6, library=library(tmp_path))
+    assert 1 < len(personas) < 6
+    assert rationale
+
+
+def test_panel_is_capped_in_priority_order(tmp_path):
+    problem = "Long-term AI platform strategy for the enterprise: GDPR compliance, customer experience and employee change"
+    personas, rationale = select_personas(classify_problem(problem), max_personas=3, library=library(tmp_path))
+    assert len(personas) == 3
+    assert rationale[-1].startswith("dropped to stay within 3 personas")
+
+
+def test_unknown_personas_fall_into_the_default_cluster():
+    assert cluster_personas(["mckinsey", "newcomer", "ai_ethics"]) == {
+        "strategy": ["mckinsey", "newcomer"],
+        "risk_futures": ["ai_ethics"],
+    }
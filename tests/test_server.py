@@ -0,0 +1,138 @@
+import asyncio
+import time
+from typing import AsyncGenerator
+
+import httpx
+import pytest
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from think_tank.server import AgentRun, AgentService, format_sse
+
+
+class EchoAgent(BaseAgent):
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        text = "".join(part.text for part in ctx.user_content.parts)
+        yield Event(invocation_id=ctx.invocation_id, author=self.name, content=types.Content(role="model", parts=[types.Part(text=f"echo: {text}")]))
+
+
+def _events(body: str) -> list:
+    return [line[len("event: "):] for line in body.splitlines() if line.startswith("event: ")]
+
+
+def test_run_is_replayed_after_last_event_id_and_bad_ids_are_rejected():
+    service = AgentService(EchoAgent(name="echo"), InMemorySessionService())
+
+    async def main():
+        transport = httpx.ASGITransport(app=service.app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            session_id = (await client.post("/sessions", json={})).json()["session_id"]
+            response = await client.post(f"/sessions/{session_id}/messages", json={"text": "hi"})
+            assert _events(response.text) == ["run", "message", "done"]
+            await asyncio.sleep(0)
+            run_id = next(iter(service.runs))
+            # The finished run no longer blocks the session.
+            assert service._active == {}
+
+            replay = await client.get(f"/runs/{run_id}/events", headers={"Last-Event-ID": "1"})
+            assert _events(replay.text) == ["message", "done"]
+            bad = await client.get(f"/runs/{run_id}/events", headers={"Last-Event-ID": "abc"})
+            assert bad.status_code == 400
+
+    asyncio.run(main())
+
+
+def test_format_sse_carries_the_message_id():
+    assert format_sse({"id": 3, "type": "done", "text": ""}).startswith("id: 3\nevent: done\n")
+
+
+def delta(author: str, text: str) -> dict:
+    return {"type": "delta", "author": author, "text": text}
+
+
+def drain(client) -> list:
+    async def run():
+        messages = []
+        while True:
+            try:
+                message = await client.get(timeout=0)
+            except EOFError:
+                return messages
+            if message is None:
+                return messages
+            messages.append(message)
+
+    return asyncio.run(run())
+
+
+def test_full_buffer_merges_and_drops_deltas_but_keeps_messages():
+    run = AgentRun("s", "u")
+    client = run.subscribe(maxsize=3)
+    for message in (delta("mckinsey", "He"), delta("mckinsey", "llo"), delta("critic", "x")):
+        run.publish(message)
+    run.publish({"type": "message", "author": "mckinsey", "text": "Hello", "final": False})
+    # Full: the critic's next deltas are dropped, its complete message still arrives once there is room.
+    run.publish(delta("critic", "y"))
+    run.publish(delta("critic", "z"))
+    assert client.dropped == 2
+    received = drain(client)
+    assert [(m["type"], m.get("text"), m["id"]) for m in received] == [
+        ("delta", "Hello", 2), ("delta", "x", 3), ("message", "Hello", 4),
+    ]
+    run.publish({"type": "message", "author": "critic", "text": "xyz", "final": True})
+    assert drain(client)[-1]["text"] == "xyz" and not client.closed
+
+
+def test_client_falling_behind_on_messages_is_cut_off_and_can_replay():
+    run = AgentRun("s", "u")
+    slow = run.subscribe(maxsize=2)
+    fast = run.subscribe(maxsize=100)
+    run.publish({"type": "selection", "personas": ["mckinsey"]})
+    assert drain(slow)[0]["id"] == 1
+    for persona in ("mckinsey", "critic", "synthesizer"):
+        run.publish({"type": "persona_done", "persona": persona})
+    assert slow.closed and slow not in run._clients
+    assert drain(slow) == [{"id": 1, "type": "overflow", "dropped": 0}]
+    with pytest.raises(EOFError):
+        asyncio.run(slow.get(timeout=0))
+    # The run carried on for everyone else, and the cut-off client can catch up from the id it got.
+    assert [m["id"] for m in drain(fast)] == [1, 2, 3, 4]
+    assert [m["id"] for m in drain(run.subscribe(last_event_id=1))] == [2, 3, 4]
+
+
+def test_slow_reader_never_stalls_the_run():
+    run = AgentRun("s", "u")
+    client = run.subscribe(maxsize=4)
+    received = []
+
+    async def read_slowly():
+        while True:
+            try:
+                message = await client.get(timeout=1)
+            except EOFError:
+                return
+            received.append(message)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        reader = asyncio.ensure_future(read_slowly())
+        started = time.perf_counter()
+        for i in range(200):
+            run.publish(delta(("mckinsey", "critic")[i % 2], str(i % 10)))
+            await asyncio.sleep(0)
+        published = time.perf_counter() - started
+        # Once the reader has caught up, the complete message gets through.
+        await asyncio.sleep(0.2)
+        run.publish({"type": "message", "author": "mckinsey", "text": "done", "final": True})
+        client.close()
+        await reader
+        return published
+
+    assert asyncio.run(main()) < 0.5
+    assert client.dropped > 0
+    assert client.dropped + sum(len(m["text"]) for m in received if m["type"] == "delta") == 200
+    assert received[-1]["text"] == "done" and received[-1]["type"] == "message"
+    assert [m["id"] for m in received] == sorted(m["id"] for m in received)
@@ -0,0 +1,74 @@
+import time
+
+import pytest
+from google.adk.events import Event
+from google.genai import types
+from sqlalchemy.exc import OperationalError
+
+from think_tank.sessions import SqliteSessionService
+
+
+def _event(invocation_id: str, text: str) -> Event:
+    return Event(invocation_id=invocation_id, author="agent", content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+
+def _stored(service: SqliteSessionService, session) -> int:
+    # A second service reads the file directly, without flushing the first one's buffer.
+    reader = SqliteSessionService(service.db_engine.url.render_as_string(), flush_interval=0)
+    return len(super(SqliteSessionService, reader).get_session(
+        app_name=session.app_name, user_id=session.user_id, session_id=session.id
+    ).events)
+
+
+def test_final_responses_are_batched_until_the_next_invocation(tmp_path):
+    service = SqliteSessionService(f"sqlite:///{tmp_path}/sessions.db", flush_interval=0)
+    session = service.create_session(app_name="app", user_id="u", session_id="s")
+    for i in range(3):
+        service.append_event(session, _event("run-1", f"final answer {i}"))
+    assert _stored(service, session) == 0
+    service.append_event(session, _event("run-2", "next"))
+    assert _stored(service, session) == 3
+    assert len(service.get_session(app_name="app", user_id="u", session_id="s").events) == 4
+
+
+def test_buffered_events_are_flushed_after_the_interval(tmp_path):
+    service = SqliteSessionService(f"sqlite:///{tmp_path}/sessions.db", flush_interval=0.05)
+    session = service.create_session(app_name="app", user_id="u", session_id="s")
+    service.append_event(session, _event("run-1", "answer"))
+    deadline = time.monotonic() + 2
+    while _stored(service, session) == 0 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert _stored(service, session) == 1
+    service.close()
+
+
+def test_max_batch_forces_a_flush(tmp_path):
+    service = SqliteSessionService(f"sqlite:///{tmp_path}/sessions.db", max_batch=2, flush_interval=0)
+    session = service.create_session(app_name="app", user_id="u", session_id="s")
+    service.append_event(session, _event("run-1", "a"))
+    service.append_event(session, _event("run-1", "b"))
+    assert _stored(service, session) == 2
+
+
+def test_failed_write_keeps_the_batch_for_the_next_flush(tmp_path, monkeypatch, caplog):
+    service = SqliteSessionService(f"sqlite:///{tmp_path}/sessions.db", flush_interval=0)
+    session = service.create_session(app_name="app", user_id="u", session_id="s")
+    service.append_event(session, _event("run-1", "a"))
+    write = service._write
+
+    def locked(*args):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(service, "_write", locked)
+    with pytest.raises(OperationalError):
+        service.flush_session(session)
+    service.append_event(session, _event("run-1", "b"))
+    # The timer path logs instead of raising.
+    service._flush_on_timer(session)
+    assert "kept for the next flush" in caplog.text
+    assert _stored(service, session) == 0
+
+    monkeypatch.setattr(service, "_write", write)
+    service.flush_session(session)
+    stored = service.get_session(app_name="app", user_id="u", session_id="s").events
+    assert [event.content.parts[0].text for event in stored] == ["a", "b"]
@@ -0,0 +1,138 @@
+import asyncio
+from typing import AsyncGenerator
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.runners import InMemoryRunner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from think_tank.sub_agents.think_tank.agent import build_persona
+from think_tank.workflows import AdaptiveParallelAgent, SpeculativeFanout
+
+
+class SlowFanout(BaseAgent):
+    delay: float = 0.0
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        await asyncio.sleep(self.delay)
+        yield Event(invocation_id=ctx.invocation_id, author=self.name, actions=EventActions(state_delta={"done": True}))
+
+
+def _context(fanout: BaseAgent, session_id: str = "s") -> InvocationContext:
+    service = InMemorySessionService()
+    session = service.create_session(app_name="app", user_id="u", session_id=session_id)
+    return InvocationContext(session_service=service, invocation_id="e-1", agent=fanout, session=session)
+
+
+def test_speculation_is_handed_over_on_the_same_loop():
+    speculation = SpeculativeFanout(SlowFanout(name="fanout"))
+    ctx = _context(speculation.fanout)
+
+    async def turns():
+        speculation.start(ctx)
+        return await speculation.take(ctx)
+
+    assert asyncio.run(turns()) == {"problem": "", "outputs": {}}
+    assert speculation._runs == {}
+
+
+def test_speculation_cancelled_with_its_turn_is_evicted():
+    speculation = SpeculativeFanout(SlowFanout(name="fanout", delay=10))
+    ctx = _context(speculation.fanout)
+
+    async def first_turn():
+        speculation.start(ctx)
+
+    # Runner.run: each turn gets its own loop, which cancels the background run when it closes.
+    asyncio.run(first_turn())
+    assert speculation._runs == {}
+    assert asyncio.run(speculation.take(ctx)) is None
+
+
+def test_unanswered_speculations_expire():
+    speculation = SpeculativeFanout(SlowFanout(name="fanout", delay=10), max_age=0)
+
+    async def turns():
+        speculation.start(_context(speculation.fanout, "a"))
+        await asyncio.sleep(0.01)
+        speculation.start(_context(speculation.fanout, "b"))
+        return list(speculation._runs)
+
+    assert asyncio.run(turns()) == ["b"]
+
+
+SPECULATIVE = {"mckinsey": "- Pilot in one unit", "devils_advocate": "- Question the business case"}
+
+
+class ScriptedLlm(BaseLlm):
+    """Answers every call with reply after delay seconds and keeps the requests it got."""
+
+    reply: str = "revised"
+    delay: float = 0.0
+    requests: list = []
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        self.requests.append(llm_request)
+        await asyncio.sleep(self.delay)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=self.reply)]))
+
+
+class FixedPanel(AdaptiveParallelAgent):
+    def select(self, ctx: InvocationContext) -> dict:
+        return {"classification": {}, "personas": [agent.name for agent in self.sub_agents], "rationale": []}
+
+
+def run_patched(message: str, reply: str = "revised", delay: float = 0.0) -> tuple:
+    """Runs mckinsey and devils_advocate on message, handing them SPECULATIVE as answers to "Plan the rollout"."""
+    llm = ScriptedLlm(model="fake-model", reply=reply, delay=delay, requests=[])
+    personas = [build_persona(name) for name in SPECULATIVE]
+    for agent in personas:
+        agent.model = llm
+    speculation = SpeculativeFanout(SlowFanout(name="fanout"))
+
+    async def take(ctx):
+        return {"problem": "Plan the rollout", "outputs": dict(SPECULATIVE)}
+
+    speculation.take = take
+    panel = FixedPanel(name="panel", sub_agents=personas, persona_deadline=0.2, speculation=speculation)
+    runner = InMemoryRunner(panel, app_name="tt")
+    session = runner.session_service.create_session(app_name="tt", user_id="u", state={"clarification_questions": "What budget?"})
+
+    async def run():
+        async for _ in runner.run_async(user_id="u", session_id=session.id, new_message=types.Content(role="user", parts=[types.Part(text=message)])):
+            pass
+
+    asyncio.run(run())
+    return runner.session_service.get_session(app_name="tt", user_id="u", session_id=session.id).state, llm.requests
+
+
+def test_speculative_outputs_are_reused_when_nothing_was_added():
+    state, requests = run_patched("Plan the rollout")
+    assert requests == []
+    assert {name: state[f"{name}_output"] for name in SPECULATIVE} == SPECULATIVE
+
+
+def test_personas_are_asked_to_patch_with_the_answers():
+    state, requests = run_patched("Plan the rollout\nThe budget is 2M.")
+    assert len(requests) == 2
+    for request in requests:
+        text = request.contents[-1].parts[0].text
+        assert text.startswith("\nUPDATE REQUEST") and "What budget?" in text and "The budget is 2M." in text
+    assert any(SPECULATIVE["mckinsey"] in request.contents[-1].parts[0].text for request in requests)
+    assert state["mckinsey_output"] == state["devils_advocate_output"] == "revised"
+    assert state["persona_patch"] is None
+
+
+def test_keep_restores_the_speculative_output():
+    state, _ = run_patched("Plan the rollout\nThe budget is 2M.", reply="`KEEP`")
+    assert {name: state[f"{name}_output"] for name in SPECULATIVE} == SPECULATIVE
+
+
+def test_overrunning_patch_falls_back_to_the_speculative_output():
+    state, requests = run_patched("Plan the rollout\nThe budget is 2M.", delay=10)
+    assert len(requests) == 2
+    assert {name: state[f"{name}_output"] for name in SPECULATIVE} == SPECULATIVE
+    assert state["missing_personas"] == []
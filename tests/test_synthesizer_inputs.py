@@ -0,0 +1,23 @@
+from types import SimpleNamespace
+
+from google.adk.events import Event
+from google.adk.models import LlmRequest
+from google.genai import types
+
+from think_tank.sub_agents.synthesizer.agent import attach_draft, attach_fold_inputs
+
+
+def _callback_context(state: dict) -> SimpleNamespace:
+    question = Event(author="user", content=types.Content(role="user", parts=[types.Part(text="How do we adopt AI agents?")]))
+    session = SimpleNamespace(events=[question])
+    return SimpleNamespace(state=state, _invocation_context=SimpleNamespace(session=session))
+
+
+def test_drafter_and_reconciler_see_the_problem():
+    state = {"synthesis_folding": ["mckinsey"], "mckinsey_output": "- pilot first", "synthesis_draft": "draft"}
+    for callback in (attach_fold_inputs, attach_draft):
+        llm_request = LlmRequest()
+        callback(_callback_context(state), llm_request)
+        text = llm_request.contents[-1].parts[0].text
+        assert text.startswith("**Problem:**\nHow do we adopt AI agents?")
+        assert "draft" in text
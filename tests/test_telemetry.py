@@ -0,0 +1,82 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import AsyncGenerator
+
+import pytest
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import errors, types
+
+from think_tank.scheduler import QuotaScheduler, ScheduledLlm
+from think_tank.telemetry import AgentTelemetry, TelemetryLlm
+
+
+def quota_error() -> errors.ClientError:
+    return errors.ClientError(429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Quota exceeded."}})
+
+
+class ScriptedLlm(BaseLlm):
+    """Answers each call with the next item of script: an exception to raise or a text to stream."""
+
+    script: list
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        item = self.script.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        if stream:
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=item)]), partial=True)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=item)]))
+
+
+def instrumented(tmp_path, script: list) -> tuple:
+    telemetry = AgentTelemetry(jsonl_path=str(tmp_path / "calls.jsonl"))
+    telemetry._output_keys["mckinsey"] = "mckinsey_output"
+    llm = TelemetryLlm(model="fake-model", inner=ScriptedLlm(model="fake-model", script=script), telemetry=telemetry)
+    return telemetry, llm
+
+
+def call(telemetry: AgentTelemetry, llm: BaseLlm, stream: bool = False) -> list:
+    async def run():
+        telemetry.before_model_callback(SimpleNamespace(invocation_id="run-1", agent_name="mckinsey"), LlmRequest())
+        return [response async for response in llm.generate_content_async(LlmRequest(model="fake-model"), stream)]
+
+    return asyncio.run(run())
+
+
+def records(tmp_path) -> list:
+    return [json.loads(line) for line in (tmp_path / "calls.jsonl").read_text().splitlines()]
+
+
+def test_failed_call_is_recorded_as_an_error(tmp_path):
+    telemetry, llm = instrumented(tmp_path, [RuntimeError("boom"), "answer"])
+    with pytest.raises(RuntimeError):
+        call(telemetry, llm)
+    call(telemetry, llm)
+    failed, answered = records(tmp_path)
+    assert failed["error"] == "RuntimeError" and failed["agent"] == "mckinsey"
+    # A new model call of the agent is not a retry of the failed one.
+    assert answered["error"] is None and not answered["retry"]
+    assert 'think_tank_llm_errors_total{agent="mckinsey",output_key="mckinsey_output"} 1' in telemetry.prometheus_text()
+
+
+def test_scheduler_retries_are_recorded_one_request_each(tmp_path):
+    telemetry, llm = instrumented(tmp_path, [quota_error(), quota_error(), "answer"])
+    scheduler = QuotaScheduler(base_delay=0.01)
+    call(telemetry, ScheduledLlm(model="fake-model", inner=llm, scheduler=scheduler))
+    first, second, third = records(tmp_path)
+    assert [first["retry"], second["retry"], third["retry"]] == [False, True, True]
+    assert first["error"] == "RESOURCE_EXHAUSTED" and third["error"] is None
+    text = telemetry.prometheus_text()
+    assert 'think_tank_llm_calls_total{agent="mckinsey",output_key="mckinsey_output"} 3' in text
+    assert 'think_tank_llm_retries_total{agent="mckinsey",output_key="mckinsey_output"} 2' in text
+
+
+def test_time_to_first_token_is_only_reported_for_streamed_calls(tmp_path):
+    telemetry, llm = instrumented(tmp_path, ["answer", "answer"])
+    call(telemetry, llm)
+    call(telemetry, llm, stream=True)
+    unary, streamed = records(tmp_path)
+    assert unary["ttft_s"] is None
+    assert streamed["ttft_s"] is not None and streamed["ttft_s"] <= streamed["wall_time_s"]
+    assert 'think_tank_llm_ttft_seconds_count{agent="mckinsey",output_key="mckinsey_output"} 1' in telemetry.prometheus_text()
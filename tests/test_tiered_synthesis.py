@@ -0,0 +1,65 @@
+import asyncio
+
+from google.adk.agents import LlmAgent, ParallelAgent
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from think_tank.fake_llm import agent_name
+from think_tank.selection import PERSONA_CLUSTERS
+from think_tank.sub_agents.synthesizer.agent import attach_cluster_inputs, attach_cluster_summaries
+from think_tank.workflows import TieredSynthesisAgent
+
+PROBLEM = "How do we adopt AI agents across the company?"
+
+
+def tiered_agent() -> TieredSynthesisAgent:
+    personas = [
+        LlmAgent(name=name, model="fake-model", instruction=f"You are {name}.", output_key=f"{name}_output")
+        for name in ("mckinsey", "aiml_lead", "org_psychologist")
+    ]
+    reducers = [
+        LlmAgent(
+            name=f"{cluster}_synthesizer",
+            model="fake-model",
+            instruction="Summarize the cluster.",
+            include_contents="none",
+            before_model_callback=attach_cluster_inputs,
+            output_key=f"{cluster}_summary",
+        )
+        for cluster in PERSONA_CLUSTERS
+    ]
+    synthesizer = LlmAgent(
+        name="synthesizer",
+        model="fake-model",
+        instruction="Merge the summaries.",
+        before_model_callback=attach_cluster_summaries,
+        output_key="synthesis",
+    )
+    return TieredSynthesisAgent(name="facilitator", sub_agents=[ParallelAgent(name="panel", sub_agents=personas), *reducers, synthesizer])
+
+
+def test_clusters_are_reduced_and_every_reducer_sees_the_problem(fast_model):
+    runner = InMemoryRunner(tiered_agent(), app_name="tt")
+    session = runner.session_service.create_session(app_name="tt", user_id="u")
+
+    async def run():
+        message = types.Content(role="user", parts=[types.Part(text=PROBLEM)])
+        async for _ in runner.run_async(user_id="u", session_id=session.id, new_message=message):
+            pass
+
+    asyncio.run(run())
+    state = runner.session_service.get_session(app_name="tt", user_id="u", session_id=session.id).state
+    # Personas run in parallel, so within a cluster they are listed in arrival order.
+    clusters = {cluster: sorted(names) for cluster, names in state["synthesis_clusters"].items()}
+    assert clusters == {"strategy": ["aiml_lead", "mckinsey"], "people_change": ["org_psychologist"]}
+    assert state["strategy_summary"].startswith("- [strategy_synthesizer]")
+    # A single-persona cluster skips its reducer.
+    assert state["people_change_summary"] == state["org_psychologist_output"]
+    assert "risk_futures_summary" not in state
+
+    requests = {agent_name(llm_request): llm_request for llm_request in fast_model}
+    assert "people_change_synthesizer" not in requests
+    for name in ("strategy_synthesizer", "synthesizer"):
+        text = requests[name].contents[-1].parts[0].text
+        assert text.startswith(f"**Problem:**\n{PROBLEM}\n\n")
+    assert "**strategy (" in requests["synthesizer"].contents[-1].parts[0].text